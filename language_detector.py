@@ -1,10 +1,14 @@
-import fasttext
-import os
+from core.language_detection import get_language_detector
+
 
 class LanguageDetector:
     def __init__(self, model_path="lid.176.bin"):
-        self.model = fasttext.load_model(model_path)
+        # النموذج لا يُحمَّل هنا؛ يُحمَّل عند أول نص لا يحسمه مدرّج أنظمة الكتابة
+        self.detector = get_language_detector(model_path)
 
     def detect(self, text):
-        prediction = self.model.predict(text.replace("\n", " "))
-        return prediction[0][0].replace("__label__", "")
\ No newline at end of file
+        result = self.detector.detect(text)
+        return result["language"], result["confidence"]
+
+    def detect_many(self, texts):
+        return [(result["language"], result["confidence"]) for result in self.detector.detect_many(texts)]
@@ -6,21 +6,57 @@ server.py
 تحسين REST API عبر FastAPI مع دعم المصادقة بـ JWT وتحليل النصوص الذكية
 """
 
+import os
 import jwt
+import hashlib
+import tempfile
+import threading
 import uvicorn
 import datetime
+from pathlib import Path
 from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pathlib import Path
-from core.text_processing import TextProcessor
 from core.database import DatabaseManager
-from core.ai_engine import AIEngine
+from core.extractors import extract_text, file_type
+from core.ai_engine import AIEngine, HASH_CHUNK_SIZE
 from core.security import SecurityManager
 from config import SECRET_KEY, DATA_DIR
 
 app = FastAPI(title="Manhal AI API", version="2.0")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# مدير قاعدة البيانات والمحرك مشتركان بين الطلبات: كل مدير يملك مجمّع اتصالات
+# وخيط كتابة لسجل التدقيق، فإنشاؤه لكل طلب يُبقي خيطاً واتصالاً مفتوحين بعده
+_DATABASE = None
+_ENGINE = None
+_RESOURCES_LOCK = threading.Lock()
+
+def get_database() -> DatabaseManager:
+    """مدير قاعدة البيانات المشترك للتطبيق (يُنشأ عند أول طلب)."""
+    global _DATABASE
+    with _RESOURCES_LOCK:
+        if _DATABASE is None:
+            _DATABASE = DatabaseManager()
+        return _DATABASE
+
+def get_engine() -> AIEngine:
+    """محرك التحليل المشترك للتطبيق، على مدير قاعدة البيانات المشترك."""
+    global _ENGINE
+    database = get_database()
+    with _RESOURCES_LOCK:
+        if _ENGINE is None:
+            _ENGINE = AIEngine(database)
+        return _ENGINE
+
+@app.on_event("shutdown")
+def close_resources():
+    """إغلاق مدير قاعدة البيانات المشترك عند إيقاف الخادم."""
+    global _DATABASE, _ENGINE
+    with _RESOURCES_LOCK:
+        database, _DATABASE, _ENGINE = _DATABASE, None, None
+    if database is not None:
+        database.close()
+
 def generate_jwt_token(username: str):
     """إنشاء رمز JWT صالح لمدة 24 ساعة"""
     payload = {"sub": username, "exp": datetime.datetime.utcnow() + datetime.timedelta(days=1)}
@@ -45,19 +81,34 @@ def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 @app.post("/upload/")
 def upload_file(file: UploadFile = File(...), username: str = Depends(verify_jwt_token)):
-    """تحميل ملف واستخراج النصوص منه"""
-    file_path = DATA_DIR / file.filename
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
-
-    extracted_text = TextProcessor(DATA_DIR).extract_text(file.filename)
-    DatabaseManager().save_document(file.filename, extracted_text, Path(file.filename).suffix.upper())
+    """تحميل ملف واستخراج النصوص منه (الملف المرفوع سابقاً لا يُعاد استخراجه)"""
+    # ملف مؤقت فريد لكل طلب (بامتداد الملف الأصلي): الرفعات المتزامنة بالاسم نفسه
+    # لا يكتب بعضها فوق بعض
+    # بصمة البايتات تُحسب أثناء الكتابة دون قراءة الملف مرة ثانية
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=DATA_DIR, prefix="upload-",
+                                     suffix=Path(file.filename).suffix, delete=False) as f:
+        file_path = f.name
+        for chunk in iter(lambda: file.file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    try:
+        db = get_database()
+        doc_id = db.find_by_source(digest.hexdigest())
+        document = db.get_document(doc_id) if doc_id is not None else None
+        if document is not None:
+            extracted_text = document["content"]
+        else:
+            extracted_text = extract_text(file_path)
+        db.save_document(file.filename, extracted_text, file_type(file_path), digest.hexdigest())
+    finally:
+        os.remove(file_path)
     return {"message": f"تم استخراج النص من {file.filename}", "text": extracted_text}
 
 @app.post("/analyze/")
 def analyze_text(text: str, username: str = Depends(verify_jwt_token)):
     """تحليل النصوص واستخراج المعلومات الذكية"""
-    sentiment = AIEngine().answer_question("ما هو الشعور في هذا النص؟", text)
+    sentiment = get_engine().answer_question("ما هو الشعور في هذا النص؟", text)
     return {"sentiment": sentiment}
 
 if __name__ == "__main__":
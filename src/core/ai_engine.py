@@ -9,17 +9,52 @@ File: C:\Manhal\Manhal ai\src\core\ai_engine.py
 """
 
 import os
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
 import torch
-import pytesseract
-import textract
-import fitz  # PyMuPDF لقراءة ملفات PDF
 
 # استخدام استيراد مسار مطلق للوحدات الداخلية
-from core.text_processing import TextProcessor
+from core.text_processing import ANALYZER_NAME, TextProcessor
 from core.database import DatabaseManager
+from core.batch import resolve_workers, run_batch
+from core import extractors, ocr
 from utils.security import SECRET_KEY, DATA_DIR
 
 
+# نسخة المحرك الخاصة بكل عملية عاملة في المعالجة الدفعية
+_worker_engine = None
+
+# حجم الجزء المقروء عند حساب بصمة ملف
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """بصمة SHA-256 لبايتات ملف، بقراءته جزءاً بعد جزء دون تحميله كاملاً."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _init_batch_worker():
+    """
+    تحميل المحرك (قاعدة البيانات، المترجم...) مرة واحدة لكل عملية عاملة.
+    يُستدعى في العمليات العاملة فقط، فلا يغيّر إعدادات العملية الرئيسية.
+    """
+    global _worker_engine
+    # الملفات موزعة على العمليات أصلاً: لا تُوزَّع صفحات PDF ولا صور OCR مرة ثانية،
+    # وإلا شغّلت N عملية N خيطاً لكل منها
+    extractors.DEFAULT_PDF_WORKERS = 1
+    ocr.DEFAULT_OCR_WORKERS = 1
+    _worker_engine = AIEngine()
+
+
+def _run_batch_item(input_path: str) -> dict:
+    return _worker_engine.run_engine(input_path)
+
+
 class AIEngine:
     """
     توفر هذه الفئة الوظائف التالية:
@@ -29,11 +64,13 @@ class AIEngine:
       - حفظ نتائج التحليل في قاعدة البيانات.
     """
 
-    def __init__(self):
+    def __init__(self, database_manager: Optional[DatabaseManager] = None):
+        """
+        :param database_manager: مدير قاعدة بيانات مشترك (مثل مدير خادم API)؛
+                                 عند غيابه يُنشأ مدير خاص بهذا المحرك.
+        """
         self.text_processor = TextProcessor()
-        self.database_manager = DatabaseManager()
-        self.ocr_engine = pytesseract  # استخدام pytesseract لاستخراج النصوص من الصور
-        self.pdf_engine = fitz         # استخدام PyMuPDF لقراءة ملفات PDF
+        self.database_manager = database_manager or DatabaseManager()
 
     def extract_text_from_image(self, image_path: str) -> str:
         """
@@ -41,7 +78,7 @@ class AIEngine:
         :param image_path: مسار ملف الصورة.
         :return: النص المستخرج من الصورة.
         """
-        return self.ocr_engine.image_to_string(image_path)
+        return extractors.extract_text(image_path, "image")
 
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """
@@ -49,20 +86,49 @@ class AIEngine:
         :param pdf_path: مسار ملف PDF.
         :return: النص المستخرج من الملف.
         """
-        doc = self.pdf_engine.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text("text") + "\n"
-        return text
+        return extractors.extract_text(pdf_path, "pdf")
+
+    def iter_pdf_pages(self, pdf_path: str) -> Iterator[str]:
+        """
+        قراءة ملف PDF صفحة بصفحة دون تجميع النص كاملاً في الذاكرة.
+        :param pdf_path: مسار ملف PDF.
+        :return: مولّد يُرجع نص كل صفحة متبوعاً بسطر جديد.
+        """
+        return extractors.iter_pdf_pages(pdf_path)
+
+    def iter_text(self, input_path: str, prefetch_size: int = extractors.STREAM_PREFETCH) -> Iterator[Dict]:
+        """
+        قراءة نص ملف أجزاءً (صفحات أو فقرات) مع مواضعها فور استخراجها.
+        :param prefetch_size: عدد الأجزاء المستخرجة مسبقاً في خيط خلفي (0: دون خيط).
+        :return: مولّد سجلات {"text", "index", "offset", "kind", "page", "source"}.
+        """
+        return extractors.iter_text(input_path, prefetch_size=prefetch_size)
+
+    def analyze_stream(self, input_path: str) -> dict:
+        """
+        تحليل ملف (PDF، DOCX، TXT أو صورة) جزءاً بجزء عبر TextProcessor.process_stream:
+        يبدأ التحليل مع أول جزء مستخرج ويتوازى مع استخراج ما بعده، ويبقى استهلاك
+        الذاكرة ثابتاً مهما كان حجم الملف.
+        :param input_path: مسار ملف الإدخال.
+        :return: قاموس نتائج التحليل (دون النص المنظف الكامل).
+        """
+        return self.text_processor.process_stream(chunk["text"] for chunk in self.iter_text(input_path))
+
+    def analyze_pdf_stream(self, pdf_path: str) -> dict:
+        """
+        تحليل ملف PDF كبير صفحة بصفحة (انظر analyze_stream).
+        :param pdf_path: مسار ملف PDF.
+        :return: قاموس نتائج التحليل (دون النص المنظف الكامل).
+        """
+        return self.analyze_stream(pdf_path)
 
     def extract_text_from_docx(self, docx_path: str) -> str:
         """
-        استخراج النصوص من ملف DOCX باستخدام مكتبة textract.
+        استخراج النصوص من ملف DOCX (أو DOC القديم).
         :param docx_path: مسار ملف DOCX.
         :return: النص المستخرج من الملف.
         """
-        # textract تُرجع نصاً مُشفرًا بالبايت، لذا نقوم بفك التشفير
-        return textract.process(docx_path).decode("utf-8")
+        return extractors.extract_text(docx_path)
 
     def analyze_text(self, text: str) -> dict:
         """
@@ -70,44 +136,124 @@ class AIEngine:
         :param text: النص المُدخل للتحليل.
         :return: قاموس يحتوي على نتائج التحليل (تنظيف النص، استخراج الكيانات، الكشف عن اللغة، تحليل المشاعر، الحساب العددي، التلخيص، والكلمات المفتاحية).
         """
-        analysis = {
-            "cleaned_text": self.text_processor.clean_text(text),
-            "entities": self.text_processor.extract_entities(text),
-            "language": self.text_processor.detect_language(text),
-            "sentiment": self.text_processor.analyze_sentiment(text),
-            "numerical_analysis": self.text_processor.numerical_analysis(text),
-            "summary": self.text_processor.summarize_text(text),
-            "keywords": self.text_processor.extract_keywords(text)
-        }
-        return analysis
+        # المعالجة الموحّدة تقرأ النص مرة واحدة بدلاً من سبع مرات
+        return self.text_processor.process_text(text)
+
+    def analyze_document(self, content_hash: str, text: str) -> dict:
+        """
+        تحليل نص محفوظ مع القراءة عبر مخزن النتائج: تُعاد النتيجة المحفوظة لهذا
+        المحتوى وإصدار التحليل الحالي إن وجدت، وإلا يُحلل النص وتُحفظ النتيجة.
+        :param content_hash: بصمة SHA-256 للنص (كما في documents.sha256_hash).
+        """
+        return self.database_manager.get_or_compute_analysis(
+            content_hash, ANALYZER_NAME, self.text_processor.analysis_version(),
+            lambda: self.analyze_text(text)
+        )
 
-    def save_analysis_results(self, analysis_data: dict):
+    def save_analysis_results(self, content_hash: str, analysis_data: dict):
         """
         حفظ نتائج التحليل إلى قاعدة البيانات باستخدام وحدة DatabaseManager.
+        :param content_hash: بصمة SHA-256 للنص المُحلَّل.
         :param analysis_data: البيانات التحليلية المُجمعة.
         """
-        self.database_manager.save_data("analysis_results", analysis_data)
+        self.database_manager.save_analysis(
+            content_hash, ANALYZER_NAME, self.text_processor.analysis_version(), analysis_data
+        )
+
+    def prune_stale_analyses(self) -> int:
+        """
+        حذف نتائج التحليل المحفوظة بإصدار أو إعدادات غير الحالية لهذا المحرك.
+        لا يُستدعى تلقائياً: قد تتشارك قاعدة البيانات محركات بإعدادات مختلفة.
+        """
+        return self.database_manager.invalidate_analyses(ANALYZER_NAME, self.text_processor.analysis_version())
+
+    def ingest_file(self, input_path: str, title: Optional[str] = None,
+                    source_hash: Optional[str] = None) -> dict:
+        """
+        حفظ ملف في قاعدة البيانات مع تجنب إعادة المعالجة: تُحسب بصمة بايتات الملف
+        أولاً، فإذا كان الملف نفسه قد استُخرج نصه سابقاً (ولو باسم آخر) يُستخدم
+        المستند المحفوظ دون استخراج أو OCR أو تشفير، ويُربط به العنوان الجديد.
+        :param title: عنوان المستند؛ الافتراضي اسم الملف.
+        :param source_hash: بصمة بايتات الملف إن كانت محسوبة مسبقاً.
+        :return: {"id", "title", "content", "hash", "source_hash", "reused"}؛
+                 "id" يكون None إذا تعذر الحفظ (مثل عنوان مستخدم لمحتوى آخر).
+        """
+        title = title or Path(input_path).name
+        file_type = self.file_type(input_path)
+        source_hash = source_hash or hash_file(input_path)
+        doc_id = self.database_manager.find_by_source(source_hash)
+        document = self.database_manager.get_document(doc_id) if doc_id is not None else None
+        if document is not None:
+            if self.database_manager.find_by_title(title) is None:
+                self.database_manager.ingest_document(title, document["content"], file_type, source_hash)
+            return {
+                "id": document["id"], "title": title, "content": document["content"],
+                "hash": document["hash"], "source_hash": source_hash, "reused": True
+            }
+
+        text = self.extract_text(input_path)
+        saved = self.database_manager.ingest_document(title, text, file_type, source_hash)
+        return {
+            "id": saved["id"] if saved else None, "title": title, "content": text,
+            "hash": saved["hash"] if saved else hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "source_hash": source_hash, "reused": bool(saved and saved["linked"])
+        }
+
+    @staticmethod
+    def file_type(input_path: str) -> str:
+        """نوع الملف (DOC، PDF، TXT، IMG) حسب توقيع بايتاته (انظر core.extractors)."""
+        return extractors.file_type(input_path)
+
+    def extract_text(self, input_path: str) -> str:
+        """
+        استخراج نص ملف (صورة، PDF، DOCX أو TXT) حسب نوعه المُكتشف من بايتاته
+        عبر سجل المستخرجات في core.extractors.
+        :param input_path: مسار ملف الإدخال.
+        :return: النص المستخرج.
+        """
+        return extractors.extract_text(input_path)
 
     def run_engine(self, input_path: str) -> dict:
         """
         تشغيل محرك الذكاء الاصطناعي على ملف الإدخال المحدد (صورة، PDF، DOCX أو TXT).
-        يتم تحديد نوع الملف بناءً على الامتداد واستخراج النص وفقاً لذلك، ثم تحليل النص وحفظ النتائج.
+        إذا كان الملف نفسه (ببصمة بايتاته) قد حُلل بإصدار التحليل الحالي تُعاد
+        النتيجة المحفوظة مباشرة دون استخراج أو فك تشفير أو تحليل؛ وإلا يُحفظ الملف
+        عبر ingest_file (دون إعادة استخراج ملف معروف) ثم يُحلل النص عبر analyze_document.
         :param input_path: مسار ملف الإدخال.
         :return: قاموس يحتوي على نتائج التحليل.
         """
-        ext = os.path.splitext(input_path)[1].lower()
-        if ext in [".png", ".jpg", ".jpeg"]:
-            text = self.extract_text_from_image(input_path)
-        elif ext == ".pdf":
-            text = self.extract_text_from_pdf(input_path)
-        elif ext in [".docx", ".doc"]:
-            text = self.extract_text_from_docx(input_path)
-        elif ext == ".txt":
-            with open(input_path, encoding="utf-8") as f:
-                text = f.read()
-        else:
-            raise ValueError("تنسيق الملف غير مدعوم")
-        
-        analysis = self.analyze_text(text)
-        self.save_analysis_results(analysis)
-        return analysis
\ No newline at end of file
+        self.file_type(input_path)
+        source_hash = hash_file(input_path)
+        content_hash = self.database_manager.find_hash_by_source(source_hash)
+        if content_hash is not None:
+            analysis = self.database_manager.load_analysis(
+                content_hash, ANALYZER_NAME, self.text_processor.analysis_version()
+            )
+            if analysis is not None:
+                return analysis
+        document = self.ingest_file(input_path, source_hash=source_hash)
+        return self.analyze_document(document["hash"], document["content"])
+
+    def run_batch(self, input_paths: Iterable[str], workers: Optional[int] = None,
+                  chunksize: Optional[int] = None) -> List[dict]:
+        """
+        تشغيل المحرك على مجموعة ملفات بالتوازي على عدة أنوية.
+        يُحمَّل المحرك مرة واحدة في كل عملية عاملة، ولا يوقف فشل ملف واحد بقية الدفعة.
+        :param input_paths: مسارات ملفات الإدخال.
+        :param workers: عدد العمليات؛ الافتراضي عدد أنوية المعالج.
+        :param chunksize: حجم الدفعة لكل عامل؛ يُحسب تلقائياً من عدد الملفات وأحجامها.
+        :return: قائمة بنفس ترتيب المسارات، كل عنصر فيها {"result": ..., "error": ...}.
+        """
+        input_paths = [str(path) for path in input_paths]
+        if resolve_workers(workers, len(input_paths)) == 1:
+            # عامل واحد: التنفيذ في العملية الحالية بهذا المحرك ودون تهيئة العمليات العاملة
+            return run_batch(self.run_engine, input_paths, workers=1)
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in input_paths]
+        return run_batch(
+            _run_batch_item,
+            input_paths,
+            workers=workers,
+            chunksize=chunksize,
+            initializer=_init_batch_worker,
+            weights=sizes
+        )
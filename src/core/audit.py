@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+audit.py
+==================
+كاتب سجل التدقيق في الخلفية.
+
+تُوضع الأحداث في طابور محدود ويكتبها خيط واحد دفعة بعد دفعة (عند بلوغ
+batch_size أو مرور flush_interval)، فلا يدفع مسار الطلب ثمن معاملة وتثبيت
+على القرص لكل حدث. يُسجَّل وقت الحدث عند وقوعه لا عند كتابته.
+
+الأحداث في sync_events (افتراضياً SECURITY_ALERT) تُكتب وتُثبَّت فوراً في خيط
+المستدعي. إذا كان اتصال المستدعي داخل معاملة فإن الحدث يُكتب ضمنها ويُثبَّت
+أو يُلغى معها.
+"""
+
+import os
+import queue
+import atexit
+import logging
+import sqlite3
+import threading
+import weakref
+from datetime import datetime
+from typing import Iterable, Optional
+
+# يُستورد قبل تسجيل atexit أدناه: دوال atexit تُنفَّذ بعكس ترتيب تسجيلها،
+# فيُفرَّغ طابور التدقيق قبل أن تُغلق مجمّعات الاتصالات
+from core.db_pool import ConnectionPool
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_QUEUE = 10000
+SYNC_EVENTS = ("SECURITY_ALERT",)
+OVERFLOW_POLICIES = ("block", "drop")
+
+_INSERT = "INSERT INTO audit_log (event_type, details, timestamp) VALUES (?, ?, ?)"
+_WRITE_ATTEMPTS = 3
+_STOP = object()
+# يطلب من الخيط كتابة ما جمعه فوراً دون انتظار flush_interval
+_FLUSH = object()
+
+
+def _now() -> str:
+    # الصيغة نفسها التي يُنتجها CURRENT_TIMESTAMP في SQLite (UTC)
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class AuditWriter:
+    """
+    كاتب أحداث التدقيق عبر طابور محدود وخيط خلفي.
+    """
+
+    def __init__(self, pool: ConnectionPool, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_queue: int = DEFAULT_MAX_QUEUE,
+                 overflow: str = "block", block_timeout: Optional[float] = None,
+                 sync_events: Iterable[str] = SYNC_EVENTS):
+        """
+        :param overflow: عند امتلاء الطابور: "block" ينتظر المستدعي (حتى block_timeout
+                         ثم يُسقط الحدث)، و"drop" يُسقطه فوراً. تُعد الأحداث المُسقطة
+                         في dropped ويُسجَّل عددها في حدث AUDIT_OVERFLOW.
+        :param sync_events: أنواع أحداث تُكتب وتُثبَّت فوراً دون الطابور.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"سياسة امتلاء غير مدعومة: {overflow}")
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.sync_events = frozenset(sync_events)
+        self.written = self.dropped = self.failed = 0
+        self._reported_drops = 0
+        self._lock = threading.Lock()
+        self._reset()
+        _WRITERS.add(self)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(self.max_queue)
+        self._thread = None
+        self._closed = False
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid():
+            # عملية فرعية: خيط الأب لا يُورَّث
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                    self._thread.start()
+
+    def log(self, event_type: str, details: str = ""):
+        """تسجيل حدث (دون انتظار كتابته إلا لأحداث sync_events)."""
+        event = (event_type, details, _now())
+        if event_type in self.sync_events or self._closed:
+            self._write_sync(event)
+            return
+        self._ensure_thread()
+        try:
+            if self.overflow == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _write_sync(self, event: tuple):
+        try:
+            conn = self.pool.connection()
+            in_transaction = conn.in_transaction
+            conn.execute(_INSERT, event)
+            if not in_transaction:
+                conn.commit()
+            with self._lock:
+                self.written += 1
+        except sqlite3.Error as e:
+            logging.error(f"فشل تسجيل الحدث: {e}")
+            with self._lock:
+                self.failed += 1
+
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            received = [self._queue.get()]
+            # تجميع ما يصل خلال flush_interval حتى batch_size حدثاً
+            while len(received) < self.batch_size and received[-1] is not _STOP and received[-1] is not _FLUSH:
+                try:
+                    received.append(self._queue.get(timeout=self.flush_interval))
+                except queue.Empty:
+                    break
+            stopping = received[-1] is _STOP
+            batch = [event for event in received if event is not _STOP and event is not _FLUSH]
+            try:
+                if conn is None:
+                    conn = self.pool.connection()
+                self._write_batch(conn, batch)
+            except Exception as e:
+                # أي خطأ آخر (مجمّع مغلق، خطأ غير متوقع) لا يوقف الخيط، وإلا علق flush()
+                # على الطابور وlog() عند امتلائه
+                logging.critical(f"فُقد {len(batch)} حدث تدقيق: {type(e).__name__}: {e}")
+                conn = None
+                with self._lock:
+                    self.failed += len(batch)
+            finally:
+                for _ in received:
+                    self._queue.task_done()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        with self._lock:
+            drops = self.dropped - self._reported_drops
+            self._reported_drops = self.dropped
+        if drops:
+            batch.append(("AUDIT_OVERFLOW", f"أُسقط {drops} حدث تدقيق لامتلاء الطابور", _now()))
+        if not batch:
+            return
+        for attempt in range(_WRITE_ATTEMPTS):
+            try:
+                conn.executemany(_INSERT, batch)
+                conn.commit()
+                with self._lock:
+                    self.written += len(batch)
+                return
+            except sqlite3.Error as e:
+                conn.rollback()
+                logging.error(f"فشل كتابة دفعة التدقيق (محاولة {attempt + 1}): {e}")
+        logging.critical(f"فُقد {len(batch)} حدث تدقيق بعد {_WRITE_ATTEMPTS} محاولات")
+        with self._lock:
+            self.failed += len(batch)
+
+    def flush(self):
+        """انتظار كتابة جميع الأحداث الموجودة في الطابور (دون انتظار flush_interval)."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self):
+        """كتابة ما تبقى في الطابور وإيقاف الخيط؛ الأحداث اللاحقة تُكتب مباشرة."""
+        with self._lock:
+            if self._closed or self._pid != os.getpid():
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        # أحداث وصلت بين فحص _closed في log() وإيقاف الخيط
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if remaining:
+            self._write_batch(
+                self.pool.connection(), [event for event in remaining if event is not _STOP and event is not _FLUSH]
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+# جميع الكتّاب المفتوحين؛ تُفرَّغ طوابيرهم عند خروج البرنامج
+_WRITERS = weakref.WeakSet()
+
+
+@atexit.register
+def close_all_writers():
+    for writer in list(_WRITERS):
+        writer.close()
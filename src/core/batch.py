@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+batch.py
+==================
+توزيع المعالجة الدفعية على جميع أنوية المعالج عبر مجمّع عمليات،
+مع الحفاظ على ترتيب النتائج والإبلاغ عن الأخطاء لكل عنصر على حدة.
+"""
+
+import os
+import math
+import queue
+import logging
+import threading
+from functools import partial
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# عدد الدفعات المستهدف لكل عامل: يوازن بين كلفة التواصل بين العمليات وتوزيع الحمل
+CHUNKS_PER_WORKER = 4
+
+# الحجم التقريبي الأقصى لبيانات الدفعة الواحدة (بعدد الأحرف أو البايتات)
+TARGET_CHUNK_WEIGHT = 4 * 1024 * 1024
+
+# خطأ العنصر الذي توقفت عمليته العاملة أثناء معالجته (انهيار أو نفاد ذاكرة)
+WORKER_CRASH_ERROR = "BrokenProcessPool: توقفت العملية العاملة أثناء معالجة العنصر"
+
+# خطأ دالة التهيئة في العملية العاملة الحالية: يُبلغ عنه لكل عنصر بدلاً من كسر المجمّع
+_worker_init_error: Optional[str] = None
+
+# مهلة انتظار المنتج في prefetch قبل إعادة التحقق من توقف المستهلك (بالثواني)
+_PREFETCH_POLL = 0.1
+
+
+def resolve_workers(workers: Optional[int], item_count: int) -> int:
+    """
+    تحديد عدد العمال الفعلي: القيمة الممررة أو عدد الأنوية، دون تجاوز عدد العناصر.
+    """
+    if not workers or workers < 1:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, item_count))
+
+
+def adaptive_chunksize(item_count: int, workers: int, weights: Optional[Sequence[int]] = None) -> int:
+    """
+    حساب حجم الدفعة تلقائياً وفق عدد العناصر والعمال، مع تصغيرها
+    عندما تكون العناصر كبيرة حتى لا تتجاوز الدفعة TARGET_CHUNK_WEIGHT.
+    """
+    chunksize = math.ceil(item_count / (workers * CHUNKS_PER_WORKER))
+    if weights:
+        average_weight = sum(weights) / len(weights)
+        if average_weight > 0:
+            chunksize = min(chunksize, int(TARGET_CHUNK_WEIGHT // average_weight))
+    return max(1, chunksize)
+
+
+def _guarded_call(func: Callable, item) -> dict:
+    """
+    تنفيذ الدالة على عنصر واحد وإرجاع النتيجة أو رسالة الخطأ دون إيقاف الدفعة.
+    """
+    try:
+        return {"result": func(item), "error": None}
+    except Exception as e:
+        logging.error(f"فشل معالجة عنصر في الدفعة: {e}")
+        return {"result": None, "error": f"{type(e).__name__}: {e}"}
+
+
+def _init_worker(initializer: Callable, initargs: tuple):
+    global _worker_init_error
+    try:
+        initializer(*initargs)
+    except Exception as e:
+        logging.error(f"فشل تهيئة العملية العاملة: {e}")
+        _worker_init_error = f"{type(e).__name__}: {e}"
+
+
+def _guarded_chunk(func: Callable, chunk: Sequence) -> List[dict]:
+    if _worker_init_error is not None:
+        return [{"result": None, "error": _worker_init_error} for _ in chunk]
+    return [_guarded_call(func, item) for item in chunk]
+
+
+def _run_isolated(pool: ProcessPoolExecutor, func: Callable, items: List, pending: List[int],
+                  results: List[Optional[dict]]):
+    """
+    تنفيذ العناصر المعلّقة واحداً بعد الآخر حتى أول انهيار، فيُنسب إلى عنصره وحده.
+    """
+    for index in pending:
+        try:
+            results[index] = pool.submit(_guarded_chunk, func, [items[index]]).result()[0]
+        except BrokenProcessPool:
+            logging.error(f"توقفت العملية العاملة أثناء معالجة العنصر {index}")
+            results[index] = {"result": None, "error": WORKER_CRASH_ERROR}
+            return
+
+
+def _run_chunks(pool: ProcessPoolExecutor, func: Callable, items: List, pending: List[int],
+                chunksize: int, results: List[Optional[dict]]):
+    """توزيع العناصر المعلّقة دفعات؛ تبقى عناصر الدفعات التي انكسر المجمّع أثناءها معلّقة."""
+    batches = [pending[start:start + chunksize] for start in range(0, len(pending), chunksize)]
+    futures = [(batch, pool.submit(_guarded_chunk, func, [items[index] for index in batch])) for batch in batches]
+    for batch, future in futures:
+        try:
+            for index, result in zip(batch, future.result()):
+                results[index] = result
+        except BrokenProcessPool:
+            pass
+
+
+def run_batch(
+    func: Callable,
+    items: Iterable,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+    weights: Optional[Sequence[int]] = None
+) -> List[dict]:
+    """
+    تنفيذ func على كل عنصر في مجمّع عمليات.
+
+    :param func: دالة على مستوى الوحدة (قابلة للتسلسل) تُستدعى لكل عنصر.
+    :param items: العناصر المراد معالجتها.
+    :param workers: عدد العمليات؛ الافتراضي عدد أنوية المعالج.
+    :param chunksize: حجم الدفعة المرسلة لكل عامل؛ يُحسب تلقائياً إن لم يُحدد.
+    :param initializer: دالة تُنفذ مرة واحدة في كل عامل لتحميل الحالة الثقيلة
+                        (فشلها يُبلغ عنه خطأً لكل عنصر في ذلك العامل).
+    :param weights: أحجام العناصر (اختياري) لضبط حجم الدفعة.
+    :return: قائمة بنفس ترتيب المدخلات، كل عنصر فيها {"result": ..., "error": ...}.
+
+    انهيار عملية عاملة (خطأ تجزئة في مكتبة أصلية، قتلها لنفاد الذاكرة) لا يُسقط
+    الدفعة: تُحفظ النتائج المكتملة ويُعاد بناء المجمّع لبقية العناصر. إذا انهار
+    المجمّع دون إكمال أي عنصر تُنفذ العناصر واحداً بعد الآخر حتى يُعرف العنصر
+    المسبب فيُعلَّم بـ WORKER_CRASH_ERROR وحده.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    workers = resolve_workers(workers, len(items))
+    task = partial(_guarded_call, func)
+
+    # لا فائدة من إنشاء عمليات لعامل واحد: التنفيذ يتم في العملية الحالية
+    if workers == 1:
+        if initializer:
+            initializer(*initargs)
+        return [task(item) for item in items]
+
+    if not chunksize:
+        chunksize = adaptive_chunksize(len(items), workers, weights)
+
+    pool_options = {"initializer": _init_worker, "initargs": (initializer, initargs)} if initializer else {}
+    results: List[Optional[dict]] = [None] * len(items)
+    pending = list(range(len(items)))
+    isolate = False
+    while pending:
+        with ProcessPoolExecutor(max_workers=1 if isolate else workers, **pool_options) as pool:
+            if isolate:
+                _run_isolated(pool, func, items, pending, results)
+            else:
+                _run_chunks(pool, func, items, pending, chunksize, results)
+        remaining = [index for index in pending if results[index] is None]
+        if remaining:
+            logging.warning(f"انكسر مجمّع العمليات: إعادة {len(remaining)} عنصراً في مجمّع جديد")
+        # انكسار دون تقدم: العزل يضمن تقدماً (إكمال عناصر أو تعليم المسبب)
+        isolate = not isolate and len(remaining) == len(pending)
+        pending = remaining
+    return results
+
+
+def prefetch(items: Iterable, size: int = 4) -> Iterator:
+    """
+    قراءة عناصر المُكرِّر مسبقاً في خيط خلفي إلى طابور لا يتسع لأكثر من size:
+    يعمل المنتج (استخراج، تعرف ضوئي) بالتوازي مع المستهلك، ويتوقف متى امتلأ
+    الطابور فلا تتراكم العناصر في الذاكرة إذا كان المستهلك أبطأ (ضغط عكسي).
+    يُعاد استثناء المنتج في خيط المستهلك، وإغلاق المولّد يوقف المنتج ويغلق مُكرِّره.
+    """
+    buffer = queue.Queue(max(1, size))
+    stopped = threading.Event()
+    done = object()
+
+    def put(entry) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=_PREFETCH_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(items)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
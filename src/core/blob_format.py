@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+blob_format.py
+==================
+صيغة تخزين المحتوى المشفّر: ضغط ثم تشفير AES-256-GCM، ببايتات خام دون base64.
+
+بنية الكتلة (الإصدار 1):
+
+    MAGIC (3) | VERSION (1) | CODEC (1) | DICT_ID (4) | NONCE (12) | ciphertext + tag (16)
+
+الترويسة كاملة بيانات مصادَق عليها (AAD)، فلا يمكن تغيير الضاغط أو القاموس
+دون كشف التلاعب. تبدأ MAGIC ببايت صفري، ورموز Fernet القديمة (base64 تبدأ
+بـ "gAAAAA") لا يمكن أن تبدأ به، فتُقرأ الصيغتان بشفافية.
+
+الضاغط zstd إن توفرت مكتبة zstandard، وإلا zlib؛ ويمكن تدريب قاموس على
+عينات من المدونة (تستفيد منه المستندات القصيرة خاصة). يُحتفظ بالقواميس
+بمعرّفاتها لأن كل كتلة تحتاج قاموسها نفسه عند فك الضغط.
+"""
+
+import os
+import hmac
+import zlib
+import struct
+import hashlib
+from collections import Counter
+from typing import Dict, Iterable, Optional, Union
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# محاولة استيراد zstandard (اختياري)
+try:
+    import zstandard
+    zstd_available = True
+except ImportError:
+    zstd_available = False
+
+MAGIC = b"\x00MB"
+VERSION = 1
+CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD = range(3)
+CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+_HEADER = struct.Struct(">3sBBI")
+_NONCE_SIZE = 12
+
+DEFAULT_ZLIB_LEVEL = 6
+DEFAULT_ZSTD_LEVEL = 9
+# حجم القاموس المدرَّب؛ zlib لا يستخدم أكثر من آخر 32 كيلوبايت من قاموسه
+DEFAULT_DICTIONARY_SIZE = 64 * 1024
+_ZLIB_WINDOW = 32 * 1024
+
+
+def is_legacy(blob: bytes) -> bool:
+    """هل الكتلة رمز Fernet بالصيغة القديمة؟ (الصيغ الجديدة كلها تبدأ بالبايت الصفري)"""
+    return bytes(blob[:1]) != MAGIC[:1]
+
+
+def default_codec() -> int:
+    return CODEC_ZSTD if zstd_available else CODEC_ZLIB
+
+
+def train_dictionary(samples: Iterable[bytes], codec: Optional[int] = None,
+                     size: int = DEFAULT_DICTIONARY_SIZE) -> bytes:
+    """
+    تدريب قاموس ضغط على عينات من المدونة.
+    zstd: خوارزمية COVER في المكتبة. zlib: أكثر الكلمات تكراراً، الأكثر تكراراً
+    في آخر القاموس (أقصر مسافة إشارة)، ضمن نافذة zlib.
+    """
+    codec = default_codec() if codec is None else codec
+    samples = [sample for sample in samples if sample]
+    if not samples:
+        return b""
+    if codec == CODEC_ZSTD:
+        if not zstd_available:
+            raise RuntimeError("مكتبة zstandard غير متوفرة")
+        try:
+            return zstandard.train_dictionary(size, samples).as_bytes()
+        except zstandard.ZstdError:
+            # عينات أقل من حاجة المدرّب: يُكتفى بطريقة zlib
+            pass
+    counts = Counter(word for sample in samples for word in sample.split())
+    dictionary = bytearray()
+    limit = min(size, _ZLIB_WINDOW)
+    for word, _ in counts.most_common():
+        if len(dictionary) + len(word) + 1 > limit:
+            break
+        dictionary[:0] = word + b" "
+    return bytes(dictionary)
+
+
+class BlobCodec:
+    """
+    ضغط وتشفير كتل المحتوى، مع قراءة رموز Fernet القديمة.
+    """
+
+    def __init__(self, secret: Union[str, bytes], codec: Optional[int] = None, level: Optional[int] = None):
+        """
+        :param secret: المفتاح السري (مفتاح Fernet)؛ يُشتق منه مفتاح AES-256 مستقل.
+        :param codec: CODEC_ZSTD أو CODEC_ZLIB أو CODEC_NONE (الافتراضي zstd إن توفر).
+        :param level: مستوى الضغط.
+        """
+        if isinstance(secret, str):
+            secret = secret.encode("utf-8")
+        self.codec = default_codec() if codec is None else codec
+        if self.codec == CODEC_ZSTD and not zstd_available:
+            raise RuntimeError("مكتبة zstandard غير متوفرة")
+        self.level = level
+        self._aead = AESGCM(hmac.new(secret, b"manhal-blob-key:v1", hashlib.sha256).digest())
+        self._fernet = Fernet(secret)
+        self._dictionaries: Dict[int, bytes] = {}
+        self._zstd_dictionaries: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self.dictionary_id = 0
+
+    def add_dictionary(self, dict_id: int, data: bytes, active: bool = True):
+        """تسجيل قاموس ضغط؛ القاموس النشط يُستخدم للكتل الجديدة."""
+        self._dictionaries[dict_id] = data
+        if zstd_available:
+            self._zstd_dictionaries[dict_id] = zstandard.ZstdCompressionDict(data)
+        if active:
+            self.dictionary_id = dict_id
+
+    def _compress(self, data: bytes) -> bytes:
+        dictionary = self._dictionaries.get(self.dictionary_id)
+        if self.codec == CODEC_ZSTD:
+            compressor = zstandard.ZstdCompressor(
+                level=self.level or DEFAULT_ZSTD_LEVEL,
+                dict_data=self._zstd_dictionaries.get(self.dictionary_id)
+            )
+            return compressor.compress(data)
+        if self.codec == CODEC_ZLIB:
+            level = self.level or DEFAULT_ZLIB_LEVEL
+            compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+            return compressor.compress(data) + compressor.flush()
+        return data
+
+    def _decompress(self, codec: int, dict_id: int, data: bytes) -> bytes:
+        if dict_id and dict_id not in self._dictionaries:
+            raise InvalidToken(f"قاموس الضغط {dict_id} غير متوفر")
+        if codec == CODEC_ZSTD:
+            if not zstd_available:
+                raise RuntimeError("مكتبة zstandard غير متوفرة لقراءة كتلة مضغوطة بـ zstd")
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._zstd_dictionaries.get(dict_id))
+            return decompressor.decompress(data)
+        if codec == CODEC_ZLIB:
+            decompressor = zlib.decompressobj(zdict=self._dictionaries[dict_id]) if dict_id else zlib.decompressobj()
+            return decompressor.decompress(data) + decompressor.flush()
+        if codec == CODEC_NONE:
+            return data
+        raise InvalidToken(f"ضاغط غير معروف: {codec}")
+
+    def seal(self, data: bytes, compress: bool = True, associated_data: bytes = b"") -> bytes:
+        """
+        ضغط البيانات ثم تشفيرها (تُخزن دون ضغط إذا لم يُصغّرها الضغط).
+        :param associated_data: بيانات غير مخزنة في الكتلة يُصادق عليها مع الترويسة
+                                (تربط الكتلة بسياقها)، ويلزم تمريرها نفسها إلى open().
+        """
+        codec, dict_id = (self.codec, self.dictionary_id) if compress else (CODEC_NONE, 0)
+        payload = self._compress(data) if codec != CODEC_NONE else data
+        if len(payload) >= len(data):
+            codec, dict_id, payload = CODEC_NONE, 0, data
+        header = _HEADER.pack(MAGIC, VERSION, codec, dict_id if codec != CODEC_NONE else 0)
+        nonce = os.urandom(_NONCE_SIZE)
+        return header + nonce + self._aead.encrypt(nonce, payload, header + associated_data)
+
+    def open(self, blob: bytes, associated_data: Optional[bytes] = None) -> bytes:
+        """
+        فك تشفير كتلة بأي من الصيغتين وفك ضغطها.
+        :param associated_data: كما مُررت إلى seal(). إذا مُررت لا تُقبل رموز Fernet
+                                القديمة (لا تحمل بيانات مصادقة إضافية).
+        :raises InvalidToken: عند فشل المصادقة أو تلف الكتلة.
+        """
+        blob = bytes(blob)
+        if is_legacy(blob):
+            if associated_data is not None:
+                raise InvalidToken("كتلة بالصيغة القديمة في موضع يتطلب الصيغة الجديدة")
+            return self._fernet.decrypt(blob)
+        if len(blob) < _HEADER.size + _NONCE_SIZE:
+            raise InvalidToken("كتلة مشفرة مقطوعة")
+        header = blob[:_HEADER.size]
+        magic, version, codec, dict_id = _HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise InvalidToken(f"صيغة كتلة غير مدعومة: {magic!r} {version}")
+        nonce = blob[_HEADER.size:_HEADER.size + _NONCE_SIZE]
+        try:
+            payload = self._aead.decrypt(nonce, blob[_HEADER.size + _NONCE_SIZE:], header + (associated_data or b""))
+        except InvalidTag:
+            raise InvalidToken("فشل التحقق من الكتلة المشفرة") from None
+        return self._decompress(codec, dict_id, payload)
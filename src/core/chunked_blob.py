@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+chunked_blob.py
+==================
+تخزين المستندات الكبيرة مقطّعة: أجزاء ثابتة الحجم من النص الصريح، كل جزء
+مضغوط ومشفّر وحده بـ BlobCodec (AES-GCM)، فيُقرأ مقطع من المستند بفك تشفير
+الأجزاء التي تغطيه فقط، وتُشفَّر الأجزاء ويُفك تشفيرها بالتوازي.
+
+سلامة المحتوى بشجرة بصمات (Merkle): ورقة لكل جزء (SHA-256 لنصه الصريح) وجذر
+فوقها. يُخزن في صف المستند بيان مشفّر فيه الأوراق وعدد أحرف كل جزء، مصادَق
+عليه مع بصمة المستند فلا يُنقل إلى صف آخر. ويُصادق كل جزء مع الجذر ورقمه وعدد
+الأجزاء، فلا تُبدَّل الأجزاء أو يُعاد ترتيبها أو يُحذف آخرها دون كشف ذلك.
+بعد فك تشفير الجزء يُقارن بورقته، بدلاً من تجزئة المستند كاملاً عند كل قراءة.
+
+تُقطع الأجزاء عند حدود أحرف UTF-8، فيُفك ترميز كل جزء وحده.
+"""
+
+import os
+import struct
+import hashlib
+import threading
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from cryptography.fernet import InvalidToken
+
+from core.batch import resolve_workers
+from core.blob_format import BlobCodec, is_legacy
+
+CHUNKED_MAGIC = b"\x00MC"
+
+# حجم الجزء من النص الصريح بالبايت؛ المستندات الأصغر تُخزن كتلة واحدة
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# أصغر حجم يضمن جزءاً غير فارغ (أطول حرف UTF-8 أربعة بايتات)
+_MIN_CHUNK_SIZE = 4
+
+_COUNT = struct.Struct(">I")
+# ورقة الجزء وعدد أحرفه
+_ENTRY = struct.Struct(">32sI")
+# جذر الشجرة ورقم الجزء وعدد الأجزاء
+_CHUNK_AAD = struct.Struct(">32sII")
+
+
+def is_chunked(blob: bytes) -> bool:
+    """هل محتوى صف المستند بيان أجزاء؟"""
+    return bytes(blob[:len(CHUNKED_MAGIC)]) == CHUNKED_MAGIC
+
+
+def split_chunks(data: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[bytes]:
+    """تقسيم نص UTF-8 إلى أجزاء لا تتجاوز chunk_size دون قطع حرف."""
+    chunk_size = max(chunk_size, _MIN_CHUNK_SIZE)
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = min(start + chunk_size, len(data))
+        # التراجع عن بايتات الاستمرار (10xxxxxx) إلى بداية الحرف
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        chunks.append(data[start:end])
+        start = end
+    return chunks
+
+
+def chunk_leaf(chunk: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + chunk).digest()
+
+
+def merkle_root(leaves: Sequence[bytes]) -> bytes:
+    """جذر شجرة Merkle (تُكرَّر آخر عقدة في المستويات الفردية)."""
+    level = list(leaves) or [chunk_leaf(b"")]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [
+            hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest()
+            for i in range(0, len(level), 2)
+        ]
+    return level[0]
+
+
+class ChunkManifest:
+    """
+    بيان مستند مقطّع: أوراق الشجرة وجذرها وموضع أول حرف في كل جزء.
+    """
+
+    def __init__(self, leaves: List[bytes], char_counts: List[int]):
+        self.leaves = leaves
+        self.char_counts = char_counts
+        self.root = merkle_root(leaves)
+        self.offsets = [0]
+        for count in char_counts:
+            self.offsets.append(self.offsets[-1] + count)
+
+    @property
+    def count(self) -> int:
+        return len(self.leaves)
+
+    @property
+    def length(self) -> int:
+        """عدد أحرف المستند."""
+        return self.offsets[-1]
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        """أرقام أول جزء وآخر جزء يغطيان الأحرف [start, end) (end > start)."""
+        first = bisect_right(self.offsets, start) - 1
+        last = bisect_right(self.offsets, end - 1) - 1
+        return first, min(last, self.count - 1)
+
+
+class ChunkedCodec:
+    """
+    تقطيع المحتوى وتشفير أجزائه وفك تشفيرها بالتوازي.
+    """
+
+    def __init__(self, blob_codec: BlobCodec, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 workers: Optional[int] = None):
+        """
+        :param chunk_size: حجم الجزء بالبايت؛ المحتوى الأكبر منه يُقطَّع (0 يعطّل التقطيع).
+        :param workers: عدد خيوط التشفير؛ الافتراضي عدد أنوية المعالج.
+        """
+        self.blob_codec = blob_codec
+        self.chunk_size = chunk_size
+        self.workers = resolve_workers(workers, os.cpu_count() or 1)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = os.getpid()
+
+    def should_chunk(self, data: bytes) -> bool:
+        return 0 < self.chunk_size < len(data)
+
+    def _map(self, func: Callable, items: Sequence) -> List:
+        # AES-GCM والضغط يحرران قفل المفسر، فتتوازى الخيوط فعلاً
+        if len(items) < 2 or self.workers < 2:
+            return [func(item) for item in items]
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="chunk-codec")
+                self._pid = os.getpid()
+            executor = self._executor
+        return list(executor.map(func, items))
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown()
+
+    def seal(self, data: bytes, content_hash: str) -> Tuple[bytes, List[bytes]]:
+        """
+        :return: (البيان المشفّر لصف المستند، الأجزاء المشفّرة بالترتيب).
+        """
+        chunks = split_chunks(data, self.chunk_size)
+        entries = self._map(lambda chunk: (chunk_leaf(chunk), len(chunk.decode("utf-8"))), chunks)
+        manifest = ChunkManifest([leaf for leaf, _ in entries], [chars for _, chars in entries])
+        sealed = self._map(
+            lambda index: self.blob_codec.seal(
+                chunks[index], associated_data=_CHUNK_AAD.pack(manifest.root, index, manifest.count)
+            ),
+            range(len(chunks))
+        )
+        payload = _COUNT.pack(manifest.count) + b"".join(_ENTRY.pack(*entry) for entry in entries)
+        header = self.blob_codec.seal(payload, compress=False, associated_data=content_hash.encode("ascii"))
+        return CHUNKED_MAGIC + header, sealed
+
+    def open_manifest(self, blob: bytes, content_hash: str) -> ChunkManifest:
+        """
+        :raises InvalidToken: إذا لم يكن البيان لهذا المستند أو كان تالفاً.
+        """
+        blob = bytes(blob)
+        if not is_chunked(blob):
+            raise InvalidToken("المحتوى ليس بيان أجزاء")
+        payload = self.blob_codec.open(blob[len(CHUNKED_MAGIC):], associated_data=content_hash.encode("ascii"))
+        count = _COUNT.unpack_from(payload)[0] if len(payload) >= _COUNT.size else -1
+        if count < 1 or len(payload) != _COUNT.size + count * _ENTRY.size:
+            raise InvalidToken("بيان أجزاء تالف")
+        entries = list(_ENTRY.iter_unpack(payload[_COUNT.size:]))
+        return ChunkManifest([leaf for leaf, _ in entries], [chars for _, chars in entries])
+
+    def open_chunks(self, manifest: ChunkManifest, first: int, last: int,
+                    chunks: Iterable[Tuple[int, bytes]]) -> bytes:
+        """
+        فك تشفير الأجزاء first..last من صفوف (الرقم، الكتلة) بالتوازي والتحقق من أوراقها.
+        :raises InvalidToken: عند فشل المصادقة أو اختلاف ورقة أو نقص جزء.
+        """
+        chunks = list(chunks)
+        if [index for index, _ in chunks] != list(range(first, last + 1)):
+            raise InvalidToken("أجزاء المستند ناقصة")
+        return b"".join(self._map(lambda chunk: self._open_chunk(manifest, *chunk), chunks))
+
+    def _open_chunk(self, manifest: ChunkManifest, index: int, blob: bytes) -> bytes:
+        if not 0 <= index < manifest.count or is_legacy(blob):
+            raise InvalidToken(f"جزء غير صالح: {index}")
+        data = self.blob_codec.open(blob, associated_data=_CHUNK_AAD.pack(manifest.root, index, manifest.count))
+        if chunk_leaf(data) != manifest.leaves[index]:
+            raise InvalidToken(f"بصمة الجزء {index} غير متطابقة - تلاعب محتمل")
+        return data
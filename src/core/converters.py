@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+converters.py
+==================
+مجمّع المحوّلات الخارجية (antiword وtextract) لاستخراج نصوص ملفات Word القديمة
+وOpenDocument.
+
+- تزامن محدود: لا يعمل أكثر من max_workers محوّلاً في آن واحد، والطلبات الزائدة
+  تنتظر في الطابور (ويُقاس عمقه).
+- مهلة لكل مهمة: المحوّل المعلّق يُقتل مع العمليات التي أطلقها (مجموعة عملياته)
+  بدلاً من حجز العامل إلى الأبد.
+- حدود موارد لكل عملية محوّل على أنظمة POSIX: الذاكرة الافتراضية ووقت المعالج،
+  تضبطها صدفة sh على نفسها (ulimit) ثم تستبدل نفسها بالمحوّل (exec)، لا preexec_fn
+  غير الآمنة في عملية متعددة الخيوط.
+- يعمل المحوّل على مسار الملف المصدر مباشرة (مساراً مطلقاً)، فلا تتشارك المهام
+  ملفاً مؤقتاً ثابتاً.
+- textract مكتبة Python لا برنامج: يعمل في عمليات خادمة طويلة العمر تستورده مرة
+  واحدة وتعالج الملفات واحداً بعد الآخر، وتُستبدل العملية بعد فشل أو انتهاء مهلة
+  أو بعد max_jobs مهمة.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import signal
+import logging
+import threading
+import subprocess
+import importlib.util
+from queue import Empty, Queue
+from typing import Dict, List, Optional, Sequence
+
+# صدفة ضبط حدود الموارد (أنظمة POSIX فقط)
+_LIMIT_SHELL = shutil.which("sh") if os.name == "posix" else None
+
+# textract يُستورد في العمليات الخادمة فقط
+textract_available = importlib.util.find_spec("textract") is not None
+
+# المهلة الافتراضية لكل مهمة تحويل (بالثواني)
+DEFAULT_TIMEOUT = 120
+# حد ذاكرة عملية المحوّل (بالبايت؛ 0 دون حد)
+DEFAULT_MEMORY_LIMIT = 1024 * 1024 * 1024
+# عدد المهام قبل استبدال العملية الخادمة (يحد من تسرب الذاكرة في المكتبات)
+DEFAULT_MAX_JOBS = 200
+# عدد المحوّلات المتزامنة الافتراضي: نصف الأنوية، فالتحويل يتشارك الأجهزة مع OCR
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+
+# ترويسة رد العملية الخادمة: الحالة (0 نجاح، 1 خطأ) وطول البيانات
+_REPLY = struct.Struct(">BQ")
+
+# العملية الخادمة: تقرأ طلبات JSON ‏[المسار، الامتداد] سطراً سطراً وترد بالترويسة
+# ثم البايتات.
+# المخرج القياسي الأصلي محجوز للردود، وما تطبعه المكتبات يُحوَّل إلى stderr.
+_TEXTRACT_SERVER = r"""
+import os, sys, json, struct
+out = os.fdopen(os.dup(1), "wb")
+os.dup2(2, 1)
+import textract
+for line in sys.stdin:
+    try:
+        path, extension = json.loads(line)
+        data, status = textract.process(path, extension=extension), 0
+    except Exception as e:
+        data, status = f"{type(e).__name__}: {e}".encode("utf-8", "replace"), 1
+    out.write(struct.pack(">BQ", status, len(data)) + data)
+    out.flush()
+"""
+
+
+class ConverterError(RuntimeError):
+    """فشل محوّل خارجي (خطأ أو رمز خروج غير صفري أو تجاوز المهلة)."""
+
+
+class ConverterTimeout(ConverterError):
+    """تجاوز المحوّل مهلة المهمة فأُوقف."""
+
+
+def _limited(argv: Sequence[str], memory_limit: int, cpu_seconds: Optional[int]) -> List[str]:
+    """
+    الأمر مغلّفاً بـ sh تضبط حدود الذاكرة ووقت المعالج ثم تنفّذه بـ exec، فتسري
+    الحدود عليه وعلى ما يطلقه من أول تعليمة.
+    :raises FileNotFoundError: إذا لم يكن البرنامج مثبتاً.
+    """
+    argv = list(argv)
+    executable = shutil.which(argv[0])
+    if executable is None:
+        raise FileNotFoundError(f"المحوّل غير مثبت: {argv[0]}")
+    argv[0] = executable
+    limits = []
+    if memory_limit:
+        limits.append(f"ulimit -v {max(1, memory_limit // 1024)} 2>/dev/null")
+    if cpu_seconds:
+        limits.append(f"ulimit -t {cpu_seconds} 2>/dev/null")
+    if _LIMIT_SHELL is None or not limits:
+        return argv
+    return [_LIMIT_SHELL, "-c", "; ".join(limits + ['exec "$@"']), "converter"] + argv
+
+
+def _popen_options() -> Dict:
+    """خيارات Popen: مجموعة عمليات مستقلة تُقتل كاملة عند المهلة."""
+    if os.name != "posix":
+        return {"creationflags": getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)}
+    return {"start_new_session": True}
+
+
+def _kill(process: subprocess.Popen):
+    """قتل عملية المحوّل وما أطلقته من عمليات."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.wait()
+
+
+class _TextractServer:
+    """عملية textract خادمة واحدة، يقرأ خيط ردودها إلى طابور لتطبيق المهلة."""
+
+    def __init__(self, memory_limit: int):
+        self.process = subprocess.Popen(
+            _limited([sys.executable, "-c", _TEXTRACT_SERVER], memory_limit, None),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            **_popen_options()
+        )
+        self.jobs = 0
+        self._replies = Queue()
+        threading.Thread(target=self._read_replies, name="textract-reader", daemon=True).start()
+
+    def _read_replies(self):
+        stdout = self.process.stdout
+        while True:
+            header = stdout.read(_REPLY.size)
+            if len(header) < _REPLY.size:
+                break
+            status, size = _REPLY.unpack(header)
+            data = stdout.read(size)
+            if len(data) < size:
+                break
+            self._replies.put((status, data))
+        self._replies.put(None)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def process_file(self, path: str, extension: Optional[str], timeout: float) -> bytes:
+        self.jobs += 1
+        try:
+            self.process.stdin.write(json.dumps([path, extension]).encode("utf-8") + b"\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise ConverterError(f"توقفت عملية textract: {e}")
+        try:
+            reply = self._replies.get(timeout=timeout)
+        except Empty:
+            self.close()
+            raise ConverterTimeout(f"تجاوز textract المهلة ({timeout} ثانية): {path}")
+        if reply is None:
+            raise ConverterError(f"توقفت عملية textract (رمز الخروج {self.process.wait()}): {path}")
+        status, data = reply
+        if status:
+            raise ConverterError(data.decode("utf-8", errors="replace"))
+        return data
+
+    def close(self):
+        if self.alive():
+            _kill(self.process)
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class ConverterPool:
+    """
+    تشغيل المحوّلات الخارجية بتزامن محدود ومهلة وحدود موارد لكل مهمة.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: float = DEFAULT_TIMEOUT,
+                 memory_limit: int = DEFAULT_MEMORY_LIMIT, max_jobs: int = DEFAULT_MAX_JOBS):
+        """
+        :param workers: أقصى عدد محوّلات متزامنة؛ الافتراضي DEFAULT_WORKERS.
+        :param timeout: مهلة المهمة الافتراضية بالثواني.
+        :param memory_limit: حد ذاكرة عملية المحوّل بالبايت (0 دون حد؛ POSIX فقط).
+        :param max_jobs: عدد المهام قبل استبدال عملية textract الخادمة.
+        """
+        self.workers = max(1, workers or DEFAULT_WORKERS)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_jobs = max_jobs
+        self._reset()
+
+    def _reset(self):
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self._idle: List[_TextractServer] = []
+        self._closed = False
+        self._pid = os.getpid()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.seconds = 0.0
+
+    def _check_process(self):
+        """
+        بعد النسخ (fork) تبقى عمليات textract الخاملة وخيوط قراءة ردودها للعملية
+        الأم، وقد يكون القفل والمنافذ ممسوكة لحظة النسخ: تبدأ العملية الابنة بحالة
+        جديدة دون أن تغلق خوادم الأم.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+
+    # --- الإحصاءات ---
+
+    def _enter(self):
+        self._check_process()
+        with self._lock:
+            if self._closed:
+                raise ConverterError("مجمّع المحوّلات مغلق")
+            self.waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+        return time.perf_counter()
+
+    def _leave(self, started: float, error: Optional[Exception]):
+        with self._lock:
+            self.running -= 1
+            self.seconds += time.perf_counter() - started
+            if error is not None:
+                logging.warning(f"فشل محوّل خارجي: {error}")
+                self.failures += 1
+                self.timeouts += isinstance(error, ConverterTimeout)
+            else:
+                self.completed += 1
+        self._slots.release()
+
+    def stats(self) -> Dict:
+        """عمق الطابور والمهام الجارية والمكتملة والفاشلة (ومنها المنتهية مهلتها)."""
+        self._check_process()
+        with self._lock:
+            return {
+                "workers": self.workers, "queued": self.waiting, "running": self.running,
+                "completed": self.completed, "failures": self.failures, "timeouts": self.timeouts,
+                "idle_servers": len(self._idle), "seconds": self.seconds
+            }
+
+    # --- التشغيل ---
+
+    def run(self, argv: Sequence[str], timeout: Optional[float] = None) -> bytes:
+        """
+        تشغيل برنامج محوّل وإرجاع مخرجه القياسي.
+        :raises FileNotFoundError: إذا لم يكن البرنامج مثبتاً (لا يُحسب فشلاً).
+        :raises ConverterTimeout: إذا تجاوز المهلة (يُقتل مع عملياته الفرعية).
+        :raises ConverterError: إذا خرج برمز غير صفري.
+        """
+        timeout = timeout or self.timeout
+        command = _limited(argv, self.memory_limit, int(timeout) + 1)
+        started, error = self._enter(), None
+        try:
+            process = subprocess.Popen(
+                command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                **_popen_options()
+            )
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill(process)
+                process.communicate()
+                raise ConverterTimeout(f"تجاوز {argv[0]} المهلة ({timeout} ثانية)")
+            if process.returncode:
+                message = stderr.decode("utf-8", errors="replace").strip()
+                raise ConverterError(f"{argv[0]} خرج بالرمز {process.returncode}: {message}")
+            return stdout
+        except ConverterError as e:
+            error = e
+            raise
+        finally:
+            self._leave(started, error)
+
+    def antiword(self, path: str, timeout: Optional[float] = None) -> str:
+        """نص ملف Word 97-2003 عبر antiword."""
+        output = self.run(["antiword", os.path.abspath(path)], timeout)
+        return output.decode("utf-8", errors="ignore")
+
+    def textract(self, path: str, extension: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        """
+        نص ملف عبر textract في عملية خادمة من المجمّع.
+        :param extension: نوع الملف لـ textract (مثل "odt")؛ الافتراضي امتداد المسار،
+                          فيلزم للملفات بلا امتداد أو بامتداد خاطئ.
+        """
+        if not textract_available:
+            raise RuntimeError("مكتبة textract غير متوفرة")
+        timeout = timeout or self.timeout
+        started, error = self._enter(), None
+        server = None
+        try:
+            server = self._checkout()
+            data = server.process_file(os.path.abspath(path), extension, timeout)
+            return data.decode("utf-8", errors="ignore")
+        except ConverterError as e:
+            error = e
+            raise
+        finally:
+            if server is not None:
+                self._checkin(server)
+            self._leave(started, error)
+
+    def _checkout(self) -> _TextractServer:
+        with self._lock:
+            while self._idle:
+                server = self._idle.pop()
+                if server.alive():
+                    return server
+                server.close()
+        return _TextractServer(self.memory_limit)
+
+    def _checkin(self, server: _TextractServer):
+        with self._lock:
+            if server.alive() and server.jobs < self.max_jobs and not self._closed:
+                self._idle.append(server)
+                return
+        server.close()
+
+    def close(self):
+        self._check_process()
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for server in idle:
+            server.close()
+
+
+_POOL: Optional[ConverterPool] = None
+_POOL_PID: Optional[int] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_converter_pool() -> ConverterPool:
+    """المجمّع المشترك بالإعدادات الافتراضية (يُنشأ مرة واحدة لكل عملية)."""
+    global _POOL, _POOL_PID
+    if _POOL is None or _POOL_PID != os.getpid():
+        with _POOL_LOCK:
+            if _POOL is None or _POOL_PID != os.getpid():
+                _POOL = ConverterPool()
+                _POOL_PID = os.getpid()
+    return _POOL
@@ -6,33 +6,158 @@ database.py
 مدير قاعدة البيانات مع دعم التشفير وتسجيل التدقيق الأمني
 """
 
+import json
+import time
 import sqlite3
 import logging
+import threading
 import hashlib
+from collections import Counter
+from itertools import islice
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Callable, Iterable, Iterator, Optional, List, Dict, Tuple
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from cryptography.fernet import Fernet, InvalidToken
+from core.audit import AuditWriter, DEFAULT_FLUSH_INTERVAL, SYNC_EVENTS
+from core.batch import resolve_workers
+from core.blob_format import BlobCodec, CODEC_NAMES, MAGIC, train_dictionary
+from core.chunked_blob import ChunkedCodec, DEFAULT_CHUNK_SIZE, is_chunked
+from core.db_pool import ConnectionPool
+from core.doc_cache import DocumentCache, DEFAULT_MAX_BYTES
+from core.numerology import get_abjad_engine
+from core.keywords import CorpusStats
+from core.search_index import SearchTokenizer
+from core.term_hashing import TermHasher
+from core.text_processing import candidate_terms, word_counts
 from utils.security import SECRET_KEY, DATA_DIR
 
+# محاولة استيراد msgpack لتسلسل نتائج التحليل (اختياري، وإلا JSON)
+try:
+    import msgpack
+    msgpack_available = True
+except ImportError:
+    msgpack_available = False
+
+# أطول سلسلة كلمات متتالية تُفهرس قيمة جُمَّلها
+ABJAD_MAX_PHRASE_LENGTH = 3
+
+# أنواع الملفات المسموح بها (مطابقة لقيد CHECK في جدول documents)
+FILE_TYPES = ('DOC', 'PDF', 'TXT', 'IMG')
+
+# عدد المستندات في كل معاملة عند الحفظ الجماعي
+SAVE_BATCH_SIZE = 500
+
+# أقصى عدد مطابقات تُرتب بـ BM25 معاً في البحث النصي؛ الكلمات الشائعة جداً تُرتب
+# ضمن أحدث المستندات المطابقة فقط حتى يبقى زمن الاستعلام محدوداً (iter_search
+# يتابع بعدها نافذة بعد نافذة)
+SEARCH_MAX_RANKED = 20000
+
+# أكبر معرّف صف في SQLite: الحد الأعلى لنافذة البحث الأحدث
+_MAX_ROWID = 2 ** 63 - 1
+
+# حجم دفعة ترحيل المحتوى إلى صيغة التخزين الجديدة، وعدد عينات تدريب قاموس الضغط
+MIGRATION_BATCH_SIZE = 200
+DICTIONARY_SAMPLES = 2000
+
+# حجم دفعة المرور على المستندات في iter_documents، وأعمدتها المتاحة
+ITER_BATCH_SIZE = 500
+DOCUMENT_COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "content": "content",
+    "hash": "sha256_hash",
+    "file_type": "file_type",
+    "created_at": "created_at",
+}
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _plain(value):
+    # قيم NumPy والمجموعات في نتائج التحليل
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"قيمة لا يمكن تسلسلها: {type(value).__name__}")
+
+
+def _pack_result(result: dict) -> Tuple[str, bytes]:
+    """تسلسل نتيجة تحليل: (الصيغة، البايتات)."""
+    if msgpack_available:
+        return "msgpack", msgpack.packb(result, default=_plain, use_bin_type=True)
+    return "json", json.dumps(result, ensure_ascii=False, default=_plain).encode("utf-8")
+
+
+def _unpack_result(payload_format: str, payload: bytes) -> Optional[dict]:
+    if payload_format == "msgpack":
+        # صيغة غير مقروءة دون المكتبة: تُعامل كنتيجة غير محفوظة
+        return msgpack.unpackb(payload, raw=False) if msgpack_available else None
+    return json.loads(payload.decode("utf-8"))
+
+
 class DatabaseManager:
     """
     مدير قاعدة البيانات لتخزين واسترجاع المستندات بأمان باستخدام `AES-256`
     """
 
-    def __init__(self, db_name: str = "manhal_ai.db"):
+    def __init__(self, db_name: str = "manhal_ai.db", abjad_phrase_length: int = ABJAD_MAX_PHRASE_LENGTH,
+                 document_cache_bytes: int = DEFAULT_MAX_BYTES, document_cache_ttl: Optional[float] = None,
+                 document_cache_policy: str = "tinylfu", document_cache_wipe: bool = False,
+                 storage_codec: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 audit_overflow: str = "block", audit_flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 audit_sync_events: Iterable[str] = SYNC_EVENTS, **pool_options):
+        """
+        :param document_cache_bytes: حجم ذاكرة المستندات المفكوك تشفيرها بالبايت (0 يعطّلها).
+        :param document_cache_ttl: مدة صلاحية المستند في الذاكرة بالثواني (None: دون انتهاء).
+        :param document_cache_policy: "tinylfu" أو "lru" (انظر core.doc_cache).
+        :param document_cache_wipe: تصفير نسخة المحتوى المخزنة عند إزالتها من الذاكرة.
+        :param storage_codec: ضاغط المحتوى قبل التشفير: "zstd" أو "zlib" أو "none"
+                              (الافتراضي zstd إن توفرت مكتبته، انظر core.blob_format).
+        :param chunk_size: المستندات الأكبر من هذا الحجم (بالبايت) تُخزن أجزاءً مشفرة
+                           مستقلة تُقرأ منها مقاطع دون فك تشفير الباقي (0 يعطّل التقطيع،
+                           انظر core.chunked_blob).
+        :param audit_overflow: سلوك سجل التدقيق عند امتلاء طابوره: "block" أو "drop".
+        :param audit_flush_interval: أقصى مدة (بالثواني) تنتظرها دفعة التدقيق قبل كتابتها.
+        :param audit_sync_events: أحداث تدقيق تُكتب وتُثبَّت فوراً (انظر core.audit).
+        :param pool_options: إعدادات مجمّع الاتصالات (synchronous، cache_size، mmap_size،
+                             journal_mode، secure_delete...) كما في core.db_pool.ConnectionPool.
+        """
+        if storage_codec and storage_codec not in CODEC_NAMES:
+            raise ValueError(f"ضاغط تخزين غير معروف: {storage_codec} (المتاح: {', '.join(CODEC_NAMES)})")
         self.db_path = Path(DATA_DIR) / db_name
-        self._init_encryption()
+        self.abjad_phrase_length = abjad_phrase_length
+        self.pool = ConnectionPool(self.db_path, **pool_options)
+        self.audit = AuditWriter(
+            self.pool, flush_interval=audit_flush_interval, overflow=audit_overflow, sync_events=audit_sync_events
+        )
+        self.document_cache = DocumentCache(
+            document_cache_bytes, ttl=document_cache_ttl,
+            policy=document_cache_policy, wipe=document_cache_wipe
+        )
+        self._init_encryption(storage_codec, chunk_size)
         self._init_db_schema()
+        self._load_dictionaries()
 
-    def _init_encryption(self):
+    def _init_encryption(self, storage_codec: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
         """
         تهيئة نظام التشفير مع التحقق من المفتاح السري
         """
         try:
             self.cipher = Fernet(SECRET_KEY)
-            test_token = self.cipher.encrypt(b"test")
-            assert self.cipher.decrypt(test_token) == b"test"
+            # صيغة التخزين: ضغط ثم AES-GCM، مع قراءة رموز Fernet القديمة
+            self.blob_codec = BlobCodec(SECRET_KEY, CODEC_NAMES[storage_codec] if storage_codec else None)
+            test_token = self.blob_codec.seal(b"test")
+            assert self.blob_codec.open(test_token) == b"test"
+            # المستندات الكبيرة: أجزاء مشفرة مستقلة وشجرة بصمات
+            self.chunked_codec = ChunkedCodec(self.blob_codec, chunk_size)
+            # بصمات الكلمات لإحصاءات المدونة (لا تُخزن الكلمات نفسها)
+            self.term_hasher = TermHasher(SECRET_KEY, b"corpus-stats")
+            # بصمات كلمات فهرس البحث النصي (مفتاح مشتق مستقل)
+            self.search_tokenizer = SearchTokenizer(SECRET_KEY)
         except (ValueError, InvalidToken) as e:
             logging.critical(f"فشل تهيئة التشفير: {e}")
             raise RuntimeError("خطأ في تكوين المفتاح السري") from e
@@ -40,19 +165,28 @@ class DatabaseManager:
     @contextmanager
     def _db_connection(self):
         """
-        إدارة اتصال آمن بقاعدة البيانات
+        اتصال الخيط الحالي من المجمّع؛ تُلغى أي معاملة غير مكتملة عند حدوث خطأ
+        حتى لا تبقى معلّقة على الاتصال المشترك.
         """
-        conn = sqlite3.connect(
-            self.db_path,
-            timeout=20,
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
+        conn = self.pool.connection()
         try:
-            conn.execute("PRAGMA foreign_keys = ON")
-            conn.execute("PRAGMA secure_delete = ON")
             yield conn
-        finally:
-            conn.close()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """إغلاق اتصالات قاعدة البيانات (تُغلق تلقائياً أيضاً عند خروج البرنامج)."""
+        self.document_cache.clear()
+        self.chunked_codec.close()
+        self.audit.close()
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def _init_db_schema(self):
         """
@@ -78,37 +212,338 @@ class DatabaseManager:
                 );
 
                 CREATE INDEX IF NOT EXISTS idx_docs_title ON documents(title);
+                CREATE INDEX IF NOT EXISTS idx_docs_hash ON documents(sha256_hash);
+
+                -- أجزاء المستندات الكبيرة المشفرة (محتوى صف المستند بيانها، انظر core.chunked_blob)
+                CREATE TABLE IF NOT EXISTS document_chunks (
+                    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                    idx INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (document_id, idx)
+                );
+
+                -- عناوين إضافية لمستند موجود (ملف بالمحتوى نفسه رُفع باسم آخر)
+                CREATE TABLE IF NOT EXISTS document_aliases (
+                    title TEXT PRIMARY KEY,
+                    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+
+                -- بصمات بايتات الملفات الأصلية: يُعرف الملف المرفوع سابقاً قبل استخراج نصه
+                CREATE TABLE IF NOT EXISTS document_sources (
+                    source_hash TEXT PRIMARY KEY,
+                    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE
+                );
+
+                -- فهرس عكسي لقيم الجُمَّل: يخزن مواضع الكلمات وسلاسلها فقط دون نصوصها
+                CREATE TABLE IF NOT EXISTS abjad_index (
+                    value INTEGER NOT NULL,
+                    length INTEGER NOT NULL,
+                    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    PRIMARY KEY (value, length, document_id, position)
+                ) WITHOUT ROWID;
+
+                CREATE INDEX IF NOT EXISTS idx_abjad_document ON abjad_index(document_id);
+
+                -- إحصاءات المدونة: تكرار الوثائق لكل بصمة كلمة، وعدد المستندات ومجموع كلماتها
+                CREATE TABLE IF NOT EXISTS term_stats (
+                    term_hash INTEGER PRIMARY KEY,
+                    df INTEGER NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS corpus_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+
+                -- قواميس الضغط المدرّبة على المدونة (مشفرة: قد تحوي مقاطع من النصوص)
+                CREATE TABLE IF NOT EXISTS compression_dictionaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+
+                -- نتائج التحليل (مضغوطة ومشفرة) لكل بصمة محتوى ومحلل وإصدار إعداداته
+                CREATE TABLE IF NOT EXISTS analysis_results (
+                    content_hash TEXT NOT NULL,
+                    analyzer TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    result BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (content_hash, analyzer, version)
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_analysis_version ON analysis_results(analyzer, version);
+
+                -- فهرس البحث النصي: بصمات الكلمات فقط (جدول بلا محتوى، rowid = معرّف المستند)
+                CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                    title, terms, prefixes,
+                    content = '',
+                    tokenize = 'ascii'
+                );
             ''')
             conn.commit()
 
-    def save_document(self, title: str, content: str, file_type: str) -> bool:
+    def save_document(self, title: str, content: str, file_type: str, source_hash: Optional[str] = None) -> bool:
         """
-        حفظ مستند جديد مع التحقق من التكامل
+        حفظ مستند جديد مع التحقق من التكامل (انظر ingest_document).
         """
-        try:
-            encrypted_content = self.cipher.encrypt(content.encode("utf-8"))
-            content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        return self.ingest_document(title, content, file_type, source_hash) is not None
 
+    def ingest_document(self, title: str, content: str, file_type: str,
+                        source_hash: Optional[str] = None) -> Optional[Dict]:
+        """
+        حفظ مستند مع إزالة التكرار بالمحتوى: إذا كان المحتوى نفسه (بصمة SHA-256)
+        محفوظاً بعنوان آخر، يُربط العنوان الجديد بالمستند الموجود في document_aliases
+        دون تشفير المحتوى وفهرسته مرة أخرى.
+        :param source_hash: بصمة SHA-256 لبايتات الملف الأصلي؛ تُسجَّل حتى يُعرف
+                            الملف نفسه عند رفعه مجدداً قبل استخراج نصه (find_by_source).
+        :return: {"id": معرّف المستند، "hash": بصمة المحتوى، "linked": هل رُبط بمستند
+                 موجود}، أو None إذا كان العنوان مستخدماً أو تعذر الحفظ.
+        """
+        try:
+            data = content.encode("utf-8")
+            content_hash = hashlib.sha256(data).hexdigest()
             with self._db_connection() as conn:
-                conn.execute('''
-                    INSERT INTO documents 
-                    (title, content, sha256_hash, file_type)
-                    VALUES (?, ?, ?, ?)
-                ''', (title, encrypted_content, content_hash, file_type))
+                # التشفير خارج قفل الكتابة، وفقط إذا كان المحتوى جديداً
+                sealed = None if self._existing_hashes(conn, [content_hash]) else self._seal_content(data, content_hash)
+                conn.execute("BEGIN IMMEDIATE")
+                if self._existing_titles(conn, [title]):
+                    raise sqlite3.IntegrityError(title)
+                doc_id = self._existing_hashes(conn, [content_hash]).get(content_hash)
+                linked = doc_id is not None
+                if linked:
+                    conn.execute(
+                        "INSERT INTO document_aliases (title, document_id) VALUES (?, ?)", (title, doc_id)
+                    )
+                else:
+                    blob, chunks = sealed or self._seal_content(data, content_hash)
+                    doc_id = conn.execute('''
+                        INSERT INTO documents 
+                        (title, content, sha256_hash, file_type)
+                        VALUES (?, ?, ?, ?)
+                    ''', (title, blob, content_hash, file_type)).lastrowid
+                    self._insert_chunks(conn, doc_id, chunks)
+                    self._index_abjad(conn, [(doc_id, content)])
+                    self._update_term_stats(conn, [content])
+                    self._index_search(conn, [(doc_id, title, content)])
+                if source_hash:
+                    self._register_source(conn, source_hash, doc_id)
                 conn.commit()
-                self._log_event(conn, "DOC_SAVE", f"تم حفظ المستند: {title}")
-            return True
+            if linked:
+                self._log_event("DOC_LINK", f"تم ربط العنوان {title} بالمستند {doc_id} (محتوى مطابق)")
+            else:
+                self._log_event("DOC_SAVE", f"تم حفظ المستند: {title}")
+            return {"id": doc_id, "hash": content_hash, "linked": linked}
         except sqlite3.IntegrityError:
             logging.warning(f"المستند '{title}' موجود مسبقاً")
-            return False
+            return None
         except Exception as e:
             logging.error(f"خطأ في الحفظ: {e}")
-            return False
+            return None
+
+    def save_documents(self, documents: Iterable[Tuple[str, str, str]], batch_size: int = SAVE_BATCH_SIZE,
+                       workers: Optional[int] = None) -> Dict:
+        """
+        حفظ عدد كبير من المستندات على دفعات، كل دفعة في معاملة واحدة.
+
+        تُقرأ المستندات من المُكرِّر دفعة بعد دفعة (دون تحميلها كلها في الذاكرة)،
+        ويُنفذ حساب البصمات والتشفير بالتوازي على عدة خيوط، ثم تُدرج صفوف الدفعة
+        بـ executemany مع فهرسة الجُمَّل وإحصاءات المدونة وسجل تدقيق واحد للدفعة،
+        وتُثبَّت كلها بعملية commit واحدة. المحتوى المحفوظ مسبقاً (أو المكرر داخل
+        الدفعة) بعنوان آخر يُربط بمستنده كما في ingest_document.
+
+        :param documents: مُكرِّر من (العنوان، المحتوى، نوع الملف).
+        :param batch_size: عدد المستندات في كل معاملة.
+        :param workers: عدد خيوط التشفير؛ الافتراضي عدد أنوية المعالج.
+        :return: {"saved": عدد المحفوظ، "linked": العناوين المربوطة بمحتوى موجود،
+                  "duplicates": العناوين الموجودة مسبقاً، "failed": العناوين التي تعذر حفظها}.
+        """
+        report = {"saved": 0, "linked": [], "duplicates": [], "failed": []}
+        documents = iter(documents)
+        with ThreadPoolExecutor(max_workers=resolve_workers(workers, batch_size)) as executor:
+            while True:
+                batch = list(islice(documents, batch_size))
+                if not batch:
+                    break
+                try:
+                    saved, linked, duplicates, failed = self._save_batch(batch, executor)
+                except Exception as e:
+                    logging.error(f"خطأ في حفظ دفعة المستندات: {e}")
+                    report["failed"].extend(document[0] for document in batch)
+                    continue
+                report["saved"] += saved
+                report["linked"].extend(linked)
+                report["duplicates"].extend(duplicates)
+                report["failed"].extend(failed)
+        return report
+
+    def _save_batch(self, batch: List[Tuple[str, str, str]],
+                    executor: ThreadPoolExecutor) -> Tuple[int, List, List, List]:
+        """
+        حفظ دفعة واحدة في معاملة واحدة:
+        (عدد المحفوظ، العناوين المربوطة، العناوين المكررة، العناوين الفاشلة).
+        """
+        valid, duplicates, failed = [], [], []
+        for title, content, file_type in batch:
+            if isinstance(title, str) and isinstance(content, str) and file_type in FILE_TYPES:
+                valid.append((title, content, file_type))
+            else:
+                failed.append(title)
+
+        with self._db_connection() as conn:
+            # استبعاد المكرر قبل التشفير حتى لا يُشفَّر ما لن يُحفظ
+            existing = self._existing_titles(conn, [title for title, _, _ in valid])
+            pending = {}
+            for title, content, file_type in valid:
+                if title in existing or title in pending:
+                    duplicates.append(title)
+                else:
+                    pending[title] = (content, file_type)
+            if not pending:
+                return 0, [], duplicates, failed
+
+            encoded = [content.encode("utf-8") for content, _ in pending.values()]
+            hashes = list(executor.map(_sha256, encoded))
+            known = self._existing_hashes(conn, hashes)
+            # أول ظهور لكل محتوى جديد يُحفظ، وما عداه يُربط بمستنده
+            new, links = {}, []
+            for title, data, content_hash in zip(pending, encoded, hashes):
+                if content_hash in known or content_hash in new:
+                    links.append((title, content_hash))
+                else:
+                    new[content_hash] = (title, data)
+            sealed = dict(zip(new, executor.map(self._seal_content, [data for _, data in new.values()], new)))
+            rows = [
+                (title, sealed[content_hash][0], content_hash, pending[title][1])
+                for content_hash, (title, _) in new.items()
+            ]
+
+            # قفل الكتابة من بداية المعاملة: لا يُدرج كاتب آخر بين معرفة آخر معرّف والإدراج
+            conn.execute("BEGIN IMMEDIATE")
+            # إعادة فحص البصمات داخل القفل: محتوى أدرجه كاتب آخر بعد الفحص الأول يُربط بمستنده
+            raced = self._existing_hashes(conn, list(new))
+            if raced:
+                known.update(raced)
+                links.extend((new[content_hash][0], content_hash) for content_hash in raced)
+                rows = [row for row in rows if row[2] not in raced]
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM documents").fetchone()[0]
+            conn.executemany('''
+                INSERT OR IGNORE INTO documents
+                (title, content, sha256_hash, file_type)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+            inserted = conn.execute(
+                "SELECT id, title, sha256_hash FROM documents WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall()
+            for doc_id, _, content_hash in inserted:
+                self._insert_chunks(conn, doc_id, sealed[content_hash][1])
+            contents = [(doc_id, pending.pop(title)[0]) for doc_id, title, _ in inserted]
+            self._index_abjad(conn, contents)
+            self._update_term_stats(conn, (content for _, content in contents))
+            self._index_search(conn, (
+                (doc_id, title, content) for (doc_id, title, _), (_, content) in zip(inserted, contents)
+            ))
+            known.update((content_hash, doc_id) for doc_id, _, content_hash in inserted)
+            aliases = [(title, known[content_hash]) for title, content_hash in links if content_hash in known]
+            conn.executemany(
+                "INSERT OR IGNORE INTO document_aliases (title, document_id) VALUES (?, ?)", aliases
+            )
+            linked = [title for title, _ in aliases]
+            for title in linked:
+                del pending[title]
+            # ما تبقى أدرجته عملية أخرى بالعنوان نفسه بين الفحص والقفل
+            duplicates.extend(pending)
+            conn.commit()
+        self._log_event(
+            "DOC_BATCH_SAVE",
+            f"تم حفظ {len(inserted)} من {len(batch)} مستند "
+            f"(مربوط: {len(linked)}، مكرر: {len(duplicates)}، مرفوض: {len(failed)})"
+        )
+        return len(inserted), linked, duplicates, failed
+
+    @staticmethod
+    def _existing_titles(conn, titles: List[str]) -> set:
+        """العناوين المستخدمة مسبقاً (لمستند أو لعنوان مربوط) من بين العناوين المعطاة."""
+        existing = set()
+        # حد SQLite الافتراضي لعدد المعاملات في استعلام واحد
+        for start in range(0, len(titles), 900):
+            chunk = titles[start:start + 900]
+            marks = ','.join('?' * len(chunk))
+            existing.update(row[0] for row in conn.execute(
+                f"SELECT title FROM documents WHERE title IN ({marks}) "
+                f"UNION ALL SELECT title FROM document_aliases WHERE title IN ({marks})", chunk + chunk
+            ))
+        return existing
+
+    @staticmethod
+    def _existing_hashes(conn, hashes: List[str]) -> Dict[str, int]:
+        """بصمات المحتوى المحفوظة مسبقاً من بين البصمات المعطاة: البصمة -> أقدم مستند بها."""
+        existing = {}
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), 900):
+            chunk = unique[start:start + 900]
+            existing.update(conn.execute(
+                f"SELECT sha256_hash, MIN(id) FROM documents "
+                f"WHERE sha256_hash IN ({','.join('?' * len(chunk))}) GROUP BY sha256_hash", chunk
+            ))
+        return existing
+
+    @staticmethod
+    def _register_source(conn, source_hash: str, doc_id: int):
+        conn.execute(
+            "INSERT OR IGNORE INTO document_sources (source_hash, document_id) VALUES (?, ?)",
+            (source_hash, doc_id)
+        )
+
+    def find_by_hash(self, content_hash: str) -> Optional[int]:
+        """معرّف المستند ذي بصمة المحتوى المعطاة (SHA-256 للنص بترميز UTF-8)."""
+        with self._db_connection() as conn:
+            return self._existing_hashes(conn, [content_hash]).get(content_hash)
+
+    def find_by_source(self, source_hash: str) -> Optional[int]:
+        """معرّف المستند المستخرج من ملف ببصمة البايتات المعطاة، دون إعادة استخراجه."""
+        with self._db_connection() as conn:
+            row = conn.execute(
+                "SELECT document_id FROM document_sources WHERE source_hash = ?", (source_hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_hash_by_source(self, source_hash: str) -> Optional[str]:
+        """بصمة محتوى المستند المستخرج من ملف ببصمة البايتات المعطاة، دون فك تشفيره."""
+        with self._db_connection() as conn:
+            row = conn.execute('''
+                SELECT d.sha256_hash FROM document_sources s
+                JOIN documents d ON d.id = s.document_id
+                WHERE s.source_hash = ?
+            ''', (source_hash,)).fetchone()
+        return row[0] if row else None
+
+    def find_by_title(self, title: str) -> Optional[int]:
+        """معرّف المستند بعنوانه أو بأحد العناوين المربوطة به."""
+        with self._db_connection() as conn:
+            row = conn.execute('''
+                SELECT id FROM documents WHERE title = ?
+                UNION ALL SELECT document_id FROM document_aliases WHERE title = ?
+            ''', (title, title)).fetchone()
+        return row[0] if row else None
+
+    def register_source(self, source_hash: str, doc_id: int):
+        """تسجيل ملف مصدر (ببصمة بايتاته) لمستند محفوظ."""
+        with self._db_connection() as conn:
+            self._register_source(conn, source_hash, doc_id)
+            conn.commit()
 
     def get_document(self, doc_id: int) -> Optional[Dict]:
         """
-        استرجاع مستند مع التحقق من سلامته
+        استرجاع مستند مع التحقق من سلامته (انظر _open_content)؛ المستندات المتحقَّق
+        منها تُحفظ في document_cache فلا يُعاد فك تشفيرها والتحقق منها عند كل طلب.
         """
+        cached = self.document_cache.get(doc_id)
+        if cached is not None:
+            return cached
         try:
             with self._db_connection() as conn:
                 row = conn.execute('''
@@ -120,12 +555,10 @@ class DatabaseManager:
                 if not row:
                     return None
                 
-                decrypted_content = self.cipher.decrypt(row[1]).decode("utf-8")
-                current_hash = hashlib.sha256(decrypted_content.encode("utf-8")).hexdigest()
-                
-                if current_hash != row[2]:
-                    raise InvalidToken("التجزئة غير متطابقة - تلاعب محتمل")
-                
+                decrypted_content = self._open_content(doc_id, row[1], row[2]).decode("utf-8")
+                current_hash = row[2]
+
+                self.document_cache.put(doc_id, row[0], decrypted_content, current_hash)
                 return {
                     "id": doc_id,
                     "title": row[0],
@@ -134,45 +567,584 @@ class DatabaseManager:
                 }
         except InvalidToken as e:
             logging.critical(f"خطر أمني: {e}")
+            self._log_event("SECURITY_ALERT", str(e))
+            return None
+        except Exception as e:
+            logging.error(f"خطأ في الاسترجاع: {e}")
+            return None
+
+    def _seal_content(self, data: bytes, content_hash: str) -> Tuple[bytes, List[bytes]]:
+        """
+        تشفير محتوى لصف المستند: كتلة واحدة، أو بيان أجزاء والأجزاء المشفرة
+        إذا تجاوز chunk_size (انظر core.chunked_blob).
+        :return: (محتوى الصف، الأجزاء).
+        """
+        if self.chunked_codec.should_chunk(data):
+            return self.chunked_codec.seal(data, content_hash)
+        return self.blob_codec.seal(data), []
+
+    @staticmethod
+    def _insert_chunks(conn, doc_id: int, chunks: List[bytes]):
+        conn.executemany(
+            "INSERT INTO document_chunks (document_id, idx, data) VALUES (?, ?, ?)",
+            ((doc_id, index, chunk) for index, chunk in enumerate(chunks))
+        )
+
+    def _open_content(self, doc_id: int, blob: bytes, content_hash: str) -> bytes:
+        """
+        فك تشفير محتوى مستند والتحقق من سلامته: تجزئة SHA-256 للكتلة الواحدة،
+        أو أوراق شجرة البصمات لكل جزء في المستند المقطّع.
+        :raises InvalidToken: عند فشل التحقق.
+        """
+        if not is_chunked(blob):
+            data = self.blob_codec.open(blob)
+            if _sha256(data) != content_hash:
+                raise InvalidToken(f"تجزئة المستند {doc_id} غير متطابقة - تلاعب محتمل")
+            return data
+        manifest = self.chunked_codec.open_manifest(blob, content_hash)
+        with self._db_connection() as conn:
+            chunks = conn.execute(
+                "SELECT idx, data FROM document_chunks WHERE document_id = ? ORDER BY idx", (doc_id,)
+            ).fetchall()
+        return self.chunked_codec.open_chunks(manifest, 0, manifest.count - 1, chunks)
+
+    def read_range(self, doc_id: int, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+        """
+        مقطع من نص مستند، مثل document["content"][start:end] (بالأحرف، وتُقبل
+        القيم السالبة). في المستند المقطّع لا يُفك تشفير إلا الأجزاء التي تغطي
+        المقطع ويُتحقق من أوراقها؛ المستند بكتلة واحدة يُقرأ كاملاً.
+        :return: المقطع، أو None إذا لم يوجد المستند أو فشل التحقق.
+        """
+        cached = self.document_cache.get(doc_id)
+        if cached is not None:
+            return cached["content"][start:end]
+        try:
             with self._db_connection() as conn:
-                self._log_event(conn, "SECURITY_ALERT", str(e))
+                row = conn.execute(
+                    "SELECT content, sha256_hash FROM documents WHERE id = ?", (doc_id,)
+                ).fetchone()
+            if not row:
+                return None
+            if not is_chunked(row[0]):
+                document = self.get_document(doc_id)
+                return document["content"][start:end] if document else None
+            manifest = self.chunked_codec.open_manifest(row[0], row[1])
+            start, end, _ = slice(start, end).indices(manifest.length)
+            if end <= start:
+                return ""
+            first, last = manifest.span(start, end)
+            with self._db_connection() as conn:
+                chunks = conn.execute('''
+                    SELECT idx, data FROM document_chunks
+                    WHERE document_id = ? AND idx BETWEEN ? AND ?
+                    ORDER BY idx
+                ''', (doc_id, first, last)).fetchall()
+            text = self.chunked_codec.open_chunks(manifest, first, last, chunks).decode("utf-8")
+            offset = manifest.offsets[first]
+            return text[start - offset:end - offset]
+        except InvalidToken as e:
+            logging.critical(f"خطر أمني: {e}")
+            self._log_event("SECURITY_ALERT", f"المستند {doc_id}: {e}")
             return None
         except Exception as e:
             logging.error(f"خطأ في الاسترجاع: {e}")
             return None
 
-    def _log_event(self, conn, event_type: str, details: str = ""):
+    def iter_documents(self, batch_size: int = ITER_BATCH_SIZE, since_id: int = 0,
+                       columns: Iterable[str] = ("id", "title", "content")) -> Iterator[Dict]:
+        """
+        المرور على المستندات بترتيب المعرّف، دفعة بعد دفعة (WHERE id > آخر معرّف)
+        على اتصال الخيط نفسه، فتبقى الذاكرة بحجم دفعة واحدة مهما كبرت المدونة.
+        لا يُفك تشفير المحتوى إلا إذا طُلب العمود "content"، وعندها يُتحقق من
+        تجزئته ويُتخطى المستند التالف بعد تسجيل SECURITY_ALERT.
+        لا تبقى معاملة قراءة مفتوحة بين الدفعات، فيمكن الكتابة أثناء المرور.
+        :param since_id: البدء بعد هذا المعرّف (لاستئناف مرور سابق).
+        :param columns: من DOCUMENT_COLUMNS.
+        :return: مولّد قواميس بالأعمدة المطلوبة.
+        """
+        return self._iter_documents(tuple(columns), batch_size, since_id)
+
+    def _iter_documents(self, columns: Tuple[str, ...], batch_size: int = ITER_BATCH_SIZE,
+                        since_id: int = 0, condition: str = "") -> Iterator[Dict]:
+        unknown = [column for column in columns if column not in DOCUMENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"أعمدة غير معروفة: {', '.join(unknown)}")
+        with_content = "content" in columns
+        selected = ["id"] + [DOCUMENT_COLUMNS[column] for column in columns if column != "id"]
+        if with_content and "sha256_hash" not in selected:
+            selected.append("sha256_hash")
+        query = f'''
+            SELECT {", ".join(selected)} FROM documents
+            WHERE id > ? {"AND " + condition if condition else ""}
+            ORDER BY id LIMIT ?
+        '''
+        return self._document_batches(query, selected, columns, batch_size, since_id)
+
+    def _document_batches(self, query: str, selected: List[str], columns: Tuple[str, ...],
+                          batch_size: int, last_id: int) -> Iterator[Dict]:
+        # ترتيب أسماء الأعمدة كما تُعاد للمستدعي
+        names = {DOCUMENT_COLUMNS[column]: column for column in columns}
+        while True:
+            with self._db_connection() as conn:
+                rows = conn.execute(query, (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                values = dict(zip(selected, row))
+                if "content" in values:
+                    try:
+                        data = self._open_content(row[0], values["content"], values["sha256_hash"])
+                    except InvalidToken as e:
+                        logging.critical(f"خطر أمني: {e}")
+                        self._log_event("SECURITY_ALERT", f"المستند {row[0]}: {e}")
+                        continue
+                    values["content"] = data.decode("utf-8")
+                yield {column: values[sql] for sql, column in names.items()}
+            if len(rows) < batch_size:
+                return
+
+    def _load_dictionaries(self):
+        """تسجيل قواميس الضغط المحفوظة؛ الأحدث هو النشط للكتابة."""
+        with self._db_connection() as conn:
+            rows = conn.execute("SELECT id, data FROM compression_dictionaries ORDER BY id").fetchall()
+        for dict_id, data in rows:
+            self.blob_codec.add_dictionary(dict_id, self.blob_codec.open(data))
+
+    def train_compression_dictionary(self, samples: int = DICTIONARY_SAMPLES) -> Optional[int]:
+        """
+        تدريب قاموس ضغط على عينة عشوائية من المستندات وجعله نشطاً للكتابات التالية.
+        الكتل القديمة تبقى مقروءة بقواميسها (أو دونها).
+        :return: معرّف القاموس الجديد، أو None إذا لم توجد مستندات.
+        """
+        with self._db_connection() as conn:
+            rows = conn.execute(
+                "SELECT id, content, sha256_hash FROM documents ORDER BY RANDOM() LIMIT ?", (samples,)
+            ).fetchall()
+        dictionary = train_dictionary(
+            (self._open_content(*row) for row in rows), self.blob_codec.codec
+        )
+        if not dictionary:
+            return None
+        with self._db_connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO compression_dictionaries (data) VALUES (?)",
+                (self.blob_codec.seal(dictionary, compress=False),)
+            )
+            conn.commit()
+        self._log_event("DICT_TRAIN", f"قاموس ضغط {cursor.lastrowid} ({len(dictionary)} بايت)")
+        self.blob_codec.add_dictionary(cursor.lastrowid, dictionary)
+        return cursor.lastrowid
+
+    def migrate_storage(self, batch_size: int = MIGRATION_BATCH_SIZE, pause: float = 0.0,
+                        stop_event: Optional[threading.Event] = None) -> int:
+        """
+        إعادة كتابة رموز Fernet القديمة بصيغة التخزين الجديدة، دفعة بعد دفعة
+        وكل دفعة في معاملة قصيرة، فيمكن تشغيلها في الخلفية أثناء عمل البرنامج
+        واستئنافها بعد توقفها. يُتحقق من تجزئة كل مستند قبل إعادة كتابته.
+        :param pause: انتظار بالثواني بين الدفعات لإفساح المجال للكتّاب الآخرين.
+        :param stop_event: حدث لإيقاف الترحيل بعد الدفعة الحالية.
+        :return: عدد المستندات التي رُحّلت.
+        """
+        migrated = 0
+        last_id = 0
+        while stop_event is None or not stop_event.is_set():
+            with self._db_connection() as conn:
+                rows = conn.execute('''
+                    SELECT id, content, sha256_hash FROM documents
+                    WHERE id > ? AND substr(content, 1, 1) != ?
+                    ORDER BY id LIMIT ?
+                ''', (last_id, MAGIC[:1], batch_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                updates = []
+                for doc_id, blob, content_hash in rows:
+                    try:
+                        data = self.blob_codec.open(blob)
+                    except InvalidToken:
+                        logging.critical(f"خطر أمني: تعذر فك تشفير المستند {doc_id} أثناء الترحيل")
+                        continue
+                    if hashlib.sha256(data).hexdigest() != content_hash:
+                        logging.critical(f"خطر أمني: تجزئة المستند {doc_id} غير متطابقة أثناء الترحيل")
+                        continue
+                    updates.append((doc_id, blob, *self._seal_content(data, content_hash)))
+                for doc_id, blob, content, chunks in updates:
+                    # الشرط على المحتوى القديم: لا يُكتب فوق تعديل متزامن
+                    if conn.execute(
+                        "UPDATE documents SET content = ? WHERE id = ? AND content = ?", (content, doc_id, blob)
+                    ).rowcount:
+                        self._insert_chunks(conn, doc_id, chunks)
+                        migrated += 1
+                conn.commit()
+            if pause:
+                time.sleep(pause)
+        self._log_event("STORAGE_MIGRATION", f"تم ترحيل {migrated} مستند إلى صيغة التخزين الجديدة")
+        return migrated
+
+    def start_storage_migration(self, **options) -> Tuple[threading.Thread, threading.Event]:
         """
-        تسجيل الأحداث الأمنية داخل قاعدة البيانات
+        تشغيل migrate_storage في خيط خلفي (باتصاله الخاص من المجمّع).
+        :return: (الخيط، حدث الإيقاف).
+        """
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self.migrate_storage, kwargs={**options, "stop_event": stop_event},
+            name="storage-migration", daemon=True
+        )
+        thread.start()
+        return thread, stop_event
+
+    def save_analysis(self, content_hash: str, analyzer: str, version: str, result: dict) -> bool:
+        """
+        حفظ نتيجة تحليل لمحتوى (ببصمته) مضغوطة ومشفرة، بمفتاح (البصمة، المحلل، الإصدار).
+        :param version: إصدار المحلل وبصمة إعداداته (مثل TextProcessor.analysis_version()).
         """
         try:
+            self._store_analysis(content_hash, analyzer, version, *_pack_result(result))
+            return True
+        except Exception as e:
+            logging.error(f"خطأ في حفظ نتيجة التحليل: {e}")
+            return False
+
+    def _store_analysis(self, content_hash: str, analyzer: str, version: str, payload_format: str, payload: bytes):
+        with self._db_connection() as conn:
             conn.execute('''
-                INSERT INTO audit_log 
-                (event_type, details)
-                VALUES (?, ?)
-            ''', (event_type, details))
+                INSERT OR REPLACE INTO analysis_results
+                (content_hash, analyzer, version, format, result)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (content_hash, analyzer, version, payload_format, self.blob_codec.seal(payload)))
             conn.commit()
+
+    def load_analysis(self, content_hash: str, analyzer: str, version: str) -> Optional[dict]:
+        """نتيجة التحليل المحفوظة لهذا المحتوى والمحلل والإصدار، أو None."""
+        try:
+            with self._db_connection() as conn:
+                row = conn.execute('''
+                    SELECT format, result FROM analysis_results
+                    WHERE content_hash = ? AND analyzer = ? AND version = ?
+                ''', (content_hash, analyzer, version)).fetchone()
+            if row is None:
+                return None
+            return _unpack_result(row[0], self.blob_codec.open(row[1]))
+        except InvalidToken as e:
+            logging.critical(f"خطر أمني: {e}")
+            self._log_event("SECURITY_ALERT", f"نتيجة تحليل تالفة ({analyzer}): {e}")
+            return None
         except Exception as e:
-            logging.error(f"فشل تسجيل الحدث: {e}")
+            logging.error(f"خطأ في قراءة نتيجة التحليل: {e}")
+            return None
+
+    def get_or_compute_analysis(self, content_hash: str, analyzer: str, version: str,
+                                compute: Callable[[], dict]) -> dict:
+        """
+        قراءة عبر الذاكرة: النتيجة المحفوظة إن وجدت، وإلا تُحسب بـ compute() وتُحفظ.
+        تُعاد النتيجة المحسوبة بعد تسلسلها كما تُقرأ لاحقاً (الصفوف tuple تصبح قوائم)،
+        فتتطابق النتيجة في المرة الأولى وما بعدها.
+        """
+        result = self.load_analysis(content_hash, analyzer, version)
+        if result is None:
+            payload_format, payload = _pack_result(compute())
+            try:
+                self._store_analysis(content_hash, analyzer, version, payload_format, payload)
+            except Exception as e:
+                logging.error(f"خطأ في حفظ نتيجة التحليل: {e}")
+            result = _unpack_result(payload_format, payload)
+        return result
+
+    def invalidate_analyses(self, analyzer: str, keep_version: Optional[str] = None,
+                            content_hash: Optional[str] = None) -> int:
+        """
+        حذف نتائج محلل بإصدارات قديمة (كل الإصدارات عدا keep_version)، لكل
+        المحتوى أو لمحتوى واحد.
+        :return: عدد النتائج المحذوفة.
+        """
+        conditions, params = ["analyzer = ?"], [analyzer]
+        if keep_version is not None:
+            conditions.append("version != ?")
+            params.append(keep_version)
+        if content_hash is not None:
+            conditions.append("content_hash = ?")
+            params.append(content_hash)
+        with self._db_connection() as conn:
+            deleted = conn.execute(
+                f"DELETE FROM analysis_results WHERE {' AND '.join(conditions)}", params
+            ).rowcount
+            conn.commit()
+        if deleted:
+            self._log_event("ANALYSIS_INVALIDATE", f"حذف {deleted} نتيجة قديمة للمحلل {analyzer}")
+        return deleted
+
+    def _index_abjad(self, conn, documents: Iterable[Tuple[int, str]]):
+        """
+        إضافة قيم جُمَّل كلمات المستندات وسلاسلها المتتالية (حتى abjad_phrase_length)
+        إلى الفهرس العكسي ضمن معاملة الحفظ نفسها.
+        تُرتب صفوف جميع المستندات بمفتاح الفهرس قبل إدراجها دفعة واحدة، فتُكتب
+        صفحات الشجرة (B-tree) بالتتابع بدلاً من مواضع عشوائية.
+        :param documents: أزواج (معرّف المستند، المحتوى).
+        """
+        engine = get_abjad_engine()
+        blocks = []
+        for doc_id, content in documents:
+            _, values, _ = engine.word_values(content, return_words=False)
+            cumulative = np.concatenate(([0], np.cumsum(values)))
+            for length in range(1, min(self.abjad_phrase_length, len(values)) + 1):
+                sums = cumulative[length:] - cumulative[:-length]
+                positions = np.flatnonzero(sums)
+                block = np.empty((len(positions), 4), dtype=np.int64)
+                block[:, 0] = sums[positions]
+                block[:, 1] = length
+                block[:, 2] = doc_id
+                block[:, 3] = positions
+                blocks.append(block)
+        if not blocks:
+            return
+        rows = np.concatenate(blocks)
+        rows = rows[np.lexsort(rows.T[::-1])]
+        conn.executemany('''
+            INSERT OR IGNORE INTO abjad_index
+            (value, length, document_id, position)
+            VALUES (?, ?, ?, ?)
+        ''', zip(*rows.T.tolist()))
+
+    def rebuild_abjad_index(self) -> int:
+        """
+        فهرسة المستندات غير الموجودة في الفهرس العكسي (مثل المحفوظة قبل إضافته).
+        :return: عدد المستندات التي تمت فهرستها.
+        """
+        documents = self._iter_documents(
+            ("id", "content"), condition="id NOT IN (SELECT DISTINCT document_id FROM abjad_index)"
+        )
+        indexed = 0
+        while True:
+            batch = [(d["id"], d["content"]) for d in islice(documents, ITER_BATCH_SIZE)]
+            if not batch:
+                return indexed
+            with self._db_connection() as conn:
+                self._index_abjad(conn, batch)
+                conn.commit()
+            indexed += len(batch)
+
+    def _index_search(self, conn, documents: Iterable[Tuple[int, str, str]]):
+        """
+        إضافة بصمات كلمات المستندات (المعرّف، العنوان، المحتوى) إلى فهرس البحث النصي.
+        """
+        conn.executemany('''
+            INSERT INTO search_index (rowid, title, terms, prefixes)
+            VALUES (?, ?, ?, ?)
+        ''', self.search_tokenizer.index_rows(documents))
+
+    def rebuild_search_index(self) -> int:
+        """
+        فهرسة المستندات غير الموجودة في فهرس البحث النصي (مثل المحفوظة قبل إضافته).
+        :return: عدد المستندات التي تمت فهرستها.
+        """
+        documents = self._iter_documents(
+            ("id", "title", "content"), condition="id NOT IN (SELECT rowid FROM search_index)"
+        )
+        indexed = 0
+        while True:
+            batch = [(d["id"], d["title"], d["content"]) for d in islice(documents, ITER_BATCH_SIZE)]
+            if not batch:
+                return indexed
+            with self._db_connection() as conn:
+                self._index_search(conn, batch)
+                conn.commit()
+            indexed += len(batch)
+
+    def _update_term_stats(self, conn, contents: Iterable[str]):
+        """
+        تحديث تكرار الوثائق للكلمات المرشحة في المستندات وعدّادات المدونة تدريجياً
+        (صف واحد لكل بصمة كلمة مهما تكرر ظهورها في المستندات).
+        """
+        frequencies = Counter()
+        documents = total_terms = 0
+        for content in contents:
+            counts = word_counts(content)
+            frequencies.update(self.term_hasher.digest(term) for term in candidate_terms(counts))
+            total_terms += sum(counts.values())
+            documents += 1
+        conn.executemany('''
+            INSERT INTO term_stats (term_hash, df) VALUES (?, ?)
+            ON CONFLICT(term_hash) DO UPDATE SET df = df + excluded.df
+        ''', sorted(frequencies.items()))
+        conn.executemany('''
+            INSERT INTO corpus_stats (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        ''', [("document_count", documents), ("total_terms", total_terms)])
+
+    def load_corpus_stats(self) -> CorpusStats:
+        """
+        تحميل لقطة للقراءة فقط من إحصاءات المدونة لاستخدامها مع KeywordExtractor.
+        """
+        with self._db_connection() as conn:
+            totals = dict(conn.execute("SELECT name, value FROM corpus_stats").fetchall())
+            rows = conn.execute("SELECT term_hash, df FROM term_stats").fetchall()
+        hashes = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        frequencies = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        return CorpusStats(
+            self.term_hasher,
+            totals.get("document_count", 0),
+            totals.get("total_terms", 0),
+            hashes,
+            frequencies
+        )
 
-    def search_documents(self, keyword: str) -> List[Dict]:
+    def find_by_abjad(self, value: int, max_value: Optional[int] = None, max_length: int = 1,
+                      limit: int = 100, with_text: bool = True) -> List[Dict]:
         """
-        البحث عن مستندات تحتوي على الكلمة المطلوبة
+        البحث عن الكلمات أو سلاسل الكلمات المتتالية التي يساوي مجموع جُمَّلها قيمة معينة.
+        :param value: القيمة المطلوبة (أو بداية المدى عند تحديد max_value).
+        :param max_value: نهاية مدى القيم (شاملة)؛ الافتراضي مطابقة value تماماً.
+        :param max_length: أطول سلسلة كلمات متتالية (1 = كلمات مفردة فقط).
+        :param limit: الحد الأقصى لعدد النتائج.
+        :param with_text: استرجاع نص الكلمات بفك تشفير المستندات المطابقة.
+        :return: قائمة {"document_id", "position", "length", "value", "text"}.
         """
+        if max_length > self.abjad_phrase_length:
+            logging.warning(f"الفهرس يغطي سلاسل حتى {self.abjad_phrase_length} كلمات فقط")
+            max_length = self.abjad_phrase_length
         try:
             with self._db_connection() as conn:
                 rows = conn.execute('''
-                    SELECT id, title 
-                    FROM documents 
-                    WHERE title LIKE ? 
-                    LIMIT 50
-                ''', (f"%{keyword}%",)).fetchall()
+                    SELECT document_id, position, length, value
+                    FROM abjad_index
+                    WHERE value BETWEEN ? AND ? AND length <= ?
+                    ORDER BY value, length, document_id, position
+                    LIMIT ?
+                ''', (value, value if max_value is None else max_value, max_length, limit)).fetchall()
+        except Exception as e:
+            logging.error(f"خطأ أثناء البحث في فهرس الجُمَّل: {e}")
+            return []
+
+        results = [
+            {"document_id": row[0], "position": row[1], "length": row[2], "value": row[3]}
+            for row in rows
+        ]
+        if with_text:
+            words_by_document = {}
+            for result in results:
+                doc_id = result["document_id"]
+                if doc_id not in words_by_document:
+                    document = self.get_document(doc_id)
+                    words_by_document[doc_id] = (
+                        get_abjad_engine().word_values(document["content"])[0] if document else []
+                    )
+                words = words_by_document[doc_id]
+                result["text"] = ' '.join(words[result["position"]:result["position"] + result["length"]])
+        return results
 
-                return [{"id": row[0], "title": row[1]} for row in rows]
+    def _log_event(self, event_type: str, details: str = ""):
+        """
+        تسجيل الأحداث الأمنية داخل قاعدة البيانات عبر كاتب التدقيق في الخلفية
+        (أحداث audit_sync_events مثل SECURITY_ALERT تُثبَّت فوراً).
+        """
+        self.audit.log(event_type, details)
+
+    def search_documents(self, keyword: str, limit: int = 50, after: Optional[Tuple[float, int]] = None,
+                         max_ranked: Optional[int] = SEARCH_MAX_RANKED) -> List[Dict]:
+        """
+        البحث في عناوين المستندات ومحتواها المشفّر عبر فهرس البصمات، مرتبة بـ BM25.
+        يدعم الاستعلام الكلمات (بجميع صيغها ذات الجذع الخفيف نفسه)، والعبارات
+        بين علامتي تنصيص، والبادئات المنتهية بـ * (انظر SearchTokenizer.query).
+        الترتيب بالدرجة ثم بالمعرّف، وللصفحة التالية يُمرَّر after = (score, id)
+        لآخر نتيجة (ترقيم بالمفتاح: لا تخطٍّ لصفوف الصفحات السابقة). تتغير
+        الدرجات إذا أُضيفت مستندات بين صفحتين.
+        :param max_ranked: أقصى عدد مطابقات تُرتب: إذا زادت المطابقات عليه تُرتب أحدث
+                           max_ranked منها فقط ولا تُعاد الأقدم (مع تحذير في السجل)؛
+                           None يرتب جميع المطابقات. iter_search يتابع بعد هذا الحد.
+        :return: قائمة {"id", "title", "score"} من الأعلى صلة (الدرجة الأكبر أفضل).
+        """
+        expression = self.search_tokenizer.query(keyword)
+        if expression is None:
+            return []
+        try:
+            with self._db_connection() as conn:
+                lower = self._search_window(conn, expression, _MAX_ROWID, max_ranked)
+                if lower and after is None:
+                    logging.warning(
+                        f"البحث عن '{keyword}' يطابق أكثر من {max_ranked} مستند: "
+                        f"رُتبت أحدث {max_ranked} مطابقة فقط"
+                    )
+                return self._search_page(conn, expression, lower, _MAX_ROWID, after, limit)
         except Exception as e:
             logging.error(f"خطأ أثناء البحث: {e}")
             return []
 
+    @staticmethod
+    def _search_window(conn, expression: str, upper: int, max_ranked: Optional[int]) -> int:
+        """
+        الحد الأدنى (غير الشامل) لمعرّفات نافذة الترتيب: أحدث max_ranked مطابقة
+        معرّفاتها لا تتجاوز upper، أو 0 إذا شملت النافذة أقدم مطابقة.
+        """
+        if max_ranked is None:
+            return 0
+        # التخطي بترتيب rowid لا يحسب الدرجات فهو رخيص
+        boundary = conn.execute('''
+            SELECT rowid FROM search_index
+            WHERE search_index MATCH ? AND rowid <= ?
+            ORDER BY rowid DESC
+            LIMIT 1 OFFSET ?
+        ''', (expression, upper, max_ranked)).fetchone()
+        return boundary[0] if boundary else 0
+
+    @staticmethod
+    def _search_page(conn, expression: str, lower: int, upper: int,
+                     after: Optional[Tuple[float, int]], limit: int) -> List[Dict]:
+        """صفحة من مطابقات النافذة lower < id <= upper مرتبة بـ BM25."""
+        # bm25 سالبة (الأصغر أفضل) والدرجة المعادة عكسها
+        keyset, params = "", ()
+        if after is not None:
+            keyset = "WHERE score > ? OR (score = ? AND rowid > ?)"
+            params = (-after[0], -after[0], after[1])
+        rows = conn.execute(f'''
+            SELECT d.id, d.title, -ranked.score
+            FROM (
+                SELECT rowid, score FROM (
+                    SELECT rowid, bm25(search_index, 2.0, 1.0, 0.5) AS score
+                    FROM search_index
+                    WHERE search_index MATCH ? AND rowid > ? AND rowid <= ?
+                )
+                {keyset}
+                ORDER BY score, rowid
+                LIMIT ?
+            ) AS ranked
+            JOIN documents d ON d.id = ranked.rowid
+            ORDER BY ranked.score, ranked.rowid
+        ''', (expression, lower, upper, *params, limit)).fetchall()
+        return [{"id": row[0], "title": row[1], "score": row[2]} for row in rows]
+
+    def iter_search(self, keyword: str, page_size: int = 50,
+                    max_ranked: Optional[int] = SEARCH_MAX_RANKED) -> Iterator[Dict]:
+        """
+        جميع المستندات المطابقة صفحة بعد صفحة، دون حد max_ranked على عددها:
+        تُرتب بـ BM25 داخل نوافذ من max_ranked مطابقة بحسب الحداثة، أحدثها أولاً
+        (وهي نتائج search_documents نفسها) ثم النافذة الأقدم التي تليها.
+        None يرتب جميع المطابقات في نافذة واحدة.
+        """
+        expression = self.search_tokenizer.query(keyword)
+        if expression is None:
+            return
+        upper = _MAX_ROWID
+        try:
+            while True:
+                with self._db_connection() as conn:
+                    lower = self._search_window(conn, expression, upper, max_ranked)
+                after = None
+                while True:
+                    with self._db_connection() as conn:
+                        page = self._search_page(conn, expression, lower, upper, after, page_size)
+                    yield from page
+                    if len(page) < page_size:
+                        break
+                    after = (page[-1]["score"], page[-1]["id"])
+                if not lower:
+                    return
+                upper = lower
+        except sqlite3.Error as e:
+            logging.error(f"خطأ أثناء البحث: {e}")
+
+
 # اختبار عملي للكود
 if __name__ == "__main__":
     db = DatabaseManager()
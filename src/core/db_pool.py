@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+db_pool.py
+==================
+مجمّع اتصالات SQLite: اتصال واحد دائم لكل خيط (thread) في كل عملية.
+
+تُضبط إعدادات PRAGMA مرة واحدة عند فتح الاتصال بدلاً من كل استدعاء، ويُحتفظ
+بذاكرة العبارات المُجهزة (statement cache) بين الطلبات. يتيح وضع WAL للقراء
+العمل بالتوازي مع الكاتب بدلاً من انتظار قفل قاعدة البيانات كاملة.
+"""
+
+import os
+import atexit
+import sqlite3
+import logging
+import threading
+import weakref
+from pathlib import Path
+
+# الإعدادات الافتراضية (يمكن تغييرها لكل مجمّع)
+DEFAULT_JOURNAL_MODE = "WAL"
+# NORMAL آمن مع WAL: قد تضيع آخر معاملة عند انقطاع الكهرباء دون إفساد القاعدة
+DEFAULT_SYNCHRONOUS = "NORMAL"
+# القيمة السالبة بالكيلوبايت: 64 ميغابايت لكل اتصال
+DEFAULT_CACHE_SIZE = -64 * 1024
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+# FAST: يمسح المحتوى المحذوف حين لا يتطلب ذلك كتابة إضافية على القرص
+DEFAULT_SECURE_DELETE = "FAST"
+DEFAULT_BUSY_TIMEOUT = 20
+DEFAULT_CACHED_STATEMENTS = 256
+
+_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+_SECURE_DELETE_MODES = ("ON", "OFF", "FAST")
+
+
+def _close_connection(conn: sqlite3.Connection):
+    try:
+        conn.execute("PRAGMA optimize")
+        conn.close()
+    except sqlite3.Error as e:
+        logging.warning(f"تعذر إغلاق اتصال قاعدة البيانات: {e}")
+
+
+def _release_connection(pool_ref: "weakref.ref", pid: int, conn: sqlite3.Connection):
+    """يُستدعى عند انتهاء الخيط صاحب الاتصال (تحرير حامله في threading.local)."""
+    # العملية الابنة لا تغلق اتصالات الأب (الإغلاق قد ينقل WAL أو يحذفه)
+    if os.getpid() != pid:
+        return
+    pool = pool_ref()
+    if pool is None:
+        return
+    with pool._lock:
+        owned = pool._pid == pid and pool._connections.pop(id(conn), None) is conn
+    if owned:
+        _close_connection(conn)
+
+
+class _ThreadConnection:
+    """حامل اتصال الخيط في threading.local؛ يُحرَّر بانتهاء الخيط فيُغلق اتصاله."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """
+    اتصال SQLite لكل خيط، يُفتح عند أول طلب ويُعاد استخدامه حتى انتهاء الخيط أو
+    close()، فلا تتراكم اتصالات الخيوط القصيرة (مجمّعات الخيوط، خيوط الترحيل).
+    الاتصالات لا تُورَّث للعمليات الفرعية: بعد fork تفتح العملية الجديدة اتصالاتها.
+    """
+
+    def __init__(self, db_path, journal_mode: str = DEFAULT_JOURNAL_MODE,
+                 synchronous: str = DEFAULT_SYNCHRONOUS, cache_size: int = DEFAULT_CACHE_SIZE,
+                 mmap_size: int = DEFAULT_MMAP_SIZE, secure_delete: str = DEFAULT_SECURE_DELETE,
+                 timeout: float = DEFAULT_BUSY_TIMEOUT, cached_statements: int = DEFAULT_CACHED_STATEMENTS):
+        if synchronous.upper() not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"قيمة synchronous غير صالحة: {synchronous}")
+        if secure_delete.upper() not in _SECURE_DELETE_MODES:
+            raise ValueError(f"قيمة secure_delete غير صالحة: {secure_delete}")
+        self.db_path = Path(db_path)
+        self.journal_mode = journal_mode.upper()
+        self.synchronous = synchronous.upper()
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.secure_delete = secure_delete.upper()
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._lock = threading.Lock()
+        self._reset()
+        _POOLS.add(self)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._connections = {}
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=self.cached_statements,
+            # يُستخدم الاتصال في خيطه فقط، لكن close() قد تُستدعى من خيط آخر
+            check_same_thread=False
+        )
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {self.cache_size}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        conn.execute(f"PRAGMA secure_delete = {self.secure_delete}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """اتصال الخيط الحالي (يُفتح عند أول استخدام)."""
+        if self._pid != os.getpid():
+            # عملية فرعية: اتصالات الأب لا تُستخدم ولا تُغلق من هنا
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            if self._closed:
+                raise sqlite3.ProgrammingError("مجمّع الاتصالات مغلق")
+            conn = self._open()
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._lock:
+                self._connections[id(conn)] = conn
+            weakref.finalize(holder, _release_connection, weakref.ref(self), self._pid, conn)
+        return holder.conn
+
+    @property
+    def open_connections(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def close(self):
+        """إغلاق جميع اتصالات المجمّع في هذه العملية."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            connections, self._connections = self._connections, {}
+            self._closed = True
+        for conn in connections.values():
+            _close_connection(conn)
+        self._local = threading.local()
+
+
+# جميع المجمّعات المفتوحة؛ تُغلق عند خروج البرنامج
+_POOLS = weakref.WeakSet()
+
+
+@atexit.register
+def close_all_pools():
+    for pool in list(_POOLS):
+        pool.close()
+
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+doc_cache.py
+==================
+ذاكرة مؤقتة للمستندات المفكوك تشفيرها والمتحقَّق من سلامتها.
+
+الحد الأقصى بالبايت لا بعدد العناصر، والإخلاء بترتيب الأقدم استخداماً (LRU).
+في سياسة "tinylfu" لا يُقبل عنصر جديد على حساب ضحية إلا إذا كان تكراره
+المقدَّر (بمخطط Count-Min يُنصَّف دورياً) أعلى من تكرارها، فلا تطرد قراءات
+لمرة واحدة (كالمسح المتتابع) المستنداتِ الساخنة.
+
+خيارات الأمان: مدة صلاحية اختيارية (ttl)، و wipe لتخزين المحتوى في bytearray
+يُصفَّر عند الإخلاء أو الإبطال أو clear(). نصوص str المُعادة للمستدعي نسخ لا
+يمكن تصفيرها في Python؛ wipe يضمن فقط ألا تبقى نسخة الذاكرة المؤقتة نفسها.
+"""
+
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# 64 ميغابايت افتراضياً
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+POLICIES = ("lru", "tinylfu")
+
+# عرض وعمق مخطط Count-Min وحد التكرار قبل تنصيف العدادات
+_SKETCH_WIDTH = 4096
+_SKETCH_DEPTH = 4
+_SKETCH_MAX_COUNT = 15
+_SKETCH_SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+
+
+class _FrequencySketch:
+    """تقدير تكرار الوصول للمفاتيح (Count-Min) مع تقادم بتنصيف العدادات."""
+
+    def __init__(self, width: int = _SKETCH_WIDTH):
+        self.width = width
+        self.rows = [bytearray(width) for _ in range(_SKETCH_DEPTH)]
+        self.additions = 0
+        self.sample_size = width * 10
+
+    def _slots(self, key):
+        value = hash(key)
+        return [((value ^ seed) * seed >> 7) % self.width for seed in _SKETCH_SEEDS]
+
+    def increment(self, key):
+        for row, slot in zip(self.rows, self._slots(key)):
+            if row[slot] < _SKETCH_MAX_COUNT:
+                row[slot] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            for row in self.rows:
+                row[:] = bytes(count >> 1 for count in row)
+            self.additions //= 2
+
+    def frequency(self, key) -> int:
+        return min(row[slot] for row, slot in zip(self.rows, self._slots(key)))
+
+
+class DocumentCache:
+    """
+    ذاكرة مؤقتة آمنة للخيوط: معرّف المستند -> (العنوان، المحتوى، التجزئة).
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: Optional[float] = None,
+                 policy: str = "tinylfu", wipe: bool = False):
+        """
+        :param max_bytes: الحد الأقصى للحجم التقديري للمحتوى المخزن (0 يعطّل الذاكرة).
+        :param ttl: مدة صلاحية كل عنصر بالثواني (None: دون انتهاء).
+        :param policy: "lru" أو "tinylfu" (LRU مع فلتر قبول بالتكرار).
+        :param wipe: تخزين المحتوى في bytearray يُصفَّر عند إزالته.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"سياسة إخلاء غير مدعومة: {policy}")
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self.policy = policy
+        self.wipe = wipe
+        self.size = 0
+        self.hits = self.misses = self.evictions = self.rejections = self.expirations = 0
+        self._sketch = _FrequencySketch() if policy == "tinylfu" else None
+        self._lock = threading.Lock()
+        # المعرّف -> (العنوان، المحتوى، التجزئة، الحجم، وقت الانتهاء)
+        self._entries = OrderedDict()
+
+    def _entry_size(self, title: str, content) -> int:
+        return sys.getsizeof(title) + sys.getsizeof(content)
+
+    def get(self, doc_id: int) -> Optional[Dict]:
+        """المستند المخزن كقاموس جديد، أو None."""
+        with self._lock:
+            if self._sketch is not None:
+                self._sketch.increment(doc_id)
+            entry = self._entries.get(doc_id)
+            if entry is not None and entry[4] is not None and entry[4] <= time.monotonic():
+                self._remove(doc_id)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(doc_id)
+            self.hits += 1
+            title, content, content_hash = entry[:3]
+            if self.wipe:
+                content = content.decode("utf-8")
+        return {"id": doc_id, "title": title, "content": content, "hash": content_hash}
+
+    def put(self, doc_id: int, title: str, content: str, content_hash: str):
+        """تخزين مستند متحقَّق من سلامته (يُتجاهل إذا تجاوز حجمه الحد كله)."""
+        if self.max_bytes <= 0:
+            return
+        stored = bytearray(content.encode("utf-8")) if self.wipe else content
+        size = self._entry_size(title, stored)
+        if size > self.max_bytes:
+            self._clear_value(stored)
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if doc_id in self._entries:
+                self._remove(doc_id)
+            while self.size + size > self.max_bytes:
+                victim = next(iter(self._entries))
+                if self._sketch is not None and \
+                        self._sketch.frequency(doc_id) <= self._sketch.frequency(victim):
+                    self.rejections += 1
+                    self._clear_value(stored)
+                    return
+                self._remove(victim)
+                self.evictions += 1
+            self._entries[doc_id] = (title, stored, content_hash, size, expires)
+            self.size += size
+
+    def invalidate(self, doc_id: int):
+        """إزالة مستند (بعد تعديله أو حذفه أو إعادة استخدام معرّفه)."""
+        with self._lock:
+            if doc_id in self._entries:
+                self._remove(doc_id)
+
+    def clear(self):
+        with self._lock:
+            for doc_id in list(self._entries):
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: int):
+        entry = self._entries.pop(doc_id)
+        self.size -= entry[3]
+        self._clear_value(entry[1])
+
+    @staticmethod
+    def _clear_value(value):
+        if isinstance(value, bytearray):
+            value[:] = bytes(len(value))
+
+    def stats(self) -> Dict:
+        """عدادات الإصابة والإخفاق والإخلاء والحجم الحالي."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "rejections": self.rejections,
+                "expirations": self.expirations,
+            }
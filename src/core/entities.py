@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+entities.py
+==================
+استخراج الكيانات (التواريخ الميلادية والهجرية، الأسماء، الأماكن) في مرور واحد.
+
+تُجمع أنماط التواريخ والأسماء في تعبير نمطي واحد مُجمَّع مسبقاً، ويدعم الأرقام
+الهندية-العربية (٠-٩) وأسماء الأشهر العربية والعلامة "هـ". تُطابق الأماكن
+بقاموس أماكن (gazetteer) مبني مرة واحدة كآلة Aho–Corasick على الكلمات
+(core.lexicon.LexiconMatcher). تُعاد المواضع (بداية، نهاية) لكل كيان بحيث
+يمكن تخزينها دون نسخ النص.
+"""
+
+import os
+import re
+import logging
+from pathlib import Path
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+
+from core.lexicon import LexiconMatcher
+
+DATE = "date"
+HIJRI_DATE = "hijri_date"
+NAME = "name"
+PLACE = "place"
+
+# مسار قاموس الأماكن الافتراضي (يمكن تغييره بمتغير البيئة PLACES_GAZETTEER)
+DEFAULT_GAZETTEER_PATH = Path(os.getenv(
+    "PLACES_GAZETTEER",
+    Path(__file__).resolve().parents[2] / "data" / "gazetteers" / "places.txt"
+))
+
+# أقصى طول لكيان واحد؛ تُرحَّل آخر هذه الأحرف إلى الجزء التالي في وضع التدفق
+MAX_ENTITY_CHARS = 128
+
+_GREGORIAN_MONTHS = (
+    "يناير", "فبراير", "مارس", "أبريل", "إبريل", "مايو", "يونيو", "يونيه", "يوليو", "يوليه",
+    "أغسطس", "سبتمبر", "أكتوبر", "نوفمبر", "ديسمبر",
+    "كانون الثاني", "شباط", "آذار", "نيسان", "أيار", "حزيران", "تموز", "آب", "أيلول",
+    "تشرين الأول", "تشرين الثاني", "كانون الأول",
+)
+_ENGLISH_MONTHS = (
+    "January", "February", "March", "April", "May", "June", "July", "August",
+    "September", "October", "November", "December",
+)
+_HIJRI_MONTHS = (
+    "محرم", "صفر", "ربيع الأول", "ربيع الآخر", "ربيع الثاني", "جمادى الأولى", "جمادى الأول",
+    "جمادى الآخرة", "جمادى الثانية", "جمادى الآخر", "رجب", "شعبان", "رمضان", "شوال",
+    "ذو القعدة", "ذي القعدة", "ذو الحجة", "ذي الحجة",
+)
+
+
+def _alternation(words: Iterable[str]) -> str:
+    # الأطول أولاً حتى لا يسبق "كانون" "كانون الثاني" مثلاً
+    return "(?:%s)" % "|".join(
+        re.escape(word).replace(r"\ ", r"\s+") for word in sorted(words, key=len, reverse=True)
+    )
+
+
+# \d تطابق الأرقام الهندية-العربية أيضاً (٠-٩ و ۰-۹)
+_DAY = r"\d{1,2}"
+_YEAR = r"\d{3,4}"
+_HIJRI_MARK = r"\s*(?:هـ|ه)(?!\w)"
+_GREGORIAN_MARK = r"(?:\s*م(?!\w))?"
+
+# الأحرف التي يمكن أن يبدأ بها كيان: فحص مسبق رخيص قبل تجربة البدائل كلها
+_FIRST_CHARS = "".join(sorted({month[0] for month in _GREGORIAN_MONTHS + _HIJRI_MONTHS}))
+
+_ENTITY_RE = re.compile(
+    rf"(?<!\w)(?=[\dA-Z{_FIRST_CHARS}])(?:"
+    # تاريخ هجري: باسم شهر هجري، أو بأرقام تليها العلامة هـ
+    rf"(?P<{HIJRI_DATE}>(?:{_DAY}\s+)?{_alternation(_HIJRI_MONTHS)}\s+{_YEAR}(?:{_HIJRI_MARK})?"
+    rf"|(?:{_DAY}\s*[/-]\s*{_DAY}\s*[/-]\s*)?{_YEAR}{_HIJRI_MARK})"
+    # تاريخ ميلادي: dd/mm/yyyy، yyyy-mm-dd، أو باسم شهر عربي أو إنجليزي
+    rf"|(?P<{DATE}>(?:{_DAY}[/-]{_DAY}[/-]\d{{2,4}}|\d{{4}}-\d{{1,2}}-\d{{1,2}}"
+    rf"|(?:{_DAY}\s+)?{_alternation(_GREGORIAN_MONTHS)}\s+{_YEAR}"
+    rf"|{_DAY}\s+{_alternation(_ENGLISH_MONTHS)}\s+{_YEAR}"
+    rf"|{_alternation(_ENGLISH_MONTHS)}\s+{_DAY},?\s+{_YEAR}){_GREGORIAN_MARK}(?!\w))"
+    # الأسماء باللغة الإنجليزية (كلمات تبدأ بحرف كبير)
+    rf"|(?P<{NAME}>[A-Z][a-z]+(?!\w))"
+    r")"
+)
+_WORD_RE = re.compile(r"\w+")
+_SPLIT_CHARS = (" ", "\n", "\t", "\r")
+
+
+def load_gazetteer(path) -> List[str]:
+    """تحميل قاموس أماكن: اسم مكان في كل سطر (تُتجاهل الأسطر الفارغة وأسطر #)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+@lru_cache(maxsize=None)
+def _cached_place_matcher(path: str) -> Optional[LexiconMatcher]:
+    if not Path(path).exists():
+        return None
+    places = load_gazetteer(path)
+    logging.info(f"تم تحميل قاموس الأماكن ({len(places)} مكان) من {path}")
+    return LexiconMatcher((place, PLACE, 1.0) for place in places)
+
+
+def get_place_matcher(path=None) -> Optional[LexiconMatcher]:
+    """مُطابِق الأماكن المشترك (يُبنى مرة واحدة لكل ملف)، أو None عند غياب الملف."""
+    return _cached_place_matcher(str(path or DEFAULT_GAZETTEER_PATH))
+
+
+class EntityExtractor:
+    """
+    مستخرج الكيانات: التعبير النمطي المُجمَّع ومُطابِق الأماكن الاختياري.
+    """
+
+    def __init__(self, place_matcher: Optional[LexiconMatcher] = None):
+        self.place_matcher = place_matcher
+
+    def find(self, text: str) -> List[Tuple[str, int, int]]:
+        """الكيانات في النص كـ (النوع، البداية، النهاية) مرتبة بموضع البداية."""
+        found = [(match.lastgroup, match.start(), match.end()) for match in _ENTITY_RE.finditer(text)]
+        if self.place_matcher is not None:
+            found.extend(self._find_places(text))
+            found.sort(key=lambda entity: entity[1])
+        return found
+
+    def _find_places(self, text: str) -> List[Tuple[str, int, int]]:
+        """أطول أسماء الأماكن غير المتداخلة (الأبعد يساراً أولاً)."""
+        matches = self.place_matcher.stream().feed(_WORD_RE.findall(text))
+        candidates = [(first, index) for first, index, _ in matches]
+        if not candidates:
+            return []
+
+        selected = []
+        last = -1
+        for first, index in sorted(candidates, key=lambda match: (match[0], -match[1])):
+            if first > last:
+                selected.append((first, index))
+                last = index
+
+        # مواضع الكلمات المطابقة فقط: التخطي بـ islice يتم دون حلقة Python على كل كلمة
+        words = _WORD_RE.finditer(text)
+        position = 0
+        places = []
+        for first, index in selected:
+            start = next(islice(words, first - position, None))
+            end = start if index == first else next(islice(words, index - first - 1, None))
+            position = index + 1
+            places.append((PLACE, start.start(), end.end()))
+        return places
+
+    def extract(self, text: str) -> dict:
+        """استخراج كيانات نص كامل."""
+        return EntityScanner(self).feed(text).result()
+
+
+class EntityScanner:
+    """
+    حالة استخراج الكيانات عبر أجزاء متتالية من النص: تُرحَّل آخر
+    MAX_ENTITY_CHARS حرفاً من كل جزء وتُفحص مع الجزء التالي حتى لا يضيع
+    كيان يمتد على الحد بين جزأين (مثل "15 رمضان | 1445 هـ").
+    """
+
+    def __init__(self, extractor: EntityExtractor):
+        self.extractor = extractor
+        # (النوع، البداية، النهاية، النص) بمواضع نسبةً إلى بداية النص كله
+        self.entities = []
+        self.length = 0
+        self._tail = ""
+
+    def feed(self, text: str, final: bool = False) -> "EntityScanner":
+        """فحص جزء لاحق من النص."""
+        buffer = self._tail + text
+        offset = self.length - len(self._tail)
+        self.length += len(text)
+        cut = len(buffer)
+        if not final and len(buffer) > MAX_ENTITY_CHARS:
+            limit = len(buffer) - MAX_ENTITY_CHARS
+            cut = max(buffer.rfind(char, 0, limit) for char in _SPLIT_CHARS) + 1 or limit
+        elif not final:
+            cut = 0
+
+        for kind, start, end in self.extractor.find(buffer):
+            if start >= cut:
+                break
+            self.entities.append((kind, offset + start, offset + end, buffer[start:end]))
+            cut = max(cut, end)
+        self._tail = buffer[cut:]
+        return self
+
+    def flush(self) -> "EntityScanner":
+        """فحص ما تبقى عند نهاية النص."""
+        if self._tail:
+            self.length -= len(self._tail)
+            tail, self._tail = self._tail, ""
+            self.feed(tail, final=True)
+        return self
+
+    def merge(self, other: "EntityScanner") -> "EntityScanner":
+        """دمج كيانات جزء لاحق فُحص مستقلاً، مع إزاحة مواضعه."""
+        self.flush()
+        other.flush()
+        shift = self.length
+        self.entities.extend(
+            (kind, start + shift, end + shift, value) for kind, start, end, value in other.entities
+        )
+        self.length += other.length
+        return self
+
+    def result(self) -> dict:
+        self.flush()
+        return entities_result(self.entities)
+
+
+def entities_result(entities: List[tuple]) -> dict:
+    """قاموس الكيانات: القيم النصية مجمّعة حسب النوع، والمواضع في "spans"."""
+    groups = {DATE: [], HIJRI_DATE: [], NAME: {}, PLACE: {}}
+    for kind, _, _, value in entities:
+        if kind in (DATE, HIJRI_DATE):
+            groups[kind].append(value)
+        else:
+            groups[kind].setdefault(value)
+    return {
+        "dates": groups[DATE],
+        "hijri_dates": groups[HIJRI_DATE],
+        "names": list(groups[NAME]),
+        "places": list(groups[PLACE]),
+        "spans": [(kind, start, end) for kind, start, end, _ in entities]
+    }
+
+
+@lru_cache(maxsize=None)
+def _cached_extractor(path: str) -> EntityExtractor:
+    return EntityExtractor(get_place_matcher(path))
+
+
+def get_entity_extractor(gazetteer_path=None) -> EntityExtractor:
+    """المستخرج المشترك لكل قاموس أماكن."""
+    return _cached_extractor(str(gazetteer_path or DEFAULT_GAZETTEER_PATH))
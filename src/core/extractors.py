@@ -0,0 +1,470 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+extractors.py
+==================
+سجل موحّد لمستخرجات النصوص حسب نوع الملف.
+
+يُعرف النوع من البايتات الأولى للملف (التوقيع) لا من امتداده، فلا يُخدع
+الاستخراج بامتداد خاطئ أو مفقود. تُسجَّل المستخرجات بـ register_extractor
+وتستدعيها جميع نقاط الدخول (AIEngine وFileProcessor وFileReader والواجهات)
+عبر extract_text.
+
+تُوزَّع صفحات ملفات PDF الكبيرة على عمليات عاملة، تفتح كل منها نسختها من
+المستند وتستخرج نطاقاً متصلاً من الصفحات، ثم تُضم النطاقات بالترتيب بعملية
+join واحدة. الصفحات التي لا طبقة نص صالحة لها وحدها تُرسل إلى التعرف الضوئي.
+
+iter_text يقرأ الملف أجزاءً (صفحات PDF، فقرات DOCX والنصوص) مع موضع كل جزء،
+فتبدأ مراحل المعالجة اللاحقة قبل انتهاء الاستخراج.
+"""
+
+import os
+import re
+import time
+import codecs
+import logging
+import zipfile
+import threading
+from itertools import repeat
+from multiprocessing import get_context
+from xml.etree import ElementTree
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.batch import CHUNKS_PER_WORKER, prefetch, resolve_workers
+from core.converters import ConverterError, ConverterTimeout, get_converter_pool, textract_available
+from core.ocr import DEFAULT_DPI, get_ocr_service, ocr_available
+
+# محاولة استيراد PyMuPDF (اختياري)
+try:
+    import fitz
+    fitz_available = True
+except ImportError:
+    fitz_available = False
+
+# نوع الملف في جدول documents لكل نوع مُكتشف
+FILE_TYPES = {"pdf": "PDF", "docx": "DOC", "doc": "DOC", "odt": "DOC", "image": "IMG", "txt": "TXT"}
+
+# أقل عدد صفحات لكل عملية عاملة: الملفات الأصغر تُستخرج في العملية الحالية
+PDF_PAGES_PER_WORKER = 8
+# عدد عمليات استخراج PDF الافتراضي (None: عدد الأنوية)؛ عمليات المعالجة الدفعية
+# تضبطه على 1 لأن الملفات نفسها موزعة على الأنوية
+DEFAULT_PDF_WORKERS: Optional[int] = None
+
+# مجمّع عمليات PDF المشترك: يُنشأ عند أول ملف كبير ويُعاد استخدامه، وعملياته تُطلق
+# بـ spawn لا fork لأن العملية المستدعية (الخادم، الواجهة) تشغّل خيوطاً قد تكون
+# ممسكة بأقفال لحظة النسخ
+_PDF_POOL: Optional[ProcessPoolExecutor] = None
+_PDF_POOL_PID: Optional[int] = None
+_PDF_POOL_LOCK = threading.Lock()
+
+# طبقة نص الصفحة صالحة إذا بلغت أحرفها الظاهرة MIN_PAGE_TEXT_CHARS وكانت نسبة
+# المقروء منها MIN_PAGE_TEXT_QUALITY؛ وإلا تُحوَّل الصفحة إلى صورة بدقة PDF_OCR_DPI
+MIN_PAGE_TEXT_CHARS = 16
+MIN_PAGE_TEXT_QUALITY = 0.8
+PDF_OCR_DPI = DEFAULT_DPI
+_GARBAGE_RE = re.compile(r'[\ufffd\ue000-\uf8ff\x00-\x08\x0b\x0c\x0e-\x1f]|\(cid:\d+\)')
+
+# أقصى عدد أحرف لجزء نصي في iter_text (الفقرة الأطول تُقسم)
+STREAM_CHUNK_CHARS = 64 * 1024
+# عدد الأجزاء المقروءة مسبقاً في خيط خلفي عند تمرير prefetch_size
+STREAM_PREFETCH = 4
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# عدد البايتات المقروءة لاكتشاف النوع
+_SNIFF_SIZE = 8192
+
+_SIGNATURES = (
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "doc"),  # OLE2 (Word 97-2003)
+    (b"\x89PNG\r\n\x1a\n", "image"),
+    (b"\xff\xd8\xff", "image"),  # JPEG
+    (b"GIF87a", "image"),
+    (b"GIF89a", "image"),
+    (b"II*\x00", "image"),  # TIFF
+    (b"MM\x00*", "image"),
+)
+_ODT_MIMETYPE = b"application/vnd.oasis.opendocument.text"
+
+EXTRACTORS: Dict[str, Callable[[str], str]] = {}
+STREAMERS: Dict[str, Callable[[str], Iterator[Dict]]] = {}
+
+
+def register_extractor(kind: str):
+    """مُزخرف لتسجيل مستخرج نوع (يستبدل المستخرج السابق للنوع نفسه)."""
+    def decorator(func: Callable[[str], str]) -> Callable[[str], str]:
+        EXTRACTORS[kind] = func
+        return func
+    return decorator
+
+
+def register_streamer(kind: str):
+    """
+    مُزخرف لتسجيل قارئ أجزاء لنوع: مولّد سجلات {"text", "kind", "page", "source"}
+    يساوي ضم نصوصها ناتج مستخرج النوع. الأنواع بلا قارئ تُقسم نتيجة مستخرجها.
+    """
+    def decorator(func: Callable[[str], Iterator[Dict]]) -> Callable[[str], Iterator[Dict]]:
+        STREAMERS[kind] = func
+        return func
+    return decorator
+
+
+def _sniff_zip(path: str) -> Optional[str]:
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = set(archive.namelist())
+            if "word/document.xml" in names:
+                return "docx"
+            if "mimetype" in names and archive.read("mimetype").strip() == _ODT_MIMETYPE:
+                return "odt"
+    except zipfile.BadZipFile:
+        pass
+    return None
+
+
+def detect_type(path: str) -> Optional[str]:
+    """
+    نوع الملف من توقيع بايتاته الأولى: "pdf" أو "docx" أو "doc" أو "odt" أو
+    "image" أو "txt" (نص UTF-8 صالح دون بايتات صفرية)، أو None.
+    """
+    with open(path, "rb") as f:
+        head = f.read(_SNIFF_SIZE)
+    # يسمح المعيار ببايتات قبل ترويسة PDF ضمن أول كيلوبايت
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    for signature, kind in _SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image"
+    if head.startswith(b"PK\x03\x04"):
+        return _sniff_zip(path)
+    if b"\x00" in head:
+        return None
+    try:
+        # final=False: حرف مقطوع في نهاية العينة لا يُعد خطأ
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return None
+    return "txt"
+
+
+def file_type(path: str) -> str:
+    """
+    نوع الملف في جدول documents (DOC، PDF، TXT، IMG).
+    :raises ValueError: إذا لم يكن النوع مدعوماً.
+    """
+    kind = detect_type(path)
+    if kind not in FILE_TYPES or kind not in EXTRACTORS:
+        raise ValueError("تنسيق الملف غير مدعوم")
+    return FILE_TYPES[kind]
+
+
+def extract_text(path: str, kind: Optional[str] = None) -> str:
+    """
+    استخراج نص ملف بمستخرج نوعه.
+    :param kind: النوع إن كان معروفاً (الافتراضي اكتشافه من بايتات الملف).
+    :raises ValueError: إذا لم يكن النوع مدعوماً.
+    """
+    kind = kind or detect_type(path)
+    if kind not in EXTRACTORS:
+        raise ValueError("تنسيق الملف غير مدعوم")
+    return EXTRACTORS[kind](path)
+
+
+def iter_text(path: str, kind: Optional[str] = None, prefetch_size: int = 0) -> Iterator[Dict]:
+    """
+    قراءة نص ملف أجزاءً بحجم صفحة أو فقرة فور استخراجها، بدلاً من انتظار النص كاملاً.
+    :param kind: النوع إن كان معروفاً (الافتراضي اكتشافه من بايتات الملف).
+    :param prefetch_size: إن كان موجباً يُستخرج حتى هذا العدد من الأجزاء مسبقاً في
+                          خيط خلفي ويتوقف الاستخراج حتى يستهلكها المستدعي (ضغط عكسي).
+    :return: مولّد سجلات {"text", "index", "offset" (موضع أول حرف في النص كاملاً),
+             "kind" ("page" أو "paragraph"), "page" (رقم الصفحة أو None), "source"
+             ("text" أو "ocr" أو "empty")}؛ ضم نصوصها يساوي extract_text(path).
+    :raises ValueError: إذا لم يكن النوع مدعوماً (فوراً، قبل بدء القراءة).
+    """
+    kind = kind or detect_type(path)
+    if kind not in EXTRACTORS:
+        raise ValueError("تنسيق الملف غير مدعوم")
+    streamer = STREAMERS.get(kind)
+    chunks = _positioned(streamer(path) if streamer else _split_extracted(kind, path))
+    return prefetch(chunks, prefetch_size) if prefetch_size > 0 else chunks
+
+
+def _positioned(records: Iterable[Dict]) -> Iterator[Dict]:
+    offset = 0
+    for index, record in enumerate(records):
+        record["index"], record["offset"] = index, offset
+        offset += len(record["text"])
+        yield record
+
+
+def _paragraph_chunks(lines: Iterable[str], source: str = "text") -> Iterator[Dict]:
+    """
+    تجميع الأسطر في أجزاء تنتهي بعد سطر فارغ يلي نصاً (نهاية فقرة)، أو عند
+    بلوغ STREAM_CHUNK_CHARS.
+    """
+    block, size, has_text = [], 0, False
+    for line in lines:
+        blank = not line.strip()
+        block.append(line)
+        size += len(line)
+        if (blank and has_text) or size >= STREAM_CHUNK_CHARS:
+            yield {"text": "".join(block), "kind": "paragraph", "page": None, "source": source}
+            block, size, has_text = [], 0, False
+        else:
+            has_text = has_text or not blank
+    if block:
+        yield {"text": "".join(block), "kind": "paragraph", "page": None, "source": source}
+
+
+def _split_extracted(kind: str, path: str) -> Iterator[Dict]:
+    """أجزاء نوع بلا قارئ أجزاء: يُستخرج النص كاملاً ثم يُقسم فقرات."""
+    yield from _paragraph_chunks(EXTRACTORS[kind](path).splitlines(keepends=True))
+
+
+def _require(available: bool, name: str):
+    if not available:
+        raise RuntimeError(f"مكتبة {name} غير متوفرة")
+
+
+def page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """تقسيم الصفحات إلى parts نطاقاً متصلاً [start, stop) متقارب الحجم."""
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges, start = [], 0
+    for part in range(parts):
+        stop = start + size + (part < extra)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def text_layer_usable(text: str) -> bool:
+    """
+    هل طبقة نص الصفحة صالحة؟ لا إذا قلّت أحرفها عن MIN_PAGE_TEXT_CHARS (صفحة
+    ممسوحة)، أو كثرت فيها الرموز التالفة (ترميز خط مكسور: U+FFFD والمنطقة
+    الخاصة و(cid:N) ومحارف التحكم) أو قلّت الحروف والأرقام.
+    """
+    visible = len(text) - sum(1 for c in text if c.isspace())
+    if visible < MIN_PAGE_TEXT_CHARS:
+        return False
+    garbage = sum(len(match) for match in _GARBAGE_RE.findall(text))
+    readable = sum(1 for c in text if c.isalnum()) - garbage
+    return garbage / visible <= 1 - MIN_PAGE_TEXT_QUALITY and readable / visible >= MIN_PAGE_TEXT_QUALITY / 2
+
+
+def _scan_page(page) -> Dict:
+    """سجل صفحة من طبقة نصها؛ source = "ocr" إذا احتاجت إلى التعرف الضوئي."""
+    started = time.perf_counter()
+    text = page.get_text("text")
+    if text_layer_usable(text):
+        source = "text"
+    elif page.get_images(full=False):
+        source = "ocr"
+    else:
+        source = "text" if text.strip() else "empty"
+    return {"page": page.number, "text": text, "source": source,
+            "seconds": time.perf_counter() - started, "error": None}
+
+
+def _pdf_range_pages(path: str, start: int, stop: int) -> List[Dict]:
+    """سجلات نطاق صفحات (في العملية العاملة، بنسخة مستقلة من المستند)."""
+    with fitz.open(path) as doc:
+        return [_scan_page(doc[number]) for number in range(start, stop)]
+
+
+def _apply_ocr(path: str, pages: List[Dict], dpi: int):
+    """استبدال نصوص الصفحات المعلّمة بـ "ocr" بنتائج التعرف الضوئي (بالتوازي)."""
+    pending = [page for page in pages if page["source"] == "ocr"]
+    if not pending:
+        return
+    if not ocr_available:
+        logging.warning(f"التعرف الضوئي غير متوفر: {len(pending)} صفحة بلا طبقة نص صالحة في {path}")
+        for page in pending:
+            page["source"] = "text"
+        return
+    results = get_ocr_service().recognize_pdf_pages(path, [page["page"] for page in pending], dpi)
+    for page, result in zip(pending, results):
+        page["seconds"] += result["seconds"]
+        if result["error"]:
+            # تبقى طبقة النص الأصلية (مهما قلّت) عند فشل التعرف
+            page["source"], page["error"] = "text", result["error"]
+        else:
+            page["text"], page["cached"] = result["text"], result["cached"]
+
+
+def _pdf_pool() -> ProcessPoolExecutor:
+    global _PDF_POOL, _PDF_POOL_PID
+    with _PDF_POOL_LOCK:
+        # المجمّع الموروث بالنسخ لا تعمل خيوط إدارته في العملية الابنة
+        if _PDF_POOL is None or _PDF_POOL_PID != os.getpid():
+            _PDF_POOL = ProcessPoolExecutor(
+                max_workers=resolve_workers(DEFAULT_PDF_WORKERS, os.cpu_count() or 1),
+                mp_context=get_context("spawn")
+            )
+            _PDF_POOL_PID = os.getpid()
+        return _PDF_POOL
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor):
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is pool:
+            _PDF_POOL = None
+
+
+def shutdown_pdf_pool():
+    """إيقاف مجمّع عمليات PDF المشترك (يُعاد إنشاؤه عند الحاجة)."""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        pool, _PDF_POOL = _PDF_POOL, None
+    if pool is not None and _PDF_POOL_PID == os.getpid():
+        pool.shutdown()
+
+
+def extract_pdf_pages(path: str, workers: Optional[int] = None, ocr: bool = True,
+                      dpi: int = PDF_OCR_DPI) -> List[Dict]:
+    """
+    استخراج صفحات PDF كلٌّ على حدة: الصفحة ذات طبقة النص الصالحة تُقرأ بـ get_text،
+    والصفحة الممسوحة (أو ذات الطبقة التالفة) تُحوَّل إلى صورة بدقة dpi وتُرسل إلى
+    خدمة التعرف الضوئي، فلا تُدفع كلفة OCR إلا حيث يلزم. تُوزَّع نطاقات الصفحات على
+    عمليات عاملة للملفات الكبيرة، وصفحات OCR على مجمّع الخدمة.
+    :param workers: عدد العمليات من المجمّع المشترك؛ الافتراضي DEFAULT_PDF_WORKERS (دون
+                    أن تقل صفحات العملية عن PDF_PAGES_PER_WORKER).
+    :param ocr: التعرف الضوئي على الصفحات بلا طبقة نص صالحة.
+    :return: بترتيب الصفحات {"page", "text", "source" ("text" أو "ocr" أو "empty"),
+             "seconds", "error"} (وcached لصفحات OCR).
+    """
+    _require(fitz_available, "PyMuPDF")
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+        workers = resolve_workers(
+            DEFAULT_PDF_WORKERS if workers is None else workers, page_count // PDF_PAGES_PER_WORKER
+        )
+        if workers == 1:
+            pages = [_scan_page(page) for page in doc]
+    if workers > 1:
+        # نطاقات أكثر من العمليات لموازنة الحمل بين الصفحات الخفيفة والثقيلة
+        starts, stops = zip(*page_ranges(page_count, workers * CHUNKS_PER_WORKER))
+        pool = _pdf_pool()
+        try:
+            pages = [page for batch in pool.map(_pdf_range_pages, repeat(path), starts, stops) for page in batch]
+        except BrokenProcessPool:
+            # انهيار عملية (ملف تالف يُسقط المكتبة الأصلية): لا يُعاد استخدام المجمّع المكسور
+            _discard_pdf_pool(pool)
+            raise
+    if ocr:
+        _apply_ocr(path, pages, dpi)
+    return pages
+
+
+@register_streamer("pdf")
+def stream_pdf(path: str, ocr: bool = True, dpi: int = PDF_OCR_DPI) -> Iterator[Dict]:
+    """
+    صفحات PDF بالترتيب فور قراءة كل منها، مع التعرف الضوئي على الصفحات بلا طبقة
+    نص صالحة كما في extract_pdf_pages.
+    """
+    _require(fitz_available, "PyMuPDF")
+    with fitz.open(path) as doc:
+        for page in doc:
+            record = _scan_page(page)
+            if ocr:
+                _apply_ocr(path, [record], dpi)
+            yield {"text": record["text"] + "\n", "kind": "page", "page": record["page"], "source": record["source"]}
+
+
+def iter_pdf_pages(path: str, ocr: bool = True, dpi: int = PDF_OCR_DPI) -> Iterator[str]:
+    """قراءة PDF صفحة بصفحة دون تجميع النص كاملاً (لـ TextProcessor.process_stream)."""
+    for record in stream_pdf(path, ocr, dpi):
+        yield record["text"]
+
+
+@register_extractor("pdf")
+def extract_pdf(path: str, workers: Optional[int] = None, ocr: bool = True, dpi: int = PDF_OCR_DPI) -> str:
+    """نص PDF كاملاً بترتيب الصفحات (انظر extract_pdf_pages)."""
+    return "".join(page["text"] + "\n" for page in extract_pdf_pages(path, workers, ocr, dpi))
+
+
+@register_streamer("docx")
+def stream_docx(path: str) -> Iterator[Dict]:
+    """
+    فقرات DOCX بقراءة word/document.xml تدفقياً من الأرشيف (iterparse)، فلا تُبنى
+    شجرة المستند كاملة؛ تُحذف عناصر كل فقرة بعد قراءتها.
+    """
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        parts, in_properties = [], 0
+        for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+            tag = element.tag
+            if tag == _W + "pPr":
+                # w:tab داخل خصائص الفقرة تعريف لموضع الجدولة لا حرف في النص
+                in_properties += 1 if event == "start" else -1
+            elif event == "start":
+                continue
+            elif tag == _W + "t":
+                parts.append(element.text or "")
+            elif tag in (_W + "tab", _W + "br", _W + "cr") and not in_properties:
+                parts.append("\t" if tag == _W + "tab" else "\n")
+            elif tag == _W + "p":
+                yield {"text": "".join(parts) + "\n", "kind": "paragraph", "page": None, "source": "text"}
+                parts = []
+                element.clear()
+
+
+@register_extractor("docx")
+def extract_docx(path: str) -> str:
+    return "".join(record["text"] for record in stream_docx(path))
+
+
+@register_extractor("doc")
+def extract_doc(path: str) -> str:
+    """
+    ملفات Word القديمة عبر antiword، وإلا textract (إن لم يكن antiword مثبتاً أو
+    فشل). الملف الذي تجاوز المهلة لا يُعاد مع textract.
+    """
+    try:
+        return get_converter_pool().antiword(path)
+    except ConverterTimeout:
+        raise
+    except (FileNotFoundError, ConverterError):
+        return extract_with_textract(path, "doc")
+
+
+def extract_with_textract(path: str, extension: Optional[str] = None) -> str:
+    """
+    textract في عملية خادمة من مجمّع المحوّلات (بمهلة وحد ذاكرة).
+    :param extension: النوع المُكتشف؛ textract يختار المحلل من الامتداد، والملف قد
+                      يكون بلا امتداد (كالملفات المرفوعة) أو بامتداد خاطئ.
+    """
+    _require(textract_available, "textract")
+    return get_converter_pool().textract(path, extension)
+
+
+@register_extractor("odt")
+def extract_odt(path: str) -> str:
+    return extract_with_textract(path, "odt")
+
+
+@register_extractor("image")
+def extract_image(path: str) -> str:
+    """التعرف الضوئي عبر خدمة OCR المشتركة (مع معالجتها المسبقة وذاكرة نتائجها)."""
+    return get_ocr_service().recognize(path)
+
+
+@register_streamer("image")
+def stream_image(path: str) -> Iterator[Dict]:
+    yield {"text": extract_image(path), "kind": "page", "page": 0, "source": "ocr"}
+
+
+@register_extractor("txt")
+def extract_txt(path: str) -> str:
+    with open(path, encoding="utf-8-sig") as f:
+        return f.read()
+
+
+@register_streamer("txt")
+def stream_txt(path: str) -> Iterator[Dict]:
+    with open(path, encoding="utf-8-sig") as f:
+        # readline محدود الحجم: السطر الطويل جداً لا يُحمَّل دفعة واحدة
+        yield from _paragraph_chunks(iter(lambda: f.readline(STREAM_CHUNK_CHARS), ""))
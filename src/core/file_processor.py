@@ -1,14 +1,9 @@
-import fitz  # PyMuPDF
-from docx import Document
-import pytesseract
-from PIL import Image
-import textract
 import re
-from typing import List
+from typing import Dict, Iterator, List
 from camel_tools.morphology.database import MorphologyDB
 from camel_tools.disambig.mle import MLEDisambiguator
-from pathlib import Path
 from loguru import logger
+from core import extractors
 
 class FileProcessor:
     def __init__(self):
@@ -17,45 +12,36 @@ class FileProcessor:
         self.stopwords = {'من', 'إلى', 'في', 'على', 'أن'}
 
     def process_file(self, file_path: str) -> str:
-        """استخراج النص من أي تنسيق مدعوم"""
-        ext = Path(file_path).suffix.lower()
+        """استخراج النص من أي تنسيق مدعوم (النوع من بايتات الملف، انظر core.extractors)"""
         try:
-            if ext == '.pdf':
-                return self._extract_pdf(file_path)
-            elif ext == '.docx':
-                return self._extract_docx(file_path)
-            elif ext in ('.jpg', '.png', '.jpeg'):
-                return self._extract_image_text(file_path)
-            elif ext == '.txt':
-                return self._extract_txt(file_path)
-            else:
-                raise ValueError(f"التنسيق غير مدعوم: {ext}")
+            return extractors.extract_text(file_path)
         except Exception as e:
             logger.error(f"خطأ في معالجة الملف: {str(e)}")
             return ""
 
+    def iter_text(self, file_path: str, prefetch_size: int = extractors.STREAM_PREFETCH) -> Iterator[Dict]:
+        """قراءة النص أجزاءً (صفحات أو فقرات) مع مواضعها فور استخراجها (انظر extractors.iter_text)"""
+        return extractors.iter_text(file_path, prefetch_size=prefetch_size)
+
     def _extract_pdf(self, path: str) -> str:
         """استخراج النص من PDF مع دعم العربية"""
-        text = ""
-        with fitz.open(path) as doc:
-            for page in doc:
-                text += page.get_text()
-        return text
+        return extractors.extract_text(path, "pdf")
+
+    def iter_pdf_pages(self, path: str) -> Iterator[str]:
+        """قراءة PDF صفحة بصفحة (مناسب لـ TextProcessor.process_stream)"""
+        return extractors.iter_pdf_pages(path)
 
     def _extract_docx(self, path: str) -> str:
         """استخراج النص من DOCX"""
-        doc = Document(path)
-        return '\n'.join([para.text for para in doc.paragraphs])
+        return extractors.extract_text(path, "docx")
 
     def _extract_image_text(self, path: str) -> str:
         """استخراج النص من الصور"""
-        img = Image.open(path)
-        return pytesseract.image_to_string(img, lang='ara+eng')
+        return extractors.extract_text(path, "image")
 
     def _extract_txt(self, path: str) -> str:
         """قراءة ملفات TXT"""
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
+        return extractors.extract_text(path, "txt")
 
     def clean_text(self, text: str) -> str:
         """تنظيف النص وإزالة العناصر غير المرغوبة"""
@@ -1,9 +1,8 @@
-import textract
 import logging
-import subprocess
-from pathlib import Path
+from typing import Dict, Iterator
 from cryptography.fernet import Fernet
-from .config import DATA_DIR, SECRET_KEY
+from . import extractors
+from .config import SECRET_KEY
 
 class FileReader:
     """قراءة الملفات بأنواعها مع دعم خاص للملفات القديمة"""
@@ -22,34 +21,24 @@ class FileReader:
             self.logger.error(f"فشل قراءة الملف {file_path}: {str(e)}")
             return ""
 
+    def iter_file(self, file_path: str, encrypt_content: bool = False) -> Iterator[Dict]:
+        """
+        قراءة الملف أجزاءً (صفحات أو فقرات) مع مواضعها، يُشفَّر كل جزء وحده فور
+        قراءته عند طلب التشفير (انظر extractors.iter_text)
+        """
+        for chunk in extractors.iter_text(file_path, prefetch_size=extractors.STREAM_PREFETCH):
+            if encrypt_content:
+                chunk["text"] = self.cipher.encrypt(chunk["text"].encode()).decode()
+            yield chunk
+
     def _read_content(self, path: str) -> str:
-        """التوزيع الداخلي حسب نوع الملف"""
-        file_ext = Path(path).suffix.lower()
-        
-        if file_ext == '.doc':
-            return self._read_old_doc(path)
-        elif file_ext in ('.jpg', '.png'):
-            return self._read_image(path)
-        else:
-            return textract.process(path).decode('utf-8', errors='ignore')
+        """التوزيع الداخلي حسب نوع الملف المُكتشف من بايتاته (انظر core.extractors)"""
+        return extractors.extract_text(path)
 
     def _read_old_doc(self, path: str) -> str:
         """معالجة ملفات DOC القديمة باستخدام antiword"""
         try:
-            temp_path = DATA_DIR / "temp.doc"
-            with open(temp_path, 'wb') as f:
-                f.write(Path(path).read_bytes())
-                
-            result = subprocess.run(
-                ['antiword', str(temp_path)],
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='ignore'
-            )
-            
-            temp_path.unlink(missing_ok=True)
-            return result.stdout
+            return extractors.extract_text(path, "doc")
         except Exception as e:
             self.logger.error(f"خطأ في معالجة DOC: {str(e)}")
             return ""
@@ -57,8 +46,7 @@ class FileReader:
     def _read_image(self, path: str) -> str:
         """استخراج النص من الصور باستخدام pytesseract"""
         try:
-            from PIL import Image
-            return pytesseract.image_to_string(Image.open(path), lang='ara+eng')
+            return extractors.extract_text(path, "image")
         except Exception as e:
             self.logger.error(f"خطأ في معالجة الصورة: {str(e)}")
-            return ""
\ No newline at end of file
+            return ""
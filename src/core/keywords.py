@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+keywords.py
+==================
+استخراج الكلمات المفتاحية على مستوى المدونة (TF-IDF / BM25).
+
+تُحفظ تكرارات الوثائق لكل كلمة (DF) في قاعدة البيانات مفهرسة ببصمة الكلمة
+لا بنصها، وتُحدَّث تدريجياً مع كل مستند جديد. تُحمَّل لقطة منها للقراءة فقط
+(CorpusStats) كمصفوفتين مرتبتين صغيرتي الحجم يسهل مشاركتها مع العمليات العاملة.
+"""
+
+import heapq
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from core.batch import run_batch
+from core.term_hashing import TermHasher
+from core.text_processing import KEYWORDS_COUNT, candidate_terms, word_counts
+
+TFIDF = "tfidf"
+BM25 = "bm25"
+FREQUENCY = "frequency"
+SCHEMES = (TFIDF, BM25, FREQUENCY)
+
+# معاملات BM25 القياسية
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class CorpusStats:
+    """
+    لقطة للقراءة فقط من إحصاءات المدونة: عدد المستندات، مجموع الكلمات،
+    وتكرار الوثائق لكل بصمة كلمة (مصفوفتان مرتبتان للبحث الثنائي المتجه).
+    """
+
+    def __init__(self, hasher: TermHasher, document_count: int, total_terms: int,
+                 term_hashes: np.ndarray, frequencies: np.ndarray):
+        order = np.argsort(term_hashes, kind="stable")
+        self.hasher = hasher
+        self.document_count = document_count
+        self.total_terms = total_terms
+        self._hashes = np.asarray(term_hashes, dtype=np.int64)[order]
+        self._frequencies = np.asarray(frequencies, dtype=np.int64)[order]
+
+    @property
+    def average_length(self) -> float:
+        """متوسط طول المستند بالكلمات."""
+        return self.total_terms / self.document_count if self.document_count else 0.0
+
+    def document_frequencies(self, terms: List[str]) -> np.ndarray:
+        """تكرار الوثائق لكل كلمة (صفر للكلمات غير المعروفة)."""
+        if not terms or not len(self._hashes):
+            return np.zeros(len(terms), dtype=np.int64)
+        hashes = np.fromiter((self.hasher.digest(term) for term in terms), dtype=np.int64, count=len(terms))
+        positions = np.searchsorted(self._hashes, hashes).clip(max=len(self._hashes) - 1)
+        found = self._hashes[positions] == hashes
+        return np.where(found, self._frequencies[positions], 0)
+
+
+class KeywordExtractor:
+    """
+    اختيار أعلى k كلمات مفتاحية بكومة (heap) وفق مخطط تقييم قابل للتهيئة:
+      - tfidf: التكرار × معكوس تكرار الوثائق (مع التنعيم).
+      - bm25: أوزان BM25 مع تطبيع طول المستند.
+      - frequency: التكرار فقط (السلوك القديم، ويُستخدم عند غياب إحصاءات المدونة).
+    """
+
+    def __init__(self, stats: Optional[CorpusStats] = None, k: int = KEYWORDS_COUNT,
+                 scheme: str = TFIDF, k1: float = BM25_K1, b: float = BM25_B):
+        if scheme not in SCHEMES:
+            raise ValueError(f"مخطط تقييم غير معروف: {scheme}")
+        self.stats = stats
+        self.k = k
+        self.scheme = scheme
+        self.k1 = k1
+        self.b = b
+
+    def score(self, token_counts: Counter):
+        """
+        تقييم الكلمات المرشحة في مستند.
+        :return: (الكلمات، مصفوفة الدرجات) بترتيب أول ظهور.
+        """
+        terms_counts = candidate_terms(token_counts)
+        terms = list(terms_counts)
+        tf = np.fromiter(terms_counts.values(), dtype=np.float64, count=len(terms))
+        stats = self.stats
+        if self.scheme == FREQUENCY or stats is None or not stats.document_count:
+            return terms, tf
+
+        n = stats.document_count
+        df = stats.document_frequencies(terms)
+        if self.scheme == TFIDF:
+            return terms, tf * (np.log((1 + n) / (1 + df)) + 1)
+
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        length = sum(token_counts.values())
+        norm = self.k1 * (1 - self.b + self.b * length / (stats.average_length or length or 1))
+        return terms, idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def extract_from_counts(self, token_counts: Counter, k: Optional[int] = None) -> List[str]:
+        """أعلى k كلمات من مدرّج كلمات محسوب مسبقاً."""
+        terms, scores = self.score(token_counts)
+        best = heapq.nlargest(k or self.k, range(len(terms)), key=scores.__getitem__)
+        return [terms[index] for index in best]
+
+    def extract(self, text: str, k: Optional[int] = None) -> List[str]:
+        """أعلى k كلمات مفتاحية في النص."""
+        return self.extract_from_counts(word_counts(text), k)
+
+    def extract_many(self, texts: Iterable[str], workers: Optional[int] = None) -> List[dict]:
+        """
+        استخراج الكلمات المفتاحية لمجموعة نصوص بالتوازي.
+        تُرسل لقطة الإحصاءات مرة واحدة لكل عملية عاملة وتُقرأ فقط.
+        :return: قائمة بنفس ترتيب النصوص، كل عنصر فيها {"result": ..., "error": ...}.
+        """
+        texts = list(texts)
+        return run_batch(
+            _extract_batch_item,
+            texts,
+            workers=workers,
+            initializer=_init_batch_worker,
+            initargs=(self,),
+            weights=[len(text) if isinstance(text, str) else 0 for text in texts]
+        )
+
+
+# نسخة المستخرج الخاصة بكل عملية عاملة في المعالجة الدفعية
+_worker_extractor = None
+
+
+def _init_batch_worker(extractor: KeywordExtractor):
+    global _worker_extractor
+    _worker_extractor = extractor
+
+
+def _extract_batch_item(text: str) -> List[str]:
+    return _worker_extractor.extract(text)
+
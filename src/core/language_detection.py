@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+language_detection.py
+==================
+كشف اللغة على مستويين:
+
+1. مدرّج أنظمة الكتابة: مرور واحد متجه على نقاط الترميز يصنّف كل حرف
+   (عربي، لاتيني، غيرهما) ويُرجع اللغة الغالبة ودرجة الثقة ومقاطع النص
+   المتتالية بكل نظام كتابة (للنصوص المختلطة).
+2. نموذج fastText (lid.176.bin): لا يُحمَّل إلا عند أول حاجة إليه، ولا
+   يُستشار إلا حين يكون المستوى الأول غير حاسم (نص مختلط أو قصير جداً أو
+   بنظام كتابة آخر).
+
+تُحفظ النتائج في ذاكرة LRU مفهرسة ببصمة النص.
+"""
+
+import os
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from core.numerology import codepoints
+
+# محاولة استيراد fastText (اختياري)
+try:
+    import fasttext
+    fasttext_available = True
+except ImportError:
+    fasttext_available = False
+
+# تصنيفات أنظمة الكتابة في جدول البحث
+NEUTRAL, ARABIC, LATIN, OTHER = range(4)
+SCRIPT_LANGUAGES = {ARABIC: "ar", LATIN: "en", OTHER: "und"}
+
+# تُعد النتيجة حاسمة إذا بلغت نسبة النظام الغالب هذا الحد وعدد الأحرف الحد الأدنى
+CONFIDENCE_THRESHOLD = 0.8
+MIN_LETTERS = 4
+
+DEFAULT_CACHE_SIZE = 4096
+# أقصى طول يُمرَّر إلى fastText من بداية النص
+FASTTEXT_SAMPLE_CHARS = 4096
+
+DEFAULT_MODEL_PATH = Path(os.getenv("FASTTEXT_LID_MODEL", "lid.176.bin"))
+
+_LUT_SIZE = 0x10000
+_ARABIC_RANGES = ((0x0600, 0x0700), (0x0750, 0x0780), (0x08A0, 0x0900), (0xFB50, 0xFE00), (0xFE70, 0xFF00))
+_LATIN_RANGES = ((0x0041, 0x005B), (0x0061, 0x007B), (0x00C0, 0x0250), (0x1E00, 0x1F00))
+
+
+def _build_script_table() -> np.ndarray:
+    table = np.zeros(_LUT_SIZE, dtype=np.uint8)
+    for code in range(_LUT_SIZE - 1):
+        if chr(code).isalpha():
+            table[code] = OTHER
+    for start, end in _LATIN_RANGES:
+        table[start:end] = np.where(table[start:end] == OTHER, LATIN, NEUTRAL)
+    for start, end in _ARABIC_RANGES:
+        # الحركات والأرقام العربية ليست أحرفاً فتبقى محايدة
+        table[start:end] = np.where(table[start:end] == OTHER, ARABIC, NEUTRAL)
+    return table
+
+
+_SCRIPT_TABLE = _build_script_table()
+
+
+def script_histogram(text: str) -> np.ndarray:
+    """عدد الأحرف في كل نظام كتابة (مفهرس بـ NEUTRAL/ARABIC/LATIN/OTHER)."""
+    return np.bincount(_SCRIPT_TABLE.take(codepoints(text), mode='clip'), minlength=4)
+
+
+def script_spans(text: str) -> List[dict]:
+    """
+    مقاطع النص المتتالية بنظام كتابة واحد؛ الأحرف المحايدة (فراغات، أرقام،
+    علامات ترقيم) لا تقطع المقطع.
+    """
+    scripts = _SCRIPT_TABLE.take(codepoints(text), mode='clip')
+    positions = np.flatnonzero(scripts != NEUTRAL)
+    if not len(positions):
+        return []
+    letters = scripts[positions]
+    changes = np.flatnonzero(letters[1:] != letters[:-1]) + 1
+    starts = positions[np.concatenate(([0], changes))]
+    ends = positions[np.concatenate((changes - 1, [len(positions) - 1]))] + 1
+    return [
+        {"language": SCRIPT_LANGUAGES[script], "start": start, "end": end}
+        for script, start, end in zip(letters[np.concatenate(([0], changes))].tolist(),
+                                      starts.tolist(), ends.tolist())
+    ]
+
+
+def classify_histogram(histogram: np.ndarray) -> dict:
+    """
+    نتيجة المستوى الأول من مدرّج أنظمة الكتابة.
+    :return: قاموس فيه اللغة الغالبة والثقة وهل النتيجة حاسمة.
+    """
+    letters = int(histogram[1:].sum())
+    if not letters:
+        return {"language": "en", "confidence": 0.0, "ambiguous": True}
+    dominant = int(np.argmax(histogram[1:])) + 1
+    confidence = float(histogram[dominant]) / letters
+    ambiguous = dominant == OTHER or letters < MIN_LETTERS or confidence < CONFIDENCE_THRESHOLD
+    return {"language": SCRIPT_LANGUAGES[dominant], "confidence": confidence, "ambiguous": ambiguous}
+
+
+class LanguageDetector:
+    """
+    كاشف لغة متدرج مع ذاكرة LRU للنتائج.
+    """
+
+    def __init__(self, model_path=None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.model_path = Path(model_path or DEFAULT_MODEL_PATH)
+        self.cache_size = cache_size
+        self._model = None
+        self._model_failed = False
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+
+    @property
+    def model(self):
+        """نموذج fastText؛ يُحمَّل عند أول استخدام، أو None إذا تعذر تحميله."""
+        if self._model is None and not self._model_failed:
+            with self._lock:
+                if self._model is None and not self._model_failed:
+                    if not fasttext_available:
+                        logging.warning("مكتبة fasttext غير متوفرة؛ سيُكتفى بمدرّج أنظمة الكتابة")
+                        self._model_failed = True
+                    else:
+                        try:
+                            self._model = fasttext.load_model(str(self.model_path))
+                        except Exception as e:
+                            logging.warning(f"تعذر تحميل نموذج كشف اللغة {self.model_path}: {e}")
+                            self._model_failed = True
+        return self._model
+
+    def _predict(self, samples: List[str]) -> List[Optional[tuple]]:
+        """توقع fastText لمجموعة نصوص في استدعاء واحد: (اللغة، الاحتمال) لكل نص."""
+        model = self.model
+        if model is None or not samples:
+            return [None] * len(samples)
+        lines = [sample[:FASTTEXT_SAMPLE_CHARS].replace("\n", " ") for sample in samples]
+        labels, probabilities = model.predict(lines)
+        return [
+            (label[0].replace("__label__", ""), min(float(probability[0]), 1.0))
+            for label, probability in zip(labels, probabilities)
+        ]
+
+    def resolve(self, histogram: np.ndarray, sample: str) -> dict:
+        """
+        اللغة من مدرّج أنظمة كتابة محسوب مسبقاً (كما في التحليل على أجزاء)،
+        مع استشارة fastText على عينة من النص إذا كانت النتيجة غير حاسمة.
+        """
+        result = classify_histogram(histogram)
+        return self._finish(result, self._predict([sample])[0] if result["ambiguous"] else None)
+
+    @staticmethod
+    def _finish(result: dict, prediction: Optional[tuple]) -> dict:
+        ambiguous = result.pop("ambiguous")
+        result["source"] = "script"
+        if ambiguous and prediction is not None:
+            result["language"], result["confidence"] = prediction
+            result["source"] = "fasttext"
+        return result
+
+    def _cache_get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+        return result
+
+    def _cache_put(self, key: bytes, result: dict):
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def detect(self, text: str) -> dict:
+        """
+        كشف لغة نص واحد.
+        :return: قاموس يحتوي على اللغة والثقة ومصدر القرار ("script" أو "fasttext")
+                 ومقاطع النص بكل نظام كتابة.
+        """
+        return self.detect_many([text])[0]
+
+    def detect_many(self, texts: Iterable[str]) -> List[dict]:
+        """
+        كشف لغة مجموعة نصوص: المستوى الأول لكل نص، ثم استدعاء واحد لـ fastText
+        لجميع النصوص غير المحسومة معاً.
+        """
+        texts = list(texts)
+        results = [None] * len(texts)
+        pending = {}
+        for position, text in enumerate(texts):
+            key = self._key(text)
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[position] = dict(cached)
+                continue
+            if key in pending:
+                pending[key][1].append(position)
+                continue
+            result = classify_histogram(script_histogram(text))
+            result["spans"] = script_spans(text)
+            pending[key] = (result, [position])
+
+        ambiguous = [key for key, (result, _) in pending.items() if result["ambiguous"]]
+        first_text = {key: texts[positions[0]] for key, (_, positions) in pending.items()}
+        predictions = dict(zip(ambiguous, self._predict([first_text[key] for key in ambiguous])))
+
+        for key, (result, positions) in pending.items():
+            result = self._finish(result, predictions.get(key))
+            self._cache_put(key, result)
+            for position in positions:
+                results[position] = dict(result)
+        return results
+
+
+_DETECTORS = {}
+
+
+def get_language_detector(model_path=None) -> LanguageDetector:
+    """الكاشف المشترك لكل مسار نموذج (يُنشأ مرة واحدة لكل عملية)."""
+    key = str(model_path or DEFAULT_MODEL_PATH)
+    detector = _DETECTORS.get(key)
+    if detector is None:
+        detector = _DETECTORS[key] = LanguageDetector(key)
+    return detector
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+lexicon.py
+==================
+مطابقة معاجم المشاعر الكبيرة بخوارزمية Aho–Corasick على مستوى الكلمات.
+
+يُبنى المُطابِق مرة واحدة من معجم (ملف أو قائمة) ويُشارك بين جميع نسخ
+TextProcessor. تتم المطابقة في مرور واحد على سلسلة الكلمات، لذا فهي
+تحترم حدود الكلمات ("bad" لا تطابق داخل "badge") وتدعم العبارات متعددة
+الكلمات، مع معالجة أدوات النفي والتوكيد في المرور نفسه.
+"""
+
+import os
+import re
+import logging
+from pathlib import Path
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+POSITIVE = "positive"
+NEGATIVE = "negative"
+NEGATION = "negation"
+INTENSIFIER = "intensifier"
+
+LABELS = (POSITIVE, NEGATIVE, NEGATION, INTENSIFIER)
+
+# عدد الكلمات التي يمتد إليها أثر أداة النفي أو التوكيد
+DEFAULT_WINDOW = 3
+
+# مسار المعجم الافتراضي: data/lexicons/sentiment.tsv في جذر المشروع
+# (يمكن تغييره بمتغير البيئة SENTIMENT_LEXICON)
+DEFAULT_LEXICON_PATH = Path(os.getenv(
+    "SENTIMENT_LEXICON",
+    Path(__file__).resolve().parents[2] / "data" / "lexicons" / "sentiment.tsv"
+))
+
+# المعجم المدمج المستخدم عند غياب ملف المعجم
+BUILTIN_ENTRIES = (
+    [(word, POSITIVE, 1.0) for word in ('good', 'great', 'excellent', 'happy', 'positive', 'جميل', 'سعيد')]
+    + [(word, NEGATIVE, 1.0) for word in ('bad', 'sad', 'poor', 'negative', 'terrible', 'سيء', 'حزين')]
+    + [(word, NEGATION, 1.0) for word in ('not', 'no', 'never', 'لا', 'لم', 'لن', 'ليس', 'غير')]
+    + [(word, INTENSIFIER, 2.0) for word in ('very', 'extremely', 'really', 'جدا', 'للغاية')]
+)
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize_term(term: str) -> Tuple[str, ...]:
+    """تحويل مدخل المعجم إلى سلسلة كلمات بأحرف صغيرة."""
+    return tuple(_WORD_RE.findall(term.lower()))
+
+
+def load_lexicon(path) -> List[Tuple[str, str, float]]:
+    """
+    تحميل معجم من ملف نصي بترميز UTF-8، كل سطر فيه:
+        العبارة <TAB> التصنيف [<TAB> الوزن]
+    التصنيف أحد: positive, negative, negation, intensifier.
+    تُتجاهل الأسطر الفارغة والأسطر التي تبدأ بـ #.
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) < 2 or fields[1] not in LABELS:
+                logging.warning(f"سطر غير صالح في المعجم {path}:{line_number}")
+                continue
+            weight = float(fields[2]) if len(fields) > 2 else 1.0
+            entries.append((fields[0], fields[1], weight))
+    return entries
+
+
+class LexiconMatcher:
+    """
+    آلة Aho–Corasick مبنية على الكلمات: كل انتقال فيها كلمة كاملة.
+    عند كل موضع تُعاد أطول عبارة من المعجم تنتهي عنده.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, float]]):
+        self._goto = [{}]
+        self._fail = [0]
+        # أطول مدخل ينتهي عند كل حالة: (الطول، التصنيف، الوزن) أو None
+        self._best = [None]
+        self.size = 0
+
+        for term, label, weight in entries:
+            tokens = tokenize_term(term)
+            if not tokens:
+                continue
+            state = 0
+            for token in tokens:
+                next_state = self._goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][token] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                state = next_state
+            self._best[state] = (len(tokens), label, weight)
+            self.size += 1
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        """بناء روابط الفشل بالعرض أولاً وتوريث أطول مطابقة لاحقة."""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for token, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                if self._best[child] is None:
+                    self._best[child] = self._best[self._fail[child]]
+                queue.append(child)
+
+    def step(self, state: int, token: str) -> int:
+        """الانتقال من حالة بكلمة واحدة (بأحرف صغيرة)."""
+        goto = self._goto
+        while state and token not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(token, 0)
+
+    def match_at(self, state: int):
+        """أطول مدخل ينتهي عند الحالة الحالية أو None."""
+        return self._best[state]
+
+    def stream(self) -> "MatchStream":
+        """مسح متدفق جديد يبدأ من جذر الآلة."""
+        return MatchStream(self)
+
+
+class MatchStream:
+    """
+    مسح متدفق لسلسلة كلمات مقسمة على أجزاء متتالية: تُحفظ حالة الآلة وموضع
+    الكلمة بين الأجزاء فتُكتشف العبارات الممتدة عبر الحدود.
+    """
+
+    def __init__(self, matcher: LexiconMatcher):
+        self.matcher = matcher
+        self.state = 0
+        # موضع الكلمة التالية في السلسلة كاملة
+        self.index = 0
+
+    def feed(self, tokens: Iterable[str]) -> List[Tuple[int, int, Tuple[int, str, float]]]:
+        """
+        مسح جزء من الكلمات (بحالتها الأصلية).
+        :return: (البداية، النهاية، المدخل) لأطول مدخل ينتهي عند كل كلمة، حيث
+                 البداية والنهاية موضعا أول كلمة وآخرها (شاملاً) والمدخل
+                 (الطول، التصنيف، الوزن). قد تتداخل المطابقات.
+        """
+        matcher = self.matcher
+        goto = matcher._goto
+        fail = matcher._fail
+        best = matcher._best
+        root = goto[0]
+        state = self.state
+        first = self.index
+        index = first - 1
+        matches = []
+        for index, token in enumerate(map(str.lower, tokens), first):
+            if state:
+                while state and token not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(token, 0)
+            else:
+                # المسار السريع: معظم الكلمات ليست بداية لأي مدخل في المعجم
+                state = root.get(token, 0)
+                if not state:
+                    continue
+            match = best[state]
+            if match is not None:
+                matches.append((index - match[0] + 1, index, match))
+        self.state = state
+        self.index = index + 1
+        return matches
+
+
+class SentimentScanner:
+    """
+    حالة مسح المشاعر عبر أجزاء متتالية من النص: تُحفظ حالة الآلة وأثر
+    أدوات النفي والتوكيد بين الأجزاء حتى لا تضيع العبارات على الحدود.
+    """
+
+    def __init__(self, matcher: LexiconMatcher, window: int = DEFAULT_WINDOW):
+        self.matcher = matcher
+        self.window = window
+        self.positive = 0
+        self.negative = 0
+        self.score = 0.0
+        self._stream = matcher.stream()
+        # مطابقة معلّقة لم تُحسب بعد: قد تحل محلها عبارة أطول تبدأ قبلها
+        self._pending = None
+        self._negate_until = -1
+        self._boost = 1.0
+        self._boost_until = -1
+        self._last_polar_index = None
+        self._last_polar_value = 0.0
+
+    def feed(self, tokens: Iterable[str]) -> "SentimentScanner":
+        """مسح سلسلة كلمات (بحالتها الأصلية) وتحديث العدادات."""
+        for start, end, match in self._stream.feed(tokens):
+            self._offer(start, end, match)
+        return self
+
+    def _offer(self, start: int, end: int, match):
+        """
+        اختيار المطابقات غير المتداخلة بقاعدة "الأبعد يساراً ثم الأطول".
+        """
+        pending = self._pending
+        if pending is not None and start <= pending[1]:
+            if start <= pending[0]:
+                # العبارة الجديدة تحتوي المعلّقة وتمتد بعدها
+                self._pending = (start, end, match)
+            return
+        if pending is not None:
+            self._apply(*pending)
+        self._pending = (start, end, match)
+
+    def flush(self) -> "SentimentScanner":
+        """احتساب المطابقة المعلّقة عند نهاية النص."""
+        if self._pending is not None:
+            self._apply(*self._pending)
+            self._pending = None
+        return self
+
+    def _apply(self, start: int, index: int, match):
+        _, label, weight = match
+
+        if label == NEGATION:
+            self._negate_until = index + self.window
+            return
+        if label == INTENSIFIER:
+            if self._last_polar_index == start - 1:
+                # توكيد لاحق للكلمة كما في "جميل جدا"
+                self.score += self._last_polar_value * (weight - 1)
+                self._last_polar_index = None
+            else:
+                self._boost = weight
+                self._boost_until = index + self.window
+            return
+
+        polarity = 1 if label == POSITIVE else -1
+        if start <= self._negate_until:
+            polarity = -polarity
+            self._negate_until = -1
+        value = polarity * weight
+        if start <= self._boost_until:
+            value *= self._boost
+            self._boost_until = -1
+
+        if polarity > 0:
+            self.positive += 1
+        else:
+            self.negative += 1
+        self.score += value
+        self._last_polar_index = index
+        self._last_polar_value = value
+
+    def merge(self, other: "SentimentScanner") -> "SentimentScanner":
+        """دمج عدادات مسح مستقل لجزء لاحق (دون أثر النفي عبر الحد بين الجزأين)."""
+        self.flush()
+        other.flush()
+        self.positive += other.positive
+        self.negative += other.negative
+        self.score += other.score
+        return self
+
+
+@lru_cache(maxsize=None)
+def _cached_matcher(path: Optional[str]) -> LexiconMatcher:
+    if path is None:
+        if DEFAULT_LEXICON_PATH.exists():
+            path = str(DEFAULT_LEXICON_PATH)
+        else:
+            if os.getenv("SENTIMENT_LEXICON"):
+                logging.warning(f"ملف المعجم {DEFAULT_LEXICON_PATH} غير موجود: استخدام المعجم المدمج")
+            return LexiconMatcher(BUILTIN_ENTRIES)
+    entries = load_lexicon(path)
+    logging.info(f"تم تحميل معجم المشاعر ({len(entries)} مدخل) من {path}")
+    return LexiconMatcher(entries)
+
+
+def get_sentiment_matcher(path=None) -> LexiconMatcher:
+    """
+    المُطابِق المشترك لمعجم المشاعر؛ يُبنى مرة واحدة لكل مسار في العملية.
+    دون مسار يُستخدم المعجم الافتراضي، أو المعجم المدمج عند غياب ملفه.
+    :raises FileNotFoundError: إذا كان المسار المعطى غير موجود.
+    """
+    return _cached_matcher(str(path) if path else None)
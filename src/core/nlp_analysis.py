@@ -8,6 +8,7 @@ nlp_analysis.py
 
 import camel_tools.utils.charmap as charmap
 import camel_tools.morphology.analyzer as analyzer
+from core.numerology import get_abjad_engine
 
 class NLPAnalysis:
     """
@@ -18,8 +19,7 @@ class NLPAnalysis:
 
     def calculate_gematria(self, text: str, method="big") -> int:
         """حساب الجُمَّل الكبير والصغير"""
-        gematria_map = {"big": {chr(i): i for i in range(1600, 1610)}, "small": {chr(i): i for i in range(1, 10)}}
-        return sum(gematria_map[method].get(char, 0) for char in text)
+        return get_abjad_engine(method).value(text)
 
 # اختبار عملي
 if __name__ == "__main__":
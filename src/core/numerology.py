@@ -1,23 +1,164 @@
+"""
+numerology.py
+==================
+محرك حساب الجُمَّل (الكبير والصغير) المشترك بين جميع وحدات المشروع.
+
+تُحوَّل الأحرف إلى قيمها عبر جدول بحث NumPy مفهرس بنقطة الترميز، فيُحسب
+مجموع نص كامل أو قيم كل كلمة أو كل آية في مجموعة نصوص باستدعاء واحد
+دون حلقات Python على مستوى الحرف.
+"""
+
+import unicodedata
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BIG = "big"      # الجُمَّل الكبير
+SMALL = "small"  # الجُمَّل الصغير: باقي قسمة قيمة الحرف على 12 (والصفر يُعد 12)
+
+# قيم الحروف وفق الجُمَّل الكبير (ترتيب أبجد هوز).
+# الهمزة وصورها تُحسب كالألف أو كحرف الكرسي، والتاء المربوطة كالهاء،
+# والألف المقصورة كالياء.
+JUMMAL_VALUES = {
+    'ا': 1, 'أ': 1, 'إ': 1, 'آ': 1, 'ٱ': 1, 'ء': 1, 'ب': 2, 'ج': 3,
+    'د': 4, 'ه': 5, 'ة': 5, 'و': 6, 'ؤ': 6, 'ز': 7, 'ح': 8, 'ط': 9,
+    'ي': 10, 'ى': 10, 'ئ': 10, 'ك': 20, 'ل': 30, 'م': 40, 'ن': 50,
+    'س': 60, 'ع': 70, 'ف': 80, 'ص': 90, 'ق': 100, 'ر': 200, 'ش': 300,
+    'ت': 400, 'ث': 500, 'خ': 600, 'ذ': 700, 'ض': 800, 'ظ': 900, 'غ': 1000
+}
+
+SMALL_MODULUS = 12
+
+# جداول البحث تغطي المستوى متعدد اللغات الأساسي (BMP)؛ ما بعده يُقص إلى آخر خانة
+_LUT_SIZE = 0x10000
+
+
+def _build_tables():
+    values = {
+        BIG: np.zeros(_LUT_SIZE, dtype=np.int64),
+        SMALL: np.zeros(_LUT_SIZE, dtype=np.int64),
+    }
+    for letter, value in JUMMAL_VALUES.items():
+        values[BIG][ord(letter)] = value
+        values[SMALL][ord(letter)] = value % SMALL_MODULUS or SMALL_MODULUS
+
+    # الأحرف العربية الأساسية (U+0621..U+064A) كما تُعد في التحليل العددي
+    arabic_letters = np.zeros(_LUT_SIZE, dtype=np.int64)
+    arabic_letters[0x0621:0x064B] = 1
+
+    # أحرف الكلمة: الحروف والأرقام والشرطة السفلية، والحركات داخل الكلمة
+    word_chars = np.zeros(_LUT_SIZE, dtype=bool)
+    for code in range(_LUT_SIZE - 1):
+        char = chr(code)
+        if char.isalnum() or char == '_' or unicodedata.category(char) == 'Mn':
+            word_chars[code] = True
+    # الخانة الأخيرة تمثل كل ما بعد BMP (أحرف نادرة تُعامل كجزء من الكلمة)
+    word_chars[_LUT_SIZE - 1] = True
+    return values, arabic_letters, word_chars
+
+
+_VALUE_TABLES, _ARABIC_LETTER_TABLE, _WORD_CHAR_TABLE = _build_tables()
+
+
+def codepoints(text: str) -> np.ndarray:
+    """نقاط الترميز كمصفوفة؛ فهارسها تطابق فهارس النص في Python."""
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+class AbjadEngine:
+    """
+    محرك الجُمَّل المتجه لنظام واحد (الكبير أو الصغير).
+    """
+
+    def __init__(self, system: str = BIG):
+        if system not in _VALUE_TABLES:
+            raise ValueError(f"نظام جُمَّل غير معروف: {system}")
+        self.system = system
+        self._table = _VALUE_TABLES[system]
+
+    def char_values(self, text: str) -> np.ndarray:
+        """قيمة كل حرف في النص (صفر لغير الحروف العربية)."""
+        return self._table.take(codepoints(text), mode='clip')
+
+    def value(self, text: str) -> int:
+        """مجموع قيم حروف النص."""
+        return int(self.char_values(text).sum())
+
+    def verse_values(self, verses: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        قيمة كل نص (آية، سطر، كلمة...) وعدد أحرفه العربية في استدعاء واحد.
+        :param verses: مجموعة النصوص.
+        :return: (مصفوفة القيم، مصفوفة عدد الأحرف العربية) بنفس ترتيب النصوص.
+        """
+        if not verses:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty.copy()
+        points = codepoints(''.join(verses))
+        lengths = np.fromiter(map(len, verses), dtype=np.int64, count=len(verses))
+        ends = np.cumsum(lengths)
+        return (
+            _segment_sums(self._table.take(points, mode='clip'), ends),
+            _segment_sums(_ARABIC_LETTER_TABLE.take(points, mode='clip'), ends),
+        )
+
+    def word_values(self, text: str, return_words: bool = True) -> Tuple[Optional[List[str]], np.ndarray, np.ndarray]:
+        """
+        تقسيم النص إلى كلمات وحساب قيمة كل كلمة.
+        :param text: النص (يمكن أن يكون مدونة كاملة).
+        :param return_words: إرجاع نصوص الكلمات نفسها (يتطلب نسخها من النص).
+        :return: (الكلمات أو None، قيم الكلمات، مواضع بداية الكلمات في النص).
+        """
+        points = codepoints(text)
+        is_word = _WORD_CHAR_TABLE.take(points, mode='clip')
+        previous = np.concatenate(([False], is_word[:-1]))
+        following = np.concatenate((is_word[1:], [False]))
+        starts = np.flatnonzero(is_word & ~previous)
+        ends = np.flatnonzero(is_word & ~following) + 1
+
+        if len(starts):
+            # الفواصل قيمتها صفر، لذا يكفي الجمع من بداية كل كلمة حتى بداية التالية
+            values = np.add.reduceat(self._table.take(points, mode='clip'), starts)
+        else:
+            values = np.zeros(0, dtype=np.int64)
+
+        words = None
+        if return_words:
+            words = [text[start:end] for start, end in zip(starts.tolist(), ends.tolist())]
+        return words, values, starts
+
+
+def _segment_sums(values: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """مجموع القيم في كل مقطع متجاور ينتهي عند الموضع المقابل في ends."""
+    cumulative = np.concatenate(([0], np.cumsum(values)))
+    totals = cumulative[ends]
+    totals[1:] -= cumulative[ends[:-1]]
+    return totals
+
+
+_ENGINES = {}
+
+
+def get_abjad_engine(system: str = BIG) -> AbjadEngine:
+    """المحرك المشترك لكل نظام (يُنشأ مرة واحدة لكل عملية)."""
+    engine = _ENGINES.get(system)
+    if engine is None:
+        engine = _ENGINES[system] = AbjadEngine(system)
+    return engine
+
+
 class NumerologyCalculator:
     def __init__(self):
-        self.jummal_values = {
-            'أ': 1, 'ب': 2, 'ج': 3, 'د': 4, 'ه': 5, 'و': 6, 'ز': 7, 
-            'ح': 8, 'ط': 9, 'ي': 10, 'ك': 20, 'ل': 30, 'م': 40, 'ن': 50,
-            'س': 60, 'ع': 70, 'ف': 80, 'ص': 90, 'ق': 100, 'ر': 200, 
-            'ش': 300, 'ت': 400, 'ث': 500, 'خ': 600, 'ذ': 700, 'ض': 800,
-            'ظ': 900, 'غ': 1000
-        }
-    
+        self.jummal_values = JUMMAL_VALUES
+        self.engine = get_abjad_engine(BIG)
+
     def calculate_jummal(self, text: str) -> int:
-        """حساب قيمة الجُمَّل الكبير للنص العربي"""
-        total = 0
-        cleaned_text = self._clean_arabic_text(text)
-        
-        for char in cleaned_text:
-            total += self.jummal_values.get(char, 0)
-        
-        return total
-    
+        """حساب قيمة الجُمَّل الكبير للنص العربي"""
+        return self.engine.value(text)
+
+    def calculate_small_jummal(self, text: str) -> int:
+        """حساب قيمة الجُمَّل الصغير للنص العربي"""
+        return get_abjad_engine(SMALL).value(text)
+
     def _clean_arabic_text(self, text: str) -> str:
-        """تنظيف النص من التشكيل والأحغير العربية"""
-        return ''.join([c for c in text if c in self.jummal_values])
\ No newline at end of file
+        """تنظيف النص من التشكيل والأحرف غير العربية"""
+        return ''.join([c for c in text if c in self.jummal_values])
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+ocr.py
+==================
+خدمة التعرف الضوئي على الحروف (OCR) للصور وصفحات PDF الممسوحة.
+
+- مجمّع خيوط محدود: tesseract يعمل في عملية مستقلة (pytesseract) أو يحرر قفل
+  المفسر (tesserocr)، فتتوازى الصور دون عمليات Python إضافية. مع tesserocr
+  يبقى لكل خيط محرك محمّل بنماذج اللغات بدلاً من تشغيل tesseract لكل صورة.
+- معالجة مسبقة: تدرج رمادي، وتصغير المسوح الضخمة إلى max_side، وتصحيح الميل
+  (بملف الإسقاط على نسخة مصغرة)، وتحويل ثنائي بعتبة Otsu.
+- الصور الطويلة جداً تُقسم إلى شرائح أفقية تُقطع عند أقل الأسطر حبراً وتُقرأ
+  بالتوازي.
+- ذاكرة نتائج بمفتاح (بصمة محتوى الصورة، بصمة الإعدادات) في الذاكرة، ويمكن
+  حفظها مشفرة في مخزن نتائج التحليل (DatabaseManager.save_analysis).
+"""
+
+import io
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.batch import resolve_workers
+
+# محاولة استيراد Pillow و pytesseract (اختياري)
+try:
+    import pytesseract
+    from PIL import Image
+    ocr_available = True
+except ImportError:
+    ocr_available = False
+
+# محاولة استيراد tesserocr: محرك دائم لكل خيط دون تشغيل عملية لكل صورة (اختياري)
+try:
+    import tesserocr
+    tesserocr_available = True
+except ImportError:
+    tesserocr_available = False
+
+# محاولة استيراد PyMuPDF لتحويل صفحات PDF إلى صور (اختياري)
+try:
+    import fitz
+    fitz_available = True
+except ImportError:
+    fitz_available = False
+
+OCR_ANALYZER = "ocr"
+OCR_VERSION = "1"
+OCR_LANGUAGES = "ara+eng"
+
+# وضع تقسيم الصفحة في tesseract (3: تلقائي كامل)
+DEFAULT_PSM = 3
+# أطول ضلع بعد التصغير: المسوح الأكبر تبطئ tesseract دون تحسين القراءة
+DEFAULT_MAX_SIDE = 4000
+# ارتفاع الشريحة عند تقسيم الصور الطويلة
+DEFAULT_TILE_HEIGHT = 3000
+# دقة تحويل صفحات PDF إلى صور
+DEFAULT_DPI = 300
+# عدد النتائج المحفوظة في الذاكرة
+OCR_CACHE_SIZE = 1024
+# عدد خيوط الخدمة المشتركة (None: عدد الأنوية)؛ عمليات المعالجة الدفعية تضبطه على 1
+# لأن الملفات نفسها موزعة على الأنوية
+DEFAULT_OCR_WORKERS: Optional[int] = None
+
+# أقصى ميل يُصحح بالدرجات ودقة البحث عنه، وحجم النسخة المصغرة لتقديره
+MAX_SKEW_ANGLE = 5.0
+SKEW_STEP = 0.25
+_SKEW_THUMBNAIL = 800
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+ImageSource = Union[str, Path, bytes, "Image.Image"]
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """عتبة Otsu لصورة رمادية uint8: البكسلات <= العتبة حبر."""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    background = np.cumsum(histogram)
+    foreground = background[-1] - background
+    mass = np.cumsum(histogram * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_background = mass / background
+        mean_foreground = (mass[-1] - mass) / foreground
+        between = background * foreground * (mean_background - mean_foreground) ** 2
+    between[(background == 0) | (foreground == 0)] = -1
+    return int(np.argmax(between))
+
+
+def estimate_skew(ink: np.ndarray, max_angle: float = MAX_SKEW_ANGLE, step: float = SKEW_STEP) -> float:
+    """
+    زاوية ميل الأسطر بالدرجات (موجبة إذا انحدرت الأسطر نحو اليمين) بملف الإسقاط:
+    الزاوية التي تجعل مجاميع صفوف الحبر بعد إزاحتها أشد تبايناً. الدوران الصغير
+    يُقرَّب بإزاحة كل عمود رأسياً، فلا تُدوَّر الصورة لكل زاوية مرشحة.
+    """
+    rows, columns = np.nonzero(ink)
+    if rows.size == 0:
+        return 0.0
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        shifted = rows - np.round(columns * np.tan(np.radians(angle))).astype(np.int64)
+        profile = np.bincount(shifted - shifted.min()).astype(np.float64)
+        score = float(np.dot(profile, profile))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def tile_ranges(ink: np.ndarray, tile_height: int = DEFAULT_TILE_HEIGHT) -> List[Tuple[int, int]]:
+    """
+    نطاقات صفوف [start, stop) لشرائح لا يتجاوز ارتفاعها tile_height، يُقطع كل منها
+    عند أقل الصفوف حبراً في ربعها الأخير حتى لا يُشطر سطر نصي.
+    """
+    height = ink.shape[0]
+    row_ink = ink.sum(axis=1)
+    margin = max(1, tile_height // 4)
+    cuts = [0]
+    while height - cuts[-1] > tile_height:
+        window_start = cuts[-1] + tile_height - margin
+        cuts.append(window_start + int(np.argmin(row_ink[window_start:cuts[-1] + tile_height])))
+    cuts.append(height)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _require_ocr():
+    if not ocr_available:
+        raise RuntimeError("مكتبتا pytesseract و Pillow غير متوفرتين")
+
+
+class OCRService:
+    """
+    التعرف على نصوص الصور ونسخ صفحات PDF عبر مجمّع خيوط محدود وذاكرة نتائج.
+    """
+
+    def __init__(self, workers: Optional[int] = None, languages: str = OCR_LANGUAGES,
+                 psm: int = DEFAULT_PSM, preprocess: bool = True, deskew: bool = True,
+                 binarize: bool = True, max_side: int = DEFAULT_MAX_SIDE,
+                 tile_height: int = DEFAULT_TILE_HEIGHT, cache_size: int = OCR_CACHE_SIZE,
+                 store=None):
+        """
+        :param workers: عدد عمليات tesseract المتزامنة؛ الافتراضي عدد الأنوية.
+        :param preprocess: تطبيق المعالجة المسبقة (التصغير وتصحيح الميل والتحويل الثنائي).
+        :param tile_height: الصور الأطول منه تُقسم إلى شرائح (0 يعطّل التقسيم).
+        :param cache_size: عدد النتائج في الذاكرة (0 يعطّلها).
+        :param store: DatabaseManager اختياري لحفظ النتائج بين التشغيلات.
+        """
+        self.workers = resolve_workers(workers, os.cpu_count() or 1)
+        self.languages = languages
+        self.psm = psm
+        self.preprocess = preprocess
+        self.deskew = deskew
+        self.binarize = binarize
+        self.max_side = max_side
+        self.tile_height = tile_height
+        self.cache_size = cache_size
+        self.store = store
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = None
+        self._pid = os.getpid()
+        self.version = self._config_version()
+        if self.workers > 1:
+            # خيوط OpenMP داخل كل عملية tesseract تتزاحم مع التوازي بين الصور
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    def _config_version(self) -> str:
+        """بصمة الإعدادات المؤثرة في النص الناتج (جزء من مفتاح الذاكرة)."""
+        config = {
+            "languages": self.languages,
+            "psm": self.psm,
+            "preprocess": self.preprocess and {
+                "deskew": self.deskew, "binarize": self.binarize, "max_side": self.max_side,
+            },
+            "tile_height": self.tile_height,
+            "engine": "tesserocr" if tesserocr_available else "pytesseract",
+        }
+        digest = hashlib.blake2b(json.dumps(config, sort_keys=True).encode("utf-8"), digest_size=8)
+        return f"{OCR_VERSION}-{digest.hexdigest()}"
+
+    def _check_process(self):
+        """
+        بعد النسخ (fork) لا توجد خيوط المجمّع الموروث في العملية الابنة فيعلق أي
+        submit عليه، وقد يكون القفل ممسوكاً لحظة النسخ: تُستبدل جميعها.
+        """
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._local = threading.local()
+            self._executor = None
+            self._pid = os.getpid()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        self._check_process()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ocr")
+            return self._executor
+
+    def close(self):
+        self._check_process()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    # --- الذاكرة ---
+
+    def _cached(self, content_hash: str) -> Optional[str]:
+        self._check_process()
+        with self._lock:
+            text = self._cache.get(content_hash)
+            if text is not None:
+                self._cache.move_to_end(content_hash)
+                self.hits += 1
+                return text
+        if self.store is not None:
+            stored = self.store.load_analysis(content_hash, OCR_ANALYZER, self.version)
+            if stored is not None:
+                self._remember(content_hash, stored["text"])
+                with self._lock:
+                    self.hits += 1
+                return stored["text"]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _remember(self, content_hash: str, text: str, persist: bool = False):
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[content_hash] = text
+                self._cache.move_to_end(content_hash)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        if persist and self.store is not None:
+            self.store.save_analysis(content_hash, OCR_ANALYZER, self.version, {"text": text})
+
+    def stats(self) -> Dict:
+        self._check_process()
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    # --- تحميل الصور ومعالجتها ---
+
+    @staticmethod
+    def _load(source: ImageSource) -> Tuple[str, "Image.Image"]:
+        """(بصمة المحتوى، الصورة) لمسار أو بايتات ملف صورة أو صورة PIL."""
+        _require_ocr()
+        if isinstance(source, Image.Image):
+            digest = hashlib.sha256(f"{source.mode}:{source.size}".encode("ascii"))
+            digest.update(source.tobytes())
+            return digest.hexdigest(), source
+        if isinstance(source, (bytes, bytearray)):
+            return hashlib.sha256(source).hexdigest(), Image.open(io.BytesIO(source))
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest(), Image.open(source)
+
+    def _prepare(self, image: "Image.Image") -> List["Image.Image"]:
+        """المعالجة المسبقة ثم التقسيم إلى شرائح."""
+        if self.preprocess:
+            if image.format == "JPEG":
+                # فك ترميز JPEG بدقة مخفضة مباشرة بدلاً من فكه كاملاً ثم تصغيره
+                image.draft("L", (self.max_side, self.max_side))
+            image = image.convert("L")
+            if max(image.size) > self.max_side:
+                image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            if self.deskew:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((_SKEW_THUMBNAIL, _SKEW_THUMBNAIL))
+                gray = np.asarray(thumbnail)
+                angle = estimate_skew(gray <= otsu_threshold(gray))
+                if angle:
+                    image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+            if self.binarize:
+                gray = np.asarray(image)
+                image = Image.fromarray(np.where(gray > otsu_threshold(gray), 255, 0).astype(np.uint8))
+        if not self.tile_height or image.height <= self.tile_height:
+            return [image]
+        gray = np.asarray(image.convert("L"))
+        ink = gray <= otsu_threshold(gray)
+        return [image.crop((0, start, image.width, stop)) for start, stop in tile_ranges(ink, self.tile_height)]
+
+    def _tesseract(self, image: "Image.Image") -> str:
+        if tesserocr_available:
+            api = getattr(self._local, "api", None)
+            if api is None:
+                api = self._local.api = tesserocr.PyTessBaseAPI(lang=self.languages, psm=self.psm)
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        return pytesseract.image_to_string(image, lang=self.languages, config=f"--psm {self.psm}")
+
+    def _recognize_image(self, content_hash: str, image: "Image.Image", parallel: bool) -> str:
+        tiles = self._prepare(image)
+        if parallel and len(tiles) > 1:
+            texts = list(self._pool().map(self._tesseract, tiles))
+        else:
+            texts = [self._tesseract(tile) for tile in tiles]
+        text = "\n".join(text.strip("\n") for text in texts)
+        self._remember(content_hash, text, persist=True)
+        return text
+
+    # --- الواجهة ---
+
+    def recognize(self, source: ImageSource) -> str:
+        """نص صورة واحدة (شرائح الصور الطويلة تُقرأ بالتوازي)."""
+        content_hash, image = self._load(source)
+        text = self._cached(content_hash)
+        if text is None:
+            text = self._recognize_image(content_hash, image, parallel=True)
+        return text
+
+    def _recognize_item(self, source: ImageSource) -> Dict:
+        started = time.perf_counter()
+        try:
+            content_hash, image = self._load(source)
+            text = self._cached(content_hash)
+            cached = text is not None
+            if not cached:
+                text = self._recognize_image(content_hash, image, parallel=False)
+            return {"text": text, "cached": cached, "seconds": time.perf_counter() - started, "error": None}
+        except Exception as e:
+            logging.error(f"فشل التعرف الضوئي: {e}")
+            return {"text": "", "cached": False, "seconds": time.perf_counter() - started,
+                    "error": f"{type(e).__name__}: {e}"}
+
+    def recognize_batch(self, sources: Iterable[ImageSource]) -> List[Dict]:
+        """
+        نصوص عدة صور بالتوازي على المجمّع، بترتيب المدخلات.
+        :return: لكل صورة {"text", "cached", "seconds", "error"}؛ فشل صورة لا يوقف الباقي.
+        """
+        return list(self._pool().map(self._recognize_item, list(sources)))
+
+    def _render_page(self, path: str, number: int, dpi: int) -> "Image.Image":
+        # نسخة مستقلة من المستند لكل صفحة: كائنات fitz لا تُشارك بين الخيوط
+        with fitz.open(path) as doc:
+            pixmap = doc[number].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            return Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+
+    def _recognize_page(self, path: str, number: int, dpi: int) -> Dict:
+        started = time.perf_counter()
+        try:
+            image = self._render_page(path, number, dpi)
+        except Exception as e:
+            logging.error(f"تعذر تحويل الصفحة {number} إلى صورة: {e}")
+            return {"page": number, "text": "", "cached": False,
+                    "seconds": time.perf_counter() - started, "error": f"{type(e).__name__}: {e}"}
+        result = self._recognize_item(image)
+        result["seconds"] = time.perf_counter() - started
+        return {"page": number, **result}
+
+    def recognize_pdf_pages(self, path: str, pages: Optional[Sequence[int]] = None,
+                            dpi: int = DEFAULT_DPI) -> List[Dict]:
+        """
+        تحويل صفحات PDF (أرقامها من 0، الافتراضي جميعها) إلى صور بدقة dpi والتعرف
+        عليها بالتوازي. الذاكرة بمفتاح بكسلات الصفحة، فالصفحة المطابقة في ملف آخر تُصيبها.
+        :return: لكل صفحة بالترتيب {"page", "text", "cached", "seconds", "error"}.
+        """
+        _require_ocr()
+        if not fitz_available:
+            raise RuntimeError("مكتبة PyMuPDF غير متوفرة")
+        if pages is None:
+            with fitz.open(path) as doc:
+                pages = range(doc.page_count)
+        pages = list(pages)
+        return list(self._pool().map(lambda number: self._recognize_page(path, number, dpi), pages))
+
+
+_SERVICE = None
+_SERVICE_PID = None
+_SERVICE_LOCK = threading.Lock()
+
+
+def get_ocr_service() -> OCRService:
+    """
+    الخدمة المشتركة بالإعدادات الافتراضية (تُنشأ مرة واحدة لكل عملية؛ العملية
+    الابنة بالنسخ تنشئ خدمتها بـ DEFAULT_OCR_WORKERS الخاص بها).
+    """
+    global _SERVICE, _SERVICE_PID
+    if _SERVICE is None or _SERVICE_PID != os.getpid():
+        with _SERVICE_LOCK:
+            if _SERVICE is None or _SERVICE_PID != os.getpid():
+                _SERVICE = OCRService(workers=DEFAULT_OCR_WORKERS)
+                _SERVICE_PID = os.getpid()
+    return _SERVICE
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+search_index.py
+==================
+فهرس بحث نصي كامل يحافظ على سرية المحتوى المشفّر.
+
+تُطبَّع الكلمات (إزالة التشكيل والتطويل وتوحيد الهمزات والألف المقصورة والتاء
+المربوطة) وتُجذَّع تجذيعاً خفيفاً (light stemming) ثم تُستبدل ببصمات مُفتاحية،
+فلا يحوي جدول FTS5 إلا رموزاً ست عشرية لا تكشف الكلمات دون المفتاح السري.
+تُخزن البصمات بترتيب ظهورها فتعمل استعلامات العبارات، وتُفهرس بصمات بدايات
+الكلمات (حتى PREFIX_LENGTHS) في عمود مستقل لاستعلامات البادئة.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from core.term_hashing import TermHasher
+
+# أطوال بدايات الكلمات المفهرسة لاستعلامات مثل "كتا*"
+PREFIX_LENGTHS = (2, 3, 4)
+
+# أقصى عدد كلمات مختلفة تُحفظ رموزها بين المستندات
+WORD_CACHE_SIZE = 200000
+
+_WORD_RE = re.compile(r'\w+')
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+_NORMALIZATION = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    **{chr(code): None for code in range(0x064B, 0x0653)},  # الحركات
+    '\u0670': None,  # الألف الخنجرية
+    '\u0640': None,  # التطويل
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+})
+
+# سوابق ولواحق التجذيع الخفيف (على غرار Light10) بعد التطبيع
+_ARTICLE_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+_SUFFIXES = ('ها', 'ان', 'ات', 'ون', 'ين', 'يه', 'ه', 'ي')
+_ARABIC_LETTER_RE = re.compile(r'[ء-ي]')
+
+
+def normalize(text: str) -> str:
+    """تطبيع النص للبحث: حروف صغيرة، دون تشكيل، بهمزات وأرقام موحدة."""
+    return text.translate(_NORMALIZATION).lower()
+
+
+def strip_prefixes(word: str) -> str:
+    """إزالة واو العطف وأداة التعريف وما يلحقها من حروف الجر."""
+    if len(word) > 3 and word[0] == 'و':
+        word = word[1:]
+    for prefix in _ARTICLE_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) > 1:
+            return word[len(prefix):]
+    return word
+
+
+def light_stem(word: str) -> str:
+    """تجذيع خفيف لكلمة مطبّعة؛ الكلمات غير العربية تبقى كما هي."""
+    if not _ARABIC_LETTER_RE.match(word):
+        return word
+    word = strip_prefixes(word)
+    for suffix in _SUFFIXES:
+        if len(word) - len(suffix) > 1 and word.endswith(suffix):
+            word = word[:-len(suffix)]
+    return word
+
+
+class SearchTokenizer:
+    """
+    تحويل النصوص والاستعلامات إلى رموز بصمات لفهرس FTS5.
+    """
+
+    def __init__(self, secret: Union[str, bytes], prefix_lengths: Tuple[int, ...] = PREFIX_LENGTHS):
+        self._terms = TermHasher(secret, b"search-terms")
+        self._prefixes = TermHasher(secret, b"search-prefixes")
+        self.prefix_lengths = tuple(sorted(prefix_lengths))
+        # رموز الكلمات المتكررة عبر المستندات: الكلمة -> (بصمة الجذع، بصمات البدايات)
+        self._word_cache: Dict[str, Tuple[str, List[str]]] = {}
+
+    @staticmethod
+    def _token(hasher: TermHasher, term: str) -> str:
+        return format(hasher.digest(term) & 0xFFFFFFFFFFFFFFFF, '016x')
+
+    def _word_tokens(self, word: str) -> Tuple[str, List[str]]:
+        tokens = self._word_cache.get(word)
+        if tokens is None:
+            base = strip_prefixes(word)
+            tokens = (
+                self._token(self._terms, light_stem(word)),
+                [
+                    self._token(self._prefixes, base[:length])
+                    for length in self.prefix_lengths if len(base) >= length
+                ]
+            )
+            if len(self._word_cache) >= WORD_CACHE_SIZE:
+                self._word_cache.clear()
+            self._word_cache[word] = tokens
+        return tokens
+
+    def document_tokens(self, text: str) -> Tuple[str, str]:
+        """
+        رموز نص للفهرسة.
+        :return: (بصمات الكلمات بالترتيب، بصمات بدايات الكلمات) كنصين مفصولين بمسافات.
+        """
+        # بدايات الكلمات لا تحتاج إلى ترتيب أو تكرار: تُحفظ مرة واحدة لكل مستند
+        prefixes: Dict[str, None] = {}
+        terms = []
+        seen = set()
+        for word in _WORD_RE.findall(normalize(text)):
+            stem, word_prefixes = self._word_tokens(word)
+            terms.append(stem)
+            if word not in seen:
+                seen.add(word)
+                prefixes.update(dict.fromkeys(word_prefixes))
+        return ' '.join(terms), ' '.join(prefixes)
+
+    def query(self, query: str) -> Optional[str]:
+        """
+        تحويل استعلام المستخدم إلى تعبير MATCH لـ FTS5 (جميع الأجزاء مطلوبة):
+          - كلمة: تطابق جميع صيغها ذات الجذع الخفيف نفسه.
+          - "عبارة بين علامتي تنصيص": كلمات متتالية بالترتيب.
+          - بادئة*: كلمات تبدأ بها (تُقص البادئات الأطول من أطول طول مفهرس).
+        :return: التعبير أو None إذا لم يحوِ الاستعلام كلمات.
+        """
+        clauses = []
+        for phrase, word in _QUERY_RE.findall(query):
+            if word.endswith('*') and _WORD_RE.fullmatch(word[:-1]):
+                base = strip_prefixes(normalize(word[:-1]))
+                if len(base) < self.prefix_lengths[0]:
+                    continue
+                prefix = base[:self.prefix_lengths[-1]]
+                clauses.append(f'prefixes : "{self._token(self._prefixes, prefix)}"')
+                continue
+            words = _WORD_RE.findall(normalize(phrase or word))
+            if words:
+                stems = ' '.join(self._token(self._terms, light_stem(w)) for w in words)
+                clauses.append(f'{{title terms}} : "{stems}"')
+        return ' AND '.join(clauses) or None
+
+    def index_rows(self, documents: Iterable[Tuple[int, str, str]]):
+        """صفوف (rowid, title, terms, prefixes) لمستندات (المعرّف، العنوان، المحتوى)."""
+        for doc_id, title, content in documents:
+            title_terms, title_prefixes = self.document_tokens(title)
+            terms, prefixes = self.document_tokens(content)
+            yield doc_id, title_terms, terms, ' '.join(filter(None, (title_prefixes, prefixes)))
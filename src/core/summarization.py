@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+summarization.py
+==================
+تلخيص استخراجي قابل للتوسع للمستندات الطويلة.
+
+تُمثَّل الجمل بمتجهات TF-IDF متناثرة (scipy.sparse)، وتُحسب مركزية كل جملة
+بالتكرار الأسّي (power iteration) على رسم تشابه لا يحتفظ إلا بأقرب الجيران
+لكل جملة. لا تتجاوز النافذة الواحدة max_sentences جملة، فتبقى الكلفة محدودة؛
+وتُلخَّص النصوص الأطول هرمياً: تلخيص كل نافذة ثم تلخيص ملخصات النوافذ.
+"""
+
+import re
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from core.text_processing import STOPWORDS
+
+# حدود الجمل: علامة نهاية جملة يليها فراغ، أو سطر فارغ بين فقرتين
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?؟])\s+|\n\s*\n')
+_WORD_RE = re.compile(r'\w+')
+
+MAX_WINDOW_SENTENCES = 200
+MAX_NEIGHBOURS = 10
+DAMPING = 0.85
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+
+# أقصى طول لجملة غير مكتملة في وضع التدفق قبل إخراجها كما هي
+MAX_PENDING_CHARS = 64 * 1024
+
+
+def split_sentences(text: str) -> List[str]:
+    """تقسيم النص إلى جمل غير فارغة."""
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT_RE.split(text) if sentence.strip()]
+
+
+class SentenceSplitter:
+    """
+    تقسيم تدريجي لنص يصل على أجزاء: يُرجع الجمل المكتملة ويحتفظ ببقية الجزء.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        parts = _SENTENCE_SPLIT_RE.split(self._pending + chunk)
+        self._pending = parts.pop()
+        if len(self._pending) > MAX_PENDING_CHARS:
+            parts.append(self._pending)
+            self._pending = ""
+        return [part.strip() for part in parts if part.strip()]
+
+    def flush(self) -> List[str]:
+        pending, self._pending = self._pending.strip(), ""
+        return [pending] if pending else []
+
+
+def _spread_order(count: int) -> List[int]:
+    """
+    ترتيب النوافذ بحيث تتوزع على المستند كله (0، الوسط، الأرباع...)،
+    فإذا نفدت الميزانية الزمنية بقيت التغطية موزعة لا محصورة في البداية.
+    """
+    order, seen = [], set()
+    step = 1
+    while step < count:
+        step *= 2
+    while step >= 1:
+        for index in range(0, count, step):
+            if index not in seen:
+                seen.add(index)
+                order.append(index)
+        step //= 2
+    return order
+
+
+class Summarizer:
+    """
+    ملخِّص استخراجي بمركزية LexRank محدودة الكلفة.
+    """
+
+    def __init__(self, max_sentences: int = MAX_WINDOW_SENTENCES, neighbours: int = MAX_NEIGHBOURS,
+                 damping: float = DAMPING, tolerance: float = TOLERANCE,
+                 max_iterations: int = MAX_ITERATIONS):
+        self.max_sentences = max(2, max_sentences)
+        self.neighbours = neighbours
+        self.damping = damping
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+
+    def _vectors(self, sentences: List[str]) -> sp.csr_matrix:
+        """متجهات TF-IDF متناثرة ومطبّعة لكل جملة."""
+        vocabulary = {}
+        indices = []
+        indptr = [0]
+        for sentence in sentences:
+            for token in _WORD_RE.findall(sentence.lower()):
+                if token not in STOPWORDS:
+                    indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            indptr.append(len(indices))
+        tf = sp.csr_matrix(
+            (np.ones(len(indices)), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(sentences), len(vocabulary))
+        )
+        tf.sum_duplicates()
+        df = np.bincount(tf.indices, minlength=len(vocabulary))
+        idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+        vectors = tf.multiply(idf.reshape(1, -1)).tocsr()
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.diags(1.0 / norms) @ vectors
+
+    def _keep_neighbours(self, similarity: sp.csr_matrix) -> sp.csr_matrix:
+        """الاحتفاظ بأقوى neighbours روابط لكل جملة فقط."""
+        if not self.neighbours:
+            return similarity
+        data, indices, indptr = [], [], [0]
+        for row in range(similarity.shape[0]):
+            start, end = similarity.indptr[row], similarity.indptr[row + 1]
+            row_data = similarity.data[start:end]
+            row_indices = similarity.indices[start:end]
+            if len(row_data) > self.neighbours:
+                keep = np.argpartition(row_data, -self.neighbours)[-self.neighbours:]
+                row_data, row_indices = row_data[keep], row_indices[keep]
+            data.append(row_data)
+            indices.append(row_indices)
+            indptr.append(indptr[-1] + len(row_data))
+        return sp.csr_matrix(
+            (np.concatenate(data), np.concatenate(indices), np.asarray(indptr)),
+            shape=similarity.shape
+        )
+
+    def rank(self, sentences: List[str]) -> np.ndarray:
+        """
+        مركزية كل جملة (مجموعها 1) بالتكرار الأسّي على رسم التشابه.
+        """
+        n = len(sentences)
+        if n <= 1:
+            return np.ones(n)
+        vectors = self._vectors(sentences)
+        similarity = (vectors @ vectors.T).tocsr()
+        similarity.setdiag(0)
+        similarity.eliminate_zeros()
+        similarity = self._keep_neighbours(similarity)
+
+        row_sums = np.asarray(similarity.sum(axis=1)).ravel()
+        dangling = row_sums == 0
+        row_sums[dangling] = 1.0
+        transition_t = (sp.diags(1.0 / row_sums) @ similarity).T.tocsr()
+
+        scores = np.full(n, 1.0 / n)
+        for _ in range(self.max_iterations):
+            # الجمل بلا روابط توزع وزنها بالتساوي على جميع الجمل
+            updated = (1 - self.damping) / n + self.damping * (transition_t @ scores + scores[dangling].sum() / n)
+            if np.abs(updated - scores).sum() < self.tolerance:
+                scores = updated
+                break
+            scores = updated
+        return scores
+
+    def _select(self, window: List[Tuple[int, str]], count: int) -> List[Tuple[int, str]]:
+        """أعلى count جمل في النافذة، بترتيب ظهورها في النص."""
+        if len(window) <= count:
+            return list(window)
+        scores = self.rank([sentence for _, sentence in window])
+        best = np.argsort(-scores, kind="stable")[:count]
+        return [window[index] for index in sorted(best.tolist())]
+
+    def _reduce(self, candidates: List[Tuple[int, str]], count: int) -> Tuple[List[Tuple[int, str]], int]:
+        """تلخيص هرمي حتى تتسع الجمل المرشحة في نافذة واحدة."""
+        levels = 0
+        while len(candidates) > self.max_sentences:
+            reduced = []
+            for start in range(0, len(candidates), self.max_sentences):
+                reduced.extend(self._select(candidates[start:start + self.max_sentences], count))
+            candidates = reduced
+            levels += 1
+        return self._select(candidates, count), levels + 1
+
+    def summarize_sentences(self, sentences: List[str], sentences_count: int = 3,
+                            time_budget: Optional[float] = None) -> dict:
+        """
+        تلخيص قائمة جمل.
+        :param sentences: جمل المستند بالترتيب.
+        :param sentences_count: عدد جمل الملخص.
+        :param time_budget: الحد الزمني بالثواني؛ عند تجاوزه تُتخطى النوافذ المتبقية.
+        :return: قاموس يحتوي على الملخص ونسبة ما أُخذ بالحسبان من المستند.
+        """
+        started = time.monotonic()
+        deadline = started + time_budget if time_budget is not None else None
+        numbered = list(enumerate(sentences))
+        windows = [
+            numbered[start:start + self.max_sentences]
+            for start in range(0, len(numbered), self.max_sentences)
+        ]
+
+        candidates = []
+        considered = 0
+        for processed, index in enumerate(_spread_order(len(windows))):
+            if processed and deadline is not None and time.monotonic() > deadline:
+                break
+            candidates.extend(self._select(windows[index], sentences_count))
+            considered += len(windows[index])
+        candidates.sort()
+        selected, levels = self._reduce(candidates, sentences_count)
+        # مع أكثر من نافذة يُعد تلخيص النوافذ نفسه مستوى إضافياً
+        levels += len(windows) > 1
+        return self._result(selected, len(sentences), considered, levels, started)
+
+    def summarize(self, text: str, sentences_count: int = 3, time_budget: Optional[float] = None) -> dict:
+        """تلخيص نص كامل (انظر summarize_sentences)."""
+        return self.summarize_sentences(split_sentences(text), sentences_count, time_budget)
+
+    def stream(self, sentences_count: int = 3, time_budget: Optional[float] = None) -> "SummaryStream":
+        """ملخِّص تدريجي لنص يصل على أجزاء بذاكرة محدودة."""
+        return SummaryStream(self, sentences_count, time_budget)
+
+    def _result(self, selected, total: int, considered: int, levels: int, started: float) -> dict:
+        sentences = [sentence for _, sentence in selected]
+        return {
+            "summary": " ".join(sentences),
+            "sentences": sentences,
+            "total_sentences": total,
+            "considered_sentences": considered,
+            "coverage": considered / total if total else 1.0,
+            "levels": levels,
+            "elapsed": time.monotonic() - started
+        }
+
+
+class SummaryStream:
+    """
+    تلخيص هرمي تدريجي: تُلخَّص كل نافذة فور اكتمالها ولا يُحفظ إلا الجمل
+    المرشحة منها، وتُختصر المرشحات نفسها كلما بلغت حجم نافذة.
+    """
+
+    def __init__(self, summarizer: Summarizer, sentences_count: int = 3, time_budget: Optional[float] = None):
+        self.summarizer = summarizer
+        self.sentences_count = sentences_count
+        self._started = time.monotonic()
+        self._deadline = self._started + time_budget if time_budget is not None else None
+        self._splitter = SentenceSplitter()
+        self._window = []
+        self._candidates = []
+        self._total = 0
+        self._considered = 0
+        self._windows = 0
+        self._reductions = 0
+
+    def feed_text(self, chunk: str):
+        """إضافة جزء من النص (قد ينتهي في منتصف جملة)."""
+        self.feed(self._splitter.feed(chunk))
+
+    def feed(self, sentences: Iterable[str]):
+        """إضافة جمل مكتملة."""
+        for sentence in sentences:
+            self._window.append((self._total, sentence))
+            self._total += 1
+            if len(self._window) >= self.summarizer.max_sentences:
+                self._close_window()
+
+    def _close_window(self):
+        window, self._window = self._window, []
+        if self._considered and self._deadline is not None and time.monotonic() > self._deadline:
+            return
+        self._candidates.extend(self.summarizer._select(window, self.sentences_count))
+        self._considered += len(window)
+        self._windows += 1
+        if len(self._candidates) >= self.summarizer.max_sentences:
+            self._candidates = self.summarizer._select(self._candidates, self.sentences_count)
+            self._reductions += 1
+
+    def result(self) -> dict:
+        self.feed(self._splitter.flush())
+        if self._window:
+            self._close_window()
+        selected, levels = self.summarizer._reduce(self._candidates, self.sentences_count)
+        levels += (self._windows > 1) + self._reductions
+        return self.summarizer._result(selected, self._total, self._considered, levels, self._started)
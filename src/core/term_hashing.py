@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+term_hashing.py
+==================
+بصمات مُفتاحية للكلمات: تسمح بتخزين إحصاءات الكلمات وفهارسها في قاعدة
+البيانات دون تخزين الكلمات نفسها كنص واضح.
+"""
+
+import hmac
+import hashlib
+from typing import Union
+
+
+class TermHasher:
+    """
+    بصمة BLAKE2b بمفتاح مشتق من المفتاح السري لكل غرض على حدة،
+    تُرجع عدداً صحيحاً موقّعاً بطول 64 بت (يُخزَّن كـ INTEGER في SQLite).
+    """
+
+    DIGEST_SIZE = 8
+
+    def __init__(self, secret: Union[str, bytes], purpose: bytes = b"terms"):
+        if isinstance(secret, str):
+            secret = secret.encode("utf-8")
+        self._key = hmac.new(secret, b"manhal-term-hash:" + purpose, hashlib.sha256).digest()
+
+    def digest(self, term: str) -> int:
+        """بصمة الكلمة كعدد صحيح موقّع."""
+        raw = hashlib.blake2b(term.encode("utf-8"), key=self._key, digest_size=self.DIGEST_SIZE).digest()
+        return int.from_bytes(raw, "big", signed=True)
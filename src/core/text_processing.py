@@ -7,15 +7,28 @@ File: C:\Manhal\Manhal ai\src\core\text_processing.py
 - استخراج الكيانات الأساسية مثل الأسماء، التواريخ والأماكن.
 - الكشف عن لغة النص (عربي/إنجليزي).
 - دعم الترجمة الذكية بين اللغات (باستخدام Google Translate إن وجد).
-- تحليل المشاعر بطريقة مبسطة.
+- تحليل المشاعر بمطابقة معجم (مع النفي والتوكيد) في مرور واحد.
 - إجراء التحليل العددي للأحرف العربية (نظام الجُمَّل).
 - تلخيص النصوص واستخراج الكلمات المفتاحية.
 
 يمكن استخدام هذا الموديل كأساس لتطوير برنامج ذكاء اصطناعي يقوم بفهم وإستنتاج الإجابات من الملفات النصية وتنفيذ مزيد من التحليلات المتقدمة مثل تحليل النصوص الدينية والأدبية.
 """
 
+import os
 import re
+import json
 import string
+import hashlib
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from core.batch import resolve_workers, run_batch
+from core.entities import EntityExtractor, EntityScanner, get_entity_extractor
+from core.language_detection import FASTTEXT_SAMPLE_CHARS, get_language_detector, script_histogram
+from core.lexicon import DEFAULT_LEXICON_PATH, LexiconMatcher, SentimentScanner, get_sentiment_matcher
+from core.numerology import get_abjad_engine
 
 # محاولة استيراد مترجم googletrans لتعزيز الترجمة الذكية
 try:
@@ -25,6 +38,238 @@ except ImportError:
     translator_available = False
 
 
+# --------------------------------------------------------------------
+# الأنماط والجداول المشتركة: تُبنى مرة واحدة عند تحميل الوحدة
+# بدلاً من إعادة بنائها في كل استدعاء.
+# --------------------------------------------------------------------
+
+_PUNCTUATION_RE = re.compile('[%s]+' % re.escape(string.punctuation))
+
+# \w+ يطابق الكلمة كاملة، وهو مكافئ لـ \b\w+\b
+_WORD_RE = re.compile(r'\w+')
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!؟])\s+')
+
+# قائمة كلمات شائعة باللغتين الإنجليزية والعربية
+STOPWORDS = frozenset([
+    "the", "and", "is", "in", "on", "at", "a", "an",
+    "من", "في", "على", "ال", "و", "كما", "عن", "ما", "إلى"
+])
+
+KEYWORDS_COUNT = 5
+
+# اسم التحليل الشامل وإصداره في النتائج المحفوظة؛ يُرفع الإصدار عند تغيير
+# بنية نتيجة process_text أو طريقة حسابها
+ANALYZER_NAME = "text_processor"
+ANALYZER_VERSION = "1"
+
+# الحد الأقصى لحجم بداية النص المحفوظة لاستخراج الملخص في وضع التدفق
+STREAM_SUMMARY_MAX_CHARS = 64 * 1024
+
+# أقصى طول لبقية جزء بلا فراغات تُرحَّل إلى الجزء التالي
+STREAM_MAX_CARRY_CHARS = 1024 * 1024
+_SPLIT_CHARS = (' ', '\n', '\t', '\r')
+
+
+def _numerical_from_tokens(token_counts: Counter) -> dict:
+    """
+    حساب الجُمَّل وعدد الأحرف العربية من مدرّج الكلمات.
+    جميع الأحرف العربية (U+0621..U+064A) أحرف كلمات، لذا تُحسب قيم الكلمات
+    الفريدة دفعة واحدة بمحرك الجُمَّل ثم تُضرب في عدد تكرار كل منها.
+    """
+    if not token_counts:
+        return {"arabic_letter_sum": 0, "arabic_letter_count": 0}
+    values, letters = get_abjad_engine().verse_values(list(token_counts))
+    counts = np.fromiter(token_counts.values(), dtype=np.int64, count=len(token_counts))
+    return {
+        "arabic_letter_sum": int(values @ counts),
+        "arabic_letter_count": int(letters @ counts)
+    }
+
+
+def _sentiment_result(scanner: SentimentScanner) -> dict:
+    scanner.flush()
+    overall = "neutral"
+    if scanner.score > 0:
+        overall = "positive"
+    elif scanner.score < 0:
+        overall = "negative"
+    return {
+        "positive": scanner.positive,
+        "negative": scanner.negative,
+        "overall": overall,
+        "score": scanner.score
+    }
+
+
+def word_counts(text: str) -> Counter:
+    r"""مدرّج الكلمات (\w+) في النص بحالتها الأصلية وبترتيب أول ظهور."""
+    return Counter(_WORD_RE.findall(text))
+
+
+def candidate_terms(token_counts: Counter) -> Counter:
+    """
+    الكلمات المرشحة لتكون كلمات مفتاحية (بأحرف صغيرة، أطول من 3 أحرف، وليست شائعة).
+    يُدمج تكرار الصيغ المختلفة للكلمة نفسها (Word / word) مع الحفاظ
+    على ترتيب أول ظهور لكسر التعادل كما في الفرز المستقر.
+    """
+    frequency = Counter()
+    for token, token_count in token_counts.items():
+        word = token.lower()
+        if len(word) > 3 and word not in STOPWORDS:
+            frequency[word] += token_count
+    return frequency
+
+
+def _keywords_from_tokens(token_counts: Counter, count: int = KEYWORDS_COUNT) -> list:
+    """أكثر الكلمات تكراراً بعد استبعاد الكلمات الشائعة (اختيار بالكومة لا بفرز كامل)."""
+    return [word for word, _ in candidate_terms(token_counts).most_common(count)]
+
+
+def _summary_of(text: str) -> str:
+    """أول جملتين من النص دون تقسيمه كاملاً إلى قائمة جمل."""
+    stripped = text.strip()
+    boundaries = _SENTENCE_BOUNDARY_RE.finditer(stripped)
+    first = next(boundaries, None)
+    second = next(boundaries, None)
+    if second is None:
+        return text
+    return stripped[:first.start()] + ' ' + stripped[first.end():second.start()]
+
+
+class TextStats:
+    """
+    حصيلة جزئية قابلة للدمج لتحليل النص: مدرّج الكلمات، حالة مسح المشاعر،
+    الكيانات، ومدرّج أنظمة الكتابة. يمكن تغذيتها بأجزاء متتالية من النص (update)
+    أو دمج حصائل أجزاء مستقلة (merge)، ثم استخراج النتيجة النهائية منها.
+    """
+
+    def __init__(self, matcher: Optional[LexiconMatcher] = None, language_detector=None,
+                 entity_extractor: Optional[EntityExtractor] = None):
+        self.token_counts = Counter()
+        self.entities = EntityScanner(entity_extractor or get_entity_extractor())
+        self.sentiment = SentimentScanner(matcher or get_sentiment_matcher())
+        self.language_detector = language_detector or get_language_detector()
+        self.scripts = np.zeros(4, dtype=np.int64)
+        # بداية النص تُحفظ عينةً لـ fastText عند عدم حسم نظام الكتابة
+        self.sample = ""
+
+    def update(self, text: str) -> "TextStats":
+        """
+        إضافة جزء من النص إلى الحصيلة. يجب ألا يقطع حد الجزء كلمة.
+        """
+        tokens = _WORD_RE.findall(text)
+        self.token_counts.update(tokens)
+        self.sentiment.feed(tokens)
+        self.entities.feed(text)
+        self.scripts += script_histogram(text)
+        if len(self.sample) < FASTTEXT_SAMPLE_CHARS:
+            self.sample += text[:FASTTEXT_SAMPLE_CHARS - len(self.sample)]
+        return self
+
+    def merge(self, other: "TextStats") -> "TextStats":
+        """
+        دمج حصيلة جزء لاحق من النص في هذه الحصيلة.
+        """
+        self.token_counts.update(other.token_counts)
+        self.entities.merge(other.entities)
+        self.sentiment.merge(other.sentiment)
+        self.scripts += other.scripts
+        if len(self.sample) < FASTTEXT_SAMPLE_CHARS:
+            self.sample += other.sample[:FASTTEXT_SAMPLE_CHARS - len(self.sample)]
+        return self
+
+    def result(self, cleaned_text: Optional[str], summary: str, keyword_extractor=None) -> dict:
+        """
+        بناء قاموس النتيجة بنفس بنية process_text.
+        """
+        if keyword_extractor is not None:
+            keywords = keyword_extractor.extract_from_counts(self.token_counts)
+        else:
+            keywords = _keywords_from_tokens(self.token_counts)
+        return {
+            "cleaned_text": cleaned_text,
+            "entities": self.entities.result(),
+            "language": self.language_detector.resolve(self.scripts, self.sample)["language"],
+            "sentiment": _sentiment_result(self.sentiment),
+            "numerical_analysis": _numerical_from_tokens(self.token_counts),
+            "summary": summary,
+            "keywords": keywords
+        }
+
+
+class _SummaryTracker:
+    """
+    تتبّع أول جملتين أثناء قراءة النص على أجزاء، مع حد أقصى لحجم ما يُحفظ.
+    """
+
+    def __init__(self, max_chars: int = STREAM_SUMMARY_MAX_CHARS):
+        self.max_chars = max_chars
+        self.head = ""
+        self.summary = None
+
+    def feed_text(self, text: str):
+        if self.summary is not None:
+            return
+        self.head = (self.head + text).lstrip()
+        boundaries = _SENTENCE_BOUNDARY_RE.finditer(self.head)
+        first = next(boundaries, None)
+        second = next(boundaries, None)
+        # الحد الثاني لا يُعتمد إلا إذا تلته جملة ثالثة (كما في التقسيم على النص كاملاً)
+        if second is not None and second.end() < len(self.head):
+            self.summary = self.head[:first.start()] + ' ' + self.head[first.end():second.start()]
+            self.head = ""
+        elif len(self.head) > self.max_chars:
+            self.summary = self.head[:self.max_chars]
+            self.head = ""
+
+    def result(self) -> str:
+        if self.summary is not None:
+            return self.summary
+        return self.head.rstrip()
+
+
+def _split_at_whitespace(buffer: str):
+    """
+    تقسيم المخزن المؤقت عند آخر فراغ: الجزء الأول آمن للتحليل لأنه لا يقطع
+    كلمة أو تاريخاً، والباقي يُرحَّل إلى الجزء التالي.
+    """
+    last = max(buffer.rfind(char) for char in _SPLIT_CHARS)
+    if last < 0 and len(buffer) <= STREAM_MAX_CARRY_CHARS:
+        return "", buffer
+    if last < 0:
+        # جزء طويل بلا فراغات: يُحلَّل كما هو حتى لا تتضخم الذاكرة
+        return buffer, ""
+    return buffer[:last + 1], buffer[last + 1:]
+
+
+# نسخة المعالج الخاصة بكل عملية عاملة في المعالجة الدفعية
+_worker_processor = None
+
+
+def _init_batch_worker(lexicon_path: Optional[str], keyword_extractor, summarizer):
+    """
+    تهيئة معالج واحد لكل عملية عاملة (بما فيه المترجم) بدلاً من تهيئته لكل عنصر،
+    بإعدادات المعالج المستدعي نفسها حتى تطابق النتائج process_text.
+    """
+    global _worker_processor
+    _worker_processor = TextProcessor(lexicon_path, keyword_extractor, summarizer)
+
+
+def _process_batch_item(text: str) -> dict:
+    return _worker_processor.process_text(text)
+
+
+def _component_config(component) -> Optional[dict]:
+    """اسم صنف المكوّن ومعاملاته البسيطة (دون الحالة كإحصاءات المدونة)."""
+    if component is None:
+        return None
+    params = {
+        name: value for name, value in vars(component).items()
+        if isinstance(value, (str, int, float, bool, type(None)))
+    }
+    return {"class": type(component).__name__, **params}
+
+
 class TextProcessor:
     """
     وحدة معالجة النصوص لتحليل وتجميع المعلومات من الملفات.
@@ -40,51 +285,58 @@ class TextProcessor:
       - معالجة شاملة للنص تجمع نتائج التحليل المختلفة.
     """
 
-    def __init__(self):
+    def __init__(self, lexicon_path: Optional[str] = None, keyword_extractor=None, summarizer=None):
         if translator_available:
             self.translator = Translator()
+        # مُطابِق المعجم مشترك بين جميع النسخ (يُبنى مرة واحدة لكل ملف معجم)
+        self.lexicon_path = lexicon_path
+        self.sentiment_matcher = get_sentiment_matcher(lexicon_path)
+        # كاشف اللغة المشترك (نموذج fastText يُحمَّل عند أول حاجة فقط)
+        self.language_detector = get_language_detector()
+        # التعبير النمطي للكيانات وقاموس الأماكن يُبنيان مرة واحدة ويُشاركان
+        self.entity_extractor = get_entity_extractor()
+        # مستخرج كلمات مفتاحية على مستوى المدونة (core.keywords.KeywordExtractor)؛
+        # عند غيابه تُختار الكلمات الأكثر تكراراً في النص
+        self.keyword_extractor = keyword_extractor
+        # ملخِّص استخراجي (core.summarization.Summarizer)؛ عند غيابه تُعاد الجمل الأولى
+        self.summarizer = summarizer
+
+    def analysis_version(self) -> str:
+        """
+        إصدار التحليل وبصمة إعداداته (ملف المعجم وتاريخ تعديله، والملخِّص ومستخرج
+        الكلمات المفتاحية ومعاملاتهما)؛ تتغير عند تغيّر أي منها فلا تُستخدم نتائج
+        محفوظة بإعدادات أخرى.
+        """
+        lexicon = str(self.lexicon_path or DEFAULT_LEXICON_PATH)
+        config = {
+            "lexicon": lexicon,
+            "lexicon_mtime": os.path.getmtime(lexicon) if os.path.exists(lexicon) else None,
+            "summarizer": _component_config(self.summarizer),
+            "keywords": _component_config(self.keyword_extractor),
+        }
+        digest = hashlib.blake2b(json.dumps(config, sort_keys=True).encode("utf-8"), digest_size=8)
+        return f"{ANALYZER_VERSION}-{digest.hexdigest()}"
 
     def clean_text(self, text: str) -> str:
         """
         تنظيف النص بإزالة علامات الترقيم والفارغات الزائدة وتحويله إلى صيغة موحدة.
         """
-        cleaned_text = text.strip()
-        # إزالة علامات الترقيم
-        translator_table = str.maketrans('', '', string.punctuation)
-        cleaned_text = cleaned_text.translate(translator_table)
-        # تحويل النص إلى أحرف صغيرة (يساهم في تحسين التحليل للغة الإنجليزية)
-        cleaned_text = cleaned_text.lower()
-        return cleaned_text
+        # إزالة علامات الترقيم ثم التحويل إلى أحرف صغيرة (يساهم في تحسين التحليل للغة الإنجليزية)
+        return _PUNCTUATION_RE.sub('', text.strip()).lower()
 
     def extract_entities(self, text: str) -> dict:
         """
-        استخراج الكيانات الأساسية مثل التواريخ والأسماء والأماكن.
-        يعتمد هذا الأسلوب على تعابير نمطية بسيطة.
+        استخراج الكيانات الأساسية مثل التواريخ (الميلادية والهجرية) والأسماء والأماكن
+        مع مواضعها في النص (انظر core.entities).
         """
-        entities = {
-            "dates": [],
-            "names": [],
-            "places": []
-        }
-        # استخراج التواريخ بصيغ مثل dd/mm/yyyy أو dd-mm-yyyy
-        dates = re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', text)
-        entities["dates"] = dates
-
-        # استخراج الأسماء باللغة الإنجليزية (كلمات تبدأ بحرف كبير)
-        names = re.findall(r'\b[A-Z][a-z]+\b', text)
-        entities["names"] = list(set(names))
-
-        # استخراج الأماكن: يمكن تطوير هذه الوظيفة باستخدام مكتبات NER في المستقبل
-        entities["places"] = []
-        return entities
+        return self.entity_extractor.extract(text)
 
     def detect_language(self, text: str) -> str:
         """
-        الكشف عن لغة النص؛ إذا وجد حروف عربية فإن اللغة تكون "ar"، وإلا "en".
+        الكشف عن لغة النص من نظام الكتابة الغالب، مع الرجوع إلى fastText
+        عند اختلاط الأنظمة أو قصر النص (انظر core.language_detection).
         """
-        if re.search(r'[\u0600-\u06FF]', text):
-            return "ar"
-        return "en"
+        return self.language_detector.detect(text)["language"]
 
     def translate_text(self, text: str, dest_language: str) -> str:
         """
@@ -101,63 +353,33 @@ class TextProcessor:
 
     def analyze_sentiment(self, text: str) -> dict:
         """
-        تحليل المشاعر باستخدام أسلوب مبسط يعتمد على عد الكلمات الإيجابية والسلبية.
+        تحليل المشاعر بمطابقة كلمات وعبارات المعجم الإيجابية والسلبية بحدود الكلمات،
+        مع عكس القطبية بعد أدوات النفي ومضاعفة الوزن بعد أدوات التوكيد.
         """
-        positive_words = ['good', 'great', 'excellent', 'happy', 'positive', 'جميل', 'سعيد']
-        negative_words = ['bad', 'sad', 'poor', 'negative', 'terrible', 'سيء', 'حزين']
-        text_lower = text.lower()
-        pos_count = sum(text_lower.count(word) for word in positive_words)
-        neg_count = sum(text_lower.count(word) for word in negative_words)
-        overall = "neutral"
-        if pos_count > neg_count:
-            overall = "positive"
-        elif neg_count > pos_count:
-            overall = "negative"
-        return {"positive": pos_count, "negative": neg_count, "overall": overall}
+        scanner = SentimentScanner(self.sentiment_matcher)
+        return _sentiment_result(scanner.feed(_WORD_RE.findall(text)))
 
     def numerical_analysis(self, text: str) -> dict:
         """
-        إجراء حساب عددي للأحرف العربية باستخدام نظام الجُمَّل.
+        إجراء حساب عددي للأحرف العربية باستخدام نظام الجُمَّل.
         """
-        # تعريف قيم الحروف العربية وفق نظام الجُمَّل
-        abjad_values = {
-            'ا': 1, 'أ': 1, 'إ': 1, 'آ': 1, 'ب': 2, 'ج': 3, 'د': 4, 'ه': 5,
-            'و': 6, 'ز': 7, 'ح': 8, 'ط': 9, 'ي': 10, 'ك': 20, 'ل': 30,
-            'م': 40, 'ن': 50, 'س': 60, 'ع': 70, 'ف': 80, 'ص': 90, 'ق': 100,
-            'ر': 200, 'ش': 300, 'ت': 400, 'ث': 500, 'خ': 600, 'ذ': 700, 'ض': 800,
-            'ظ': 900, 'غ': 1000
-        }
-        # استخراج الأحرف العربية من النص
-        arabic_letters = re.findall(r'[\u0621-\u064A]', text)
-        total_value = sum(abjad_values.get(letter, 0) for letter in arabic_letters)
-        return {"arabic_letter_sum": total_value, "arabic_letter_count": len(arabic_letters)}
+        return _numerical_from_tokens(Counter(_WORD_RE.findall(text)))
 
     def summarize_text(self, text: str) -> str:
         """
-        تلخيص النص بشكل مبسط باختيار الجمل الأولى.
+        تلخيص النص باختيار الجمل الأكثر مركزية إن توفر ملخِّص، وإلا باختيار الجمل الأولى.
         """
-        sentences = re.split(r'(?<=[.!؟])\s+', text.strip())
-        if len(sentences) > 2:
-            return ' '.join(sentences[:2])
-        return text
+        if self.summarizer is not None:
+            return self.summarizer.summarize(text, sentences_count=2)["summary"]
+        return _summary_of(text)
 
     def extract_keywords(self, text: str) -> list:
         """
         استخراج الكلمات المفتاحية من النص بعد إزالة الكلمات الشائعة.
         """
-        words = re.findall(r'\b\w+\b', text.lower())
-        # قائمة كلمات شائعة باللغتين الإنجليزية والعربية
-        stopwords = set([
-            "the", "and", "is", "in", "on", "at", "a", "an",
-            "من", "في", "على", "ال", "و", "كما", "عن", "ما", "إلى"
-        ])
-        filtered_words = [word for word in words if word not in stopwords and len(word) > 3]
-        frequency = {}
-        for word in filtered_words:
-            frequency[word] = frequency.get(word, 0) + 1
-        sorted_keywords = sorted(frequency.items(), key=lambda x: x[1], reverse=True)
-        top_keywords = [word for word, count in sorted_keywords[:5]]
-        return top_keywords
+        if self.keyword_extractor is not None:
+            return self.keyword_extractor.extract(text)
+        return _keywords_from_tokens(word_counts(text))
 
     def process_text(self, text: str) -> dict:
         """
@@ -169,22 +391,75 @@ class TextProcessor:
          - الحساب العددي للأحرف.
          - تلخيص النص.
          - استخراج الكلمات المفتاحية.
-        
+
+        يُقطَّع النص مرة واحدة إلى مدرّج للكلمات (TextStats) تُغذّى منه الأسماء
+        والكلمات المفتاحية والحساب العددي، بدلاً من إعادة تقطيع النص في كل دالة على حدة.
+
         تُرجع هذه الدالة نتيجة شاملة في شكل قاموس.
         """
-        cleaned = self.clean_text(text)
-        entities = self.extract_entities(text)
-        language = self.detect_language(text)
-        sentiment = self.analyze_sentiment(text)
-        numerical = self.numerical_analysis(text)
-        summary = self.summarize_text(text)
-        keywords = self.extract_keywords(text)
-        return {
-            "cleaned_text": cleaned,
-            "entities": entities,
-            "language": language,
-            "sentiment": sentiment,
-            "numerical_analysis": numerical,
-            "summary": summary,
-            "keywords": keywords
-        }
\ No newline at end of file
+        stats = TextStats(self.sentiment_matcher, self.language_detector, self.entity_extractor).update(text)
+        return stats.result(
+            cleaned_text=_PUNCTUATION_RE.sub('', text.strip()).lower(),
+            summary=self.summarize_text(text),
+            keyword_extractor=self.keyword_extractor
+        )
+
+    def process_stream(self, chunks: Iterable[str]) -> dict:
+        """
+        تحليل نص كبير على أجزاء متتالية (مثل صفحات ملف PDF) دون تجميعه في الذاكرة.
+
+        تُدمج نتائج الأجزاء تدريجياً في حصيلة واحدة (TextStats)، فلا يتجاوز ما يُحفظ
+        مدرّج الكلمات وبداية النص اللازمة للملخص. تُرحَّل بقية كل جزء بعد آخر فراغ
+        إلى الجزء التالي حتى لا تنقطع كلمة أو تاريخ بين جزأين.
+
+        :param chunks: أجزاء النص بالترتيب.
+        :return: قاموس بنفس بنية process_text، مع "cleaned_text" = None لأن النص
+                 المنظف الكامل لا يُحفظ في هذا الوضع.
+        """
+        stats = TextStats(self.sentiment_matcher, self.language_detector, self.entity_extractor)
+        if self.summarizer is not None:
+            summary = self.summarizer.stream(sentences_count=2)
+        else:
+            summary = _SummaryTracker()
+        carry = ""
+        for chunk in chunks:
+            if not chunk:
+                continue
+            summary.feed_text(chunk)
+            ready, carry = _split_at_whitespace(carry + chunk)
+            if ready:
+                stats.update(ready)
+        if carry:
+            stats.update(carry)
+        summary = summary.result()
+        if self.summarizer is not None:
+            summary = summary["summary"]
+        return stats.result(cleaned_text=None, summary=summary,
+                            keyword_extractor=self.keyword_extractor)
+
+    def process_batch(self, texts: Iterable[str], workers: Optional[int] = None,
+                      chunksize: Optional[int] = None) -> List[dict]:
+        """
+        معالجة مجموعة نصوص بالتوازي على عدة أنوية باستخدام process_text.
+
+        :param texts: النصوص المراد تحليلها.
+        :param workers: عدد العمليات؛ الافتراضي عدد أنوية المعالج.
+        :param chunksize: حجم الدفعة لكل عامل؛ يُحسب تلقائياً من عدد النصوص وأطوالها.
+        :return: قائمة بنفس ترتيب النصوص، كل عنصر فيها {"result": ..., "error": ...}.
+
+        تُبنى معالجات العمليات العاملة بإعدادات هذا المعالج (ملف المعجم، مستخرج
+        الكلمات المفتاحية، الملخِّص)، لذا يجب أن يكون المستخرج والملخِّص قابلين للتسلسل.
+        """
+        texts = list(texts)
+        if resolve_workers(workers, len(texts)) == 1:
+            # عامل واحد: التنفيذ في العملية الحالية بهذا المعالج
+            return run_batch(self.process_text, texts, workers=1)
+        return run_batch(
+            _process_batch_item,
+            texts,
+            workers=workers,
+            chunksize=chunksize,
+            initializer=_init_batch_worker,
+            initargs=(self.lexicon_path, self.keyword_extractor, self.summarizer),
+            weights=[len(text) if isinstance(text, str) else 0 for text in texts]
+        )
@@ -10,6 +10,7 @@ import sys
 from pathlib import Path
 from PyQt6.QtWidgets import QApplication, QMainWindow, QPushButton, QLabel, QTextEdit, QFileDialog, QVBoxLayout, QWidget
 from ..core.text_processing import TextProcessor
+from ..core.extractors import extract_text, file_type
 from ..core.database import DatabaseManager
 from ..core.ai_engine import AIEngine
 from ..config import DATA_DIR
@@ -68,8 +69,8 @@ class AIInterface(QMainWindow):
         """
         file_path, _ = QFileDialog.getOpenFileName(self, "اختر ملفًا", "", "Documents (*.pdf *.docx *.doc *.txt *.jpg *.png)")
         if file_path:
-            extracted_text = self.text_processor.extract_text(Path(file_path).name)
-            self.db.save_document(Path(file_path).name, extracted_text, Path(file_path).suffix.upper())
+            extracted_text = extract_text(file_path)
+            self.db.save_document(Path(file_path).name, extracted_text, file_type(file_path))
             self.result_area.setText(extracted_text)
 
     def analyze_text(self):
@@ -1,10 +1,9 @@
-from sumy.parsers.plaintext import PlaintextParser
-from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.lex_rank import LexRankSummarizer
+from core.summarization import Summarizer
+
 
 class AdvancedSummarizer:
-    def summarize(self, text, sentences_count=3):
-        parser = PlaintextParser.from_string(text, Tokenizer("arabic"))
-        summarizer = LexRankSummarizer()
-        summary = summarizer(parser.document, sentences_count)
-        return " ".join(str(sentence) for sentence in summary)
+    def __init__(self, max_sentences=200, neighbours=10):
+        self.engine = Summarizer(max_sentences=max_sentences, neighbours=neighbours)
+
+    def summarize(self, text, sentences_count=3, time_budget=None):
+        return self.engine.summarize(text, sentences_count, time_budget)["summary"]
@@ -6,6 +6,9 @@ test_api.py
 اختبارات لوظائف REST API باستخدام `pytest`
 """
 
+import io
+import zipfile
+
 import pytest
 import requests
 
@@ -25,12 +28,32 @@ def test_upload_file(get_jwt_token):
     اختبار تحميل ملف ومعالجته عبر API
     """
     headers = {"Authorization": f"Bearer {get_jwt_token}"}
-    files = {"file": ("example.txt", b"هذا ملف اختبار", "text/plain")}
+    files = {"file": ("example.txt", "هذا ملف اختبار".encode("utf-8"), "text/plain")}
     
     response = requests.post(f"{BASE_URL}/upload/", headers=headers, files=files)
     assert response.status_code == 200
     assert "تم استخراج النص" in response.json()["message"]
 
+def test_upload_odt_without_extension(get_jwt_token):
+    """
+    اختبار تحميل ملف ODT باسم بلا امتداد: يُكتشف نوعه من بايتاته ويُمرر إلى textract
+    """
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as archive:
+        archive.writestr("mimetype", "application/vnd.oasis.opendocument.text", zipfile.ZIP_STORED)
+        archive.writestr("content.xml", (
+            '<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+            'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+            '<office:body><office:text><text:p>نص ملف مفتوح</text:p></office:text></office:body>'
+            '</office:document-content>'
+        ))
+    headers = {"Authorization": f"Bearer {get_jwt_token}"}
+    files = {"file": ("letter", content.getvalue(), "application/octet-stream")}
+
+    response = requests.post(f"{BASE_URL}/upload/", headers=headers, files=files)
+    assert response.status_code == 200
+    assert "نص ملف مفتوح" in response.json()["text"]
+
 def test_analyze_text(get_jwt_token):
     """
     اختبار تحليل النصوص عبر API
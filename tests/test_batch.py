@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_batch.py
+==================
+اختبارات المعالجة الدفعية والقراءة المسبقة باستخدام `pytest`
+"""
+
+import os
+import time
+
+import pytest
+from core.batch import WORKER_CRASH_ERROR, prefetch, run_batch
+
+def _double_or_crash(item):
+    if item == 5:
+        # إنهاء العملية العاملة فوراً كما يفعل خطأ تجزئة أو قتل لنفاد الذاكرة
+        os._exit(1)
+    return item * 2
+
+def _failing_initializer():
+    raise RuntimeError("تعذر تحميل النموذج")
+
+def test_run_batch_survives_a_worker_crash():
+    results = run_batch(_double_or_crash, range(12), workers=3, chunksize=2)
+
+    assert [r["result"] for r in results] == [i * 2 if i != 5 else None for i in range(12)]
+    assert [r["error"] for r in results] == [WORKER_CRASH_ERROR if i == 5 else None for i in range(12)]
+
+def test_run_batch_reports_initializer_failure_per_item():
+    results = run_batch(_double_or_crash, [1, 2, 3], workers=2, initializer=_failing_initializer)
+
+    assert [r["error"] for r in results] == ["RuntimeError: تعذر تحميل النموذج"] * 3
+
+def test_prefetch_applies_backpressure_and_propagates_errors():
+    produced = []
+
+    def numbers():
+        for number in range(100):
+            produced.append(number)
+            yield number
+
+    stream = prefetch(numbers(), 2)
+    assert next(stream) == 0
+    time.sleep(0.2)
+    assert len(produced) <= 4
+    stream.close()
+
+    def failing():
+        yield 1
+        raise RuntimeError("تعذر القراءة")
+
+    with pytest.raises(RuntimeError):
+        list(prefetch(failing(), 2))
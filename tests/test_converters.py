@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_converters.py
+==================
+اختبارات مجمّع المحوّلات الخارجية باستخدام `pytest`
+"""
+
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from core import converters, extractors
+from core.converters import ConverterError, ConverterPool, ConverterTimeout
+
+def test_converter_pool_bounds_concurrency_and_enforces_timeouts():
+    pool = ConverterPool(workers=2, timeout=5)
+    assert pool.run([sys.executable, "-c", "print('نص', end='')"]) == "نص".encode("utf-8")
+    with pytest.raises(ConverterTimeout):
+        pool.run([sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.5)
+    with pytest.raises(ConverterError):
+        pool.run([sys.executable, "-c", "raise SystemExit(3)"])
+    with pytest.raises(FileNotFoundError):
+        pool.run(["no-such-converter-binary"])
+
+    sleeper = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(pool.run, sleeper) for _ in range(4)]
+        time.sleep(0.15)
+        busy = pool.stats()
+        for future in futures:
+            future.result()
+    assert busy["running"] == 2 and busy["queued"] == 2
+
+    stats = pool.stats()
+    assert (stats["completed"], stats["failures"], stats["timeouts"]) == (5, 2, 1)
+    assert stats["running"] == stats["queued"] == 0
+    pool.close()
+
+@pytest.fixture
+def fake_textract(tmp_path, monkeypatch):
+    """مكتبة textract بديلة في العمليات الخادمة: تُرجع الامتداد المُمرَّر ورقم العملية."""
+    (tmp_path / "textract.py").write_text(
+        "import os\n"
+        "def process(path, extension=None):\n"
+        "    print('ضجيج على المخرج القياسي')\n"
+        "    return f'{extension}:{os.getpid()}'.encode()\n",
+        encoding="utf-8"
+    )
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    monkeypatch.setattr(converters, "textract_available", True)
+    monkeypatch.setattr(extractors, "textract_available", True)
+    pool = ConverterPool(workers=1, timeout=30)
+    monkeypatch.setattr(converters, "_POOL", pool)
+    monkeypatch.setattr(converters, "_POOL_PID", os.getpid())
+    yield pool
+    pool.close()
+
+def test_textract_runs_in_reused_server_with_detected_extension(tmp_path, fake_textract):
+    upload = tmp_path / "upload-x1y2"
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.writestr("mimetype", "application/vnd.oasis.opendocument.text")
+        archive.writestr("content.xml", "<office:document-content/>")
+
+    first = extractors.extract_text(str(upload))
+    extension, _ = first.split(":")
+    assert extension == "odt"
+    assert extractors.extract_text(str(upload)) == first
+    assert fake_textract.stats()["idle_servers"] == 1
+
+@pytest.mark.skipif(os.name != "posix", reason="حدود الموارد على أنظمة POSIX فقط")
+def test_converter_pool_limits_memory_without_preexec_fn():
+    pool = ConverterPool(workers=1, timeout=30, memory_limit=256 * 1024 * 1024)
+    with pytest.raises(ConverterError):
+        pool.run([sys.executable, "-c", "buffer = bytearray(1024 ** 3)"])
+    assert pool.run([sys.executable, "-c", "print(len(bytearray(1024 ** 2)), end='')"]) == b"1048576"
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="يتطلب fork")
+def test_converter_pool_resets_after_fork(fake_textract, tmp_path):
+    (tmp_path / "letter.odt").write_bytes(b"")
+    assert fake_textract.textract(str(tmp_path / "letter.odt")).startswith("None:")
+    assert fake_textract.stats()["idle_servers"] == 1
+
+    pid = os.fork()
+    if pid == 0:
+        # الخادم الموروث وخيط قراءة ردوده للعملية الأم
+        stats = converters.get_converter_pool().stats()
+        os._exit(0 if stats["idle_servers"] == 0 and stats["completed"] == 0 else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert fake_textract.textract(str(tmp_path / "letter.odt")).startswith("None:")
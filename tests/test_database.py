@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_database.py
+==================
+اختبارات مدير قاعدة البيانات باستخدام `pytest`
+"""
+
+import hashlib
+import threading
+
+import pytest
+from cryptography.fernet import Fernet
+import core.database
+from core.blob_format import MAGIC
+from core.database import DatabaseManager
+from core.keywords import KeywordExtractor
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    قاعدة بيانات مؤقتة بمفتاح تشفير صالح
+    """
+    monkeypatch.setattr(core.database, "SECRET_KEY", Fernet.generate_key())
+    with DatabaseManager(str(tmp_path / "test.db")) as manager:
+        yield manager
+
+def test_find_by_abjad_words_and_phrases(db):
+    assert db.save_document("الفاتحة", "بسم الله الرحمن الرحيم", "TXT")
+    assert db.save_document("التكبير", "الله أكبر", "TXT")
+
+    words = db.find_by_abjad(66)
+    assert [(r["document_id"], r["text"]) for r in words] == [(1, "الله"), (2, "الله")]
+
+    phrases = db.find_by_abjad(66 + 329, max_length=3)
+    assert [r["text"] for r in phrases] == ["الله الرحمن"]
+
+    in_range = db.find_by_abjad(100, max_value=110, with_text=False)
+    assert [(r["position"], r["value"]) for r in in_range] == [(0, 102)]
+
+def test_corpus_keywords_demote_common_terms(db):
+    for i in range(10):
+        assert db.save_document(f"فصل {i}", f"chapter boilerplate notes{i}", "TXT")
+
+    stats = db.load_corpus_stats()
+    assert stats.document_count == 10
+
+    text = "chapter chapter boilerplate boilerplate quantum physics"
+    assert KeywordExtractor(stats, k=2, scheme="frequency").extract(text) == ["chapter", "boilerplate"]
+    assert KeywordExtractor(stats, k=2, scheme="tfidf").extract(text) == ["quantum", "physics"]
+    assert KeywordExtractor(stats, k=2, scheme="bm25").extract(text) == ["quantum", "physics"]
+
+def test_unknown_storage_codec_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.database, "SECRET_KEY", Fernet.generate_key())
+    with pytest.raises(ValueError, match="lz4"):
+        DatabaseManager(str(tmp_path / "test.db"), storage_codec="lz4")
+
+def test_pooled_connections_per_thread_and_failed_insert_rolls_back(db):
+    with db._db_connection() as first, db._db_connection() as second:
+        assert first is second
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.pool.connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+    assert db.save_document("مكرر", "نص أول", "TXT")
+    assert not db.save_document("مكرر", "نص ثان", "TXT")
+    assert not first.in_transaction
+    assert db.get_document(1)["content"] == "نص أول"
+
+def test_pool_closes_connection_when_its_thread_exits(tmp_path):
+    import sqlite3
+    from core.db_pool import ConnectionPool
+
+    pool = ConnectionPool(tmp_path / "pool.db")
+    main = pool.connection()
+    opened = []
+    for _ in range(5):
+        thread = threading.Thread(target=lambda: opened.append(pool.connection()))
+        thread.start()
+        thread.join()
+
+    assert pool.open_connections == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+    assert main.execute("SELECT 1").fetchone() == (1,)
+    pool.close()
+    assert pool.open_connections == 0
+
+def test_closing_managers_releases_threads_and_connections(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.database, "SECRET_KEY", Fernet.generate_key())
+    threads = threading.active_count()
+    for i in range(5):
+        manager = DatabaseManager(str(tmp_path / "test.db"))
+        assert manager.save_document(f"مستند {i}", f"نص {i}", "TXT")
+        manager.close()
+        assert manager.pool.open_connections == 0
+    assert threading.active_count() == threads
+
+def test_save_documents_in_batches_reports_duplicates(db):
+    assert db.save_document("قديم", "نص محفوظ مسبقاً", "TXT")
+    documents = (
+        [(f"مستند {i}", f"الله أكبر {i}", "TXT") for i in range(5)]
+        + [("قديم", "نص آخر", "TXT"), ("مستند 1", "تكرار في الدفعة", "TXT"), ("سيء", "نص", "EXE")]
+        + [("نسخة", "الله أكبر 0", "TXT"), ("نسخة قديمة", "نص محفوظ مسبقاً", "TXT")]
+    )
+
+    report = db.save_documents(iter(documents), batch_size=3, workers=2)
+    assert report == {
+        "saved": 5, "linked": ["نسخة", "نسخة قديمة"], "duplicates": ["قديم", "مستند 1"], "failed": ["سيء"]
+    }
+    assert db.find_by_title("نسخة") == 2 and db.find_by_title("نسخة قديمة") == 1
+    assert db.get_document(6)["content"] == "الله أكبر 4"
+    assert len(db.find_by_abjad(66, with_text=False)) == 5
+    assert db.load_corpus_stats().document_count == 6
+
+def test_save_documents_links_content_inserted_by_a_concurrent_writer(db, monkeypatch):
+    seal = db._seal_content
+    raced = []
+
+    def seal_while_another_writer_saves(data, content_hash):
+        # كاتب آخر يحفظ المحتوى نفسه بين فحص البصمات الأول وقفل الكتابة
+        if not raced:
+            raced.append(True)
+            writer = threading.Thread(target=lambda: raced.append(db.save_document("سباق", "محتوى مشترك", "TXT")))
+            writer.start()
+            writer.join()
+        return seal(data, content_hash)
+
+    monkeypatch.setattr(db, "_seal_content", seal_while_another_writer_saves)
+    report = db.save_documents([("دفعة", "محتوى مشترك", "TXT")])
+    assert raced == [True, True]
+    assert report == {"saved": 0, "linked": ["دفعة"], "duplicates": [], "failed": []}
+    with db._db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 1
+    assert db.find_by_title("دفعة") == db.find_by_title("سباق") == 1
+
+def test_search_documents_matches_stems_phrases_and_prefixes(db):
+    assert db.save_document("تقرير", "قرأتُ الكتاب الجديد في المكتبة", "TXT")
+    assert db.save_document("مقال", "الجديد في الكتب القديمة", "TXT")
+
+    assert [r["id"] for r in db.search_documents("كتاب")] == [1]
+    assert [r["id"] for r in db.search_documents('"الكتاب الجديد"')] == [1]
+    assert db.search_documents('"الجديد الكتاب"') == []
+    assert {r["id"] for r in db.search_documents("مكت*")} == {1}
+    assert {r["id"] for r in db.search_documents("الجديد")} == {1, 2}
+
+    with db._db_connection() as conn:
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('delete-all')")
+        conn.commit()
+    assert db.search_documents("مقال") == []
+    assert db.rebuild_search_index() == 2
+    assert [r["title"] for r in db.search_documents("مقال")] == ["مقال"]
+
+def test_document_cache_hits_and_invalidation(db):
+    assert db.save_document("ساخن", "نص " * 100, "TXT")
+    assert db.get_document(1) == db.get_document(1)
+    stats = db.document_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+    # التعديل المباشر لا يظهر حتى يُبطَل العنصر
+    with db._db_connection() as conn:
+        conn.execute("DELETE FROM documents WHERE id = 1")
+        conn.commit()
+    assert db.get_document(1)["title"] == "ساخن"
+    db.document_cache.invalidate(1)
+    assert db.get_document(1) is None
+
+def test_document_cache_tinylfu_keeps_hot_entries():
+    from core.doc_cache import DocumentCache
+
+    cache = DocumentCache(max_bytes=2000, policy="tinylfu", wipe=True)
+    for _ in range(3):
+        cache.get(1)
+    cache.put(1, "hot", "x" * 500, "h1")
+    for doc_id in range(2, 10):
+        cache.get(doc_id)
+        cache.put(doc_id, "scan", "y" * 500, "h")
+    assert cache.get(1)["content"] == "x" * 500
+    assert cache.stats()["bytes"] <= 2000
+    assert cache.stats()["rejections"] > 0
+
+def test_compressed_storage_reads_legacy_rows_and_migrates(db):
+    text = "بسم الله الرحمن الرحيم " * 50
+    with db._db_connection() as conn:
+        conn.execute(
+            "INSERT INTO documents (title, content, sha256_hash, file_type) VALUES (?, ?, ?, ?)",
+            ("قديم", db.cipher.encrypt(text.encode()), hashlib.sha256(text.encode()).hexdigest(), "TXT")
+        )
+        conn.commit()
+    assert db.save_document("جديد", text + ".", "TXT")
+
+    with db._db_connection() as conn:
+        legacy, new = [row[0] for row in conn.execute("SELECT content FROM documents ORDER BY id")]
+    assert legacy.startswith(b"gAAAAA") and new.startswith(MAGIC)
+    assert len(new) < len(text.encode()) < len(legacy)
+    assert db.get_document(1)["content"] + "." == db.get_document(2)["content"] == text + "."
+
+    assert db.migrate_storage(batch_size=1) == 1
+    assert db.migrate_storage() == 0
+    db.document_cache.clear()
+    assert db.get_document(1)["content"] == text
+
+    dict_id = db.train_compression_dictionary()
+    assert db.save_document("بقاموس", text + "!", "TXT")
+    with db._db_connection() as conn:
+        blob = conn.execute("SELECT content FROM documents WHERE id = 3").fetchone()[0]
+    assert int.from_bytes(blob[5:9], "big") == dict_id
+    assert db.get_document(3)["content"] == text + "!"
+
+@pytest.fixture
+def slow_audit_db(tmp_path, monkeypatch):
+    """
+    قاعدة بيانات لا يكتب سجل تدقيقها دفعة قبل flush() مهما طال الاختبار
+    """
+    monkeypatch.setattr(core.database, "SECRET_KEY", Fernet.generate_key())
+    with DatabaseManager(str(tmp_path / "test.db"), audit_flush_interval=3600) as manager:
+        yield manager
+
+def test_audit_events_are_batched_and_security_alerts_are_synchronous(slow_audit_db):
+    db = slow_audit_db
+    assert db.save_document("أول", "نص", "TXT")
+    db._log_event("SECURITY_ALERT", "تنبيه")
+    with db._db_connection() as conn:
+        assert [row[0] for row in conn.execute("SELECT event_type FROM audit_log")] == ["SECURITY_ALERT"]
+
+    db.audit.flush()
+    with db._db_connection() as conn:
+        events = [row[0] for row in conn.execute("SELECT event_type FROM audit_log ORDER BY id")]
+    assert sorted(events) == ["DOC_SAVE", "SECURITY_ALERT"]
+
+def test_audit_writer_drops_on_overflow_and_delivers_on_close(tmp_path):
+    from core.audit import AuditWriter
+    from core.db_pool import ConnectionPool
+
+    pool = ConnectionPool(tmp_path / "audit.db")
+    pool.connection().execute(
+        "CREATE TABLE audit_log (id INTEGER PRIMARY KEY, event_type TEXT, details TEXT, timestamp TEXT)"
+    )
+    writer = AuditWriter(pool, max_queue=2, overflow="drop", flush_interval=60)
+    writer._ensure_thread = lambda: None  # دون خيط: لا يُفرَّغ الطابور قبل close()
+    for i in range(5):
+        writer.log("EVENT", str(i))
+    assert writer.stats()["dropped"] == 3
+    writer.close()
+    events = [row[0] for row in pool.connection().execute("SELECT event_type FROM audit_log ORDER BY id")]
+    assert events == ["EVENT", "EVENT", "AUDIT_OVERFLOW"]
+    pool.close()
+
+def test_audit_writer_survives_unexpected_errors(tmp_path):
+    from core.audit import AuditWriter
+    from core.db_pool import ConnectionPool
+
+    pool = ConnectionPool(tmp_path / "audit.db")
+    pool.connection().execute(
+        "CREATE TABLE audit_log (id INTEGER PRIMARY KEY, event_type TEXT, details TEXT, timestamp TEXT)"
+    )
+    writer = AuditWriter(pool, max_queue=2, flush_interval=3600)
+    connection = pool.connection
+    pool.connection = lambda: (_ for _ in ()).throw(RuntimeError("المجمّع مغلق"))
+    writer.log("LOST", "1")
+    writer.flush()
+    assert writer.stats()["failed"] == 1
+
+    pool.connection = connection
+    for i in range(3):
+        writer.log("EVENT", str(i))
+    writer.flush()
+    assert writer.stats()["written"] == 3
+    writer.close()
+    pool.close()
+
+def test_ingest_links_same_content_and_remembers_source(db):
+    first = db.ingest_document("أصل", "نص مكرر", "TXT", source_hash="f" * 64)
+    assert first == {"id": 1, "hash": db.get_document(1)["hash"], "linked": False}
+    assert db.ingest_document("نسخة", "نص مكرر", "TXT") == dict(first, linked=True)
+    assert db.ingest_document("نسخة", "نص مختلف", "TXT") is None
+    assert db.ingest_document("أصل", "نص مختلف", "TXT") is None
+
+    assert db.find_by_source("f" * 64) == db.find_by_title("نسخة") == db.find_by_hash(first["hash"]) == 1
+    with db._db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 1
+
+def test_analysis_results_read_through_and_selective_invalidation(db):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"summary": "ملخص", "spans": [("date", 0, 4)], "score": 0.5}
+
+    first = db.get_or_compute_analysis("a" * 64, "text_processor", "1-x", compute)
+    assert db.get_or_compute_analysis("a" * 64, "text_processor", "1-x", compute) == first
+    assert len(calls) == 1 and first["spans"] == [["date", 0, 4]]
+    assert db.load_analysis("a" * 64, "text_processor", "2-x") is None
+
+    assert db.save_analysis("a" * 64, "text_processor", "2-x", {"summary": "جديد"})
+    assert db.save_analysis("b" * 64, "other", "1", {"value": 1})
+    assert db.invalidate_analyses("text_processor", keep_version="2-x") == 1
+    assert db.load_analysis("a" * 64, "text_processor", "2-x") == {"summary": "جديد"}
+    assert db.load_analysis("b" * 64, "other", "1") == {"value": 1}
+
+
+def test_keyset_pagination_of_documents_and_search_results(db):
+    db.save_documents([(f"مستند {i}", f"كتاب {'كتاب ' * (i % 3)}رقم {i}", "TXT") for i in range(7)])
+
+    assert [d["id"] for d in db.iter_documents(batch_size=3)] == list(range(1, 8))
+    assert list(db.iter_documents(batch_size=2, since_id=5, columns=("id", "hash"))) == [
+        {"id": i, "hash": hashlib.sha256(f"كتاب {'كتاب ' * ((i - 1) % 3)}رقم {i - 1}".encode()).hexdigest()}
+        for i in (6, 7)
+    ]
+    with pytest.raises(ValueError):
+        db.iter_documents(columns=("secret",))
+
+    ranked = db.search_documents("كتاب", limit=10)
+    assert len(ranked) == 7
+    assert [r["id"] for r in db.iter_search("كتاب", page_size=2)] == [r["id"] for r in ranked]
+    second = db.search_documents("كتاب", limit=3, after=(ranked[2]["score"], ranked[2]["id"]))
+    assert second == ranked[3:6]
+
+def test_search_ranks_newest_window_and_iter_search_continues_past_it(db, caplog):
+    db.save_documents([(f"مستند {i}", f"كتاب {'كتاب ' * (i % 3)}رقم {i}", "TXT") for i in range(7)])
+    ranked = db.search_documents("كتاب", limit=10, max_ranked=None)
+
+    recent = db.search_documents("كتاب", limit=10, max_ranked=3)
+    assert sorted(r["id"] for r in recent) == [5, 6, 7]
+    assert "أحدث 3 مطابقة" in caplog.text
+    assert recent == sorted(recent, key=lambda r: -r["score"])
+
+    windows = [r["id"] for r in db.iter_search("كتاب", page_size=2, max_ranked=3)]
+    assert windows[:3] == [r["id"] for r in recent]
+    assert sorted(windows[3:6]) == [2, 3, 4] and windows[6:] == [1]
+    assert [r["id"] for r in db.iter_search("كتاب", page_size=2, max_ranked=None)] == [r["id"] for r in ranked]
+
+
+def test_chunked_documents_read_ranges_and_detect_tampering(tmp_path, monkeypatch):
+    monkeypatch.setattr(core.database, "SECRET_KEY", Fernet.generate_key())
+    text = "".join(f"الصفحة {i}: بسم الله الرحمن الرحيم\n" for i in range(200))
+    with DatabaseManager(str(tmp_path / "chunks.db"), chunk_size=256, document_cache_bytes=0) as db:
+        assert db.save_document("كتاب", text, "TXT")
+        db.save_documents([("كتاب آخر", text + "!", "TXT"), ("قصير", "نص قصير", "TXT")])
+        with db._db_connection() as conn:
+            counts = dict(conn.execute("SELECT document_id, COUNT(*) FROM document_chunks GROUP BY document_id"))
+        assert set(counts) == {1, 2} and counts[1] > 20
+
+        assert db.get_document(1)["content"] == text
+        assert db.get_document(2)["content"] == text + "!"
+        for start, end in ((0, 10), (1000, 3000), (-50, None), (5, 5), (255, 257)):
+            assert db.read_range(1, start, end) == text[start:end]
+        assert db.read_range(3, 2, 6) == "نص قصير"[2:6]
+
+        with db._db_connection() as conn:
+            conn.execute("UPDATE document_chunks SET idx = -1 WHERE document_id = 1 AND idx = 4")
+            conn.execute("UPDATE document_chunks SET idx = 4 WHERE document_id = 1 AND idx = 5")
+            conn.execute("UPDATE document_chunks SET idx = 5 WHERE document_id = 1 AND idx = -1")
+            conn.commit()
+        assert db.read_range(1, 0, 10) == text[:10]
+        assert db.read_range(1, 400, 1000) is None
+        assert db.get_document(1) is None
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_extractors.py
+==================
+اختبارات سجل مستخرجات النصوص وقراءة الملفات أجزاءً باستخدام `pytest`
+"""
+
+import zipfile
+
+import pytest
+from core import extractors
+
+def test_extractors_detect_type_from_magic_bytes(tmp_path):
+    (tmp_path / "report.doc").write_text("نص عادي بامتداد خاطئ", encoding="utf-8")
+    (tmp_path / "scan.txt").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(16))
+    (tmp_path / "paper").write_bytes(b"%PDF-1.7\n")
+    with zipfile.ZipFile(tmp_path / "letter.bin", "w") as archive:
+        archive.writestr("word/document.xml", "<w:document/>")
+    (tmp_path / "data.bin").write_bytes(b"\x00\x01\x02")
+
+    assert extractors.detect_type(str(tmp_path / "report.doc")) == "txt"
+    assert extractors.extract_text(str(tmp_path / "report.doc")) == "نص عادي بامتداد خاطئ"
+    assert extractors.file_type(str(tmp_path / "scan.txt")) == "IMG"
+    assert extractors.file_type(str(tmp_path / "paper")) == "PDF"
+    assert extractors.detect_type(str(tmp_path / "letter.bin")) == "docx"
+    with pytest.raises(ValueError):
+        extractors.extract_text(str(tmp_path / "data.bin"))
+
+    ranges = extractors.page_ranges(10, 4)
+    assert ranges == [(0, 3), (3, 6), (6, 8), (8, 10)]
+
+    assert extractors.text_layer_usable("بسم الله الرحمن الرحيم، الحمد لله رب العالمين")
+    assert not extractors.text_layer_usable(" 12 \n")
+    assert not extractors.text_layer_usable("(cid:3)(cid:18)(cid:7) " * 10)
+    assert not extractors.text_layer_usable("\ue012\ue044\ue0a1 \ufffd\ufffd" * 10)
+
+def test_iter_text_streams_positioned_chunks(tmp_path):
+    text = "الفقرة الأولى\nتتمة\n\n\nالفقرة الثانية\n\nالأخيرة"
+    (tmp_path / "notes.txt").write_text(text, encoding="utf-8")
+    chunks = list(extractors.iter_text(str(tmp_path / "notes.txt")))
+    assert [chunk["text"] for chunk in chunks] == ["الفقرة الأولى\nتتمة\n\n", "\nالفقرة الثانية\n\n", "الأخيرة"]
+    assert [text[chunk["offset"]:].startswith(chunk["text"]) for chunk in chunks] == [True] * 3
+    assert "".join(chunk["text"] for chunk in chunks) == text
+
+    w = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    body = (
+        '<w:p><w:pPr><w:tabs><w:tab w:val="left"/></w:tabs></w:pPr>'
+        '<w:r><w:t>بسم</w:t><w:tab/><w:t>الله</w:t></w:r></w:p>'
+        '<w:p/><w:p><w:r><w:t>سطر</w:t><w:br/><w:t>ثان</w:t></w:r></w:p>'
+    )
+    with zipfile.ZipFile(tmp_path / "letter.docx", "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document {w}><w:body>{body}</w:body></w:document>")
+    chunks = list(extractors.iter_text(str(tmp_path / "letter.docx"), prefetch_size=2))
+    assert [chunk["text"] for chunk in chunks] == ["بسم\tالله\n", "\n", "سطر\nثان\n"]
+    assert [(chunk["index"], chunk["kind"]) for chunk in chunks] == [(0, "paragraph"), (1, "paragraph"), (2, "paragraph")]
+    assert extractors.extract_text(str(tmp_path / "letter.docx")) == "بسم\tالله\n\nسطر\nثان\n"
+
+def test_pdf_pool_is_shared_spawned_and_replaced_after_fork(monkeypatch):
+    pool = extractors._pdf_pool()
+    try:
+        assert extractors._pdf_pool() is pool
+        assert pool._mp_context.get_start_method() == "spawn"
+
+        # عملية ابنة ورثت المجمّع بالنسخ لا تستخدمه
+        monkeypatch.setattr(extractors, "_PDF_POOL_PID", -1)
+        assert extractors._pdf_pool() is not pool
+    finally:
+        pool.shutdown()
+        extractors.shutdown_pdf_pool()
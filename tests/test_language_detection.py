@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_language_detection.py
+==================
+اختبارات كاشف اللغة المتدرج باستخدام `pytest`
+"""
+
+from core.language_detection import LanguageDetector
+
+def test_language_detection_by_script_with_spans(monkeypatch):
+    predicted = []
+
+    def predict(self, samples):
+        predicted.extend(samples)
+        return [("en", 0.9)] * len(samples)
+
+    monkeypatch.setattr(LanguageDetector, "_predict", predict)
+    detector = LanguageDetector(cache_size=2)
+    arabic, mixed, ambiguous = detector.detect_many(
+        ["اللغة العربية جميلة", "The Arabic word كتاب means a book", "كتاب book قلم pen"]
+    )
+
+    assert (arabic["language"], arabic["confidence"], arabic["source"]) == ("ar", 1.0, "script")
+    # 85% من الحروف لاتينية: يحسمه المدرّج دون fastText
+    assert (mixed["language"], mixed["source"]) == ("en", "script")
+    assert [span["language"] for span in mixed["spans"]] == ["en", "ar", "en"]
+    start, end = mixed["spans"][1]["start"], mixed["spans"][1]["end"]
+    assert "The Arabic word كتاب means a book"[start:end] == "كتاب"
+
+    # نص مختلط دون عتبة الثقة: يُحال إلى fastText وحده
+    assert predicted == ["كتاب book قلم pen"]
+    assert (ambiguous["language"], ambiguous["confidence"], ambiguous["source"]) == ("en", 0.9, "fasttext")
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_numerology.py
+==================
+اختبارات حساب الجُمَّل باستخدام `pytest`
+"""
+
+import pytest
+from core.numerology import NumerologyCalculator
+
+@pytest.fixture
+def jummal_calculator():
+    return NumerologyCalculator()
+
+def test_small_jummal_and_verse_values(jummal_calculator):
+    # الجُمَّل الصغير: باقي القسمة على 12 لكل حرف
+    assert jummal_calculator.calculate_small_jummal("محمد") == 4 + 8 + 4 + 4
+
+    values, letters = jummal_calculator.engine.verse_values(["أبجد", "", "بسم الله"])
+    assert values.tolist() == [10, 0, 102 + 66]
+    assert letters.tolist() == [4, 0, 7]
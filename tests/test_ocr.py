@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_ocr.py
+==================
+اختبارات المعالجة المسبقة لخدمة التعرف الضوئي باستخدام `pytest`
+"""
+
+import os
+import signal
+
+import numpy as np
+import pytest
+from core import ocr
+from core.ocr import OCRService, estimate_skew, otsu_threshold, tile_ranges
+
+def test_ocr_preprocessing_threshold_skew_and_tiles():
+    page = np.full((400, 600), 250, np.uint8)
+    slope = np.tan(np.radians(2.0))
+    for top in range(50, 350, 40):
+        for x in range(30, 570):
+            y = int(round(top + x * slope))
+            page[y:y + 4, x] = 30
+    ink = page <= otsu_threshold(page)
+    assert ink.sum() == (page == 30).sum()
+    assert estimate_skew(ink) == pytest.approx(2.0)
+
+    tiles = tile_ranges(ink, 150)
+    assert tiles[0][0] == 0 and tiles[-1][1] == 400
+    assert all(stop - start <= 150 for start, stop in tiles)
+    assert all(ink[start].sum() == 0 for start, _ in tiles[1:])
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="يتطلب fork")
+def test_ocr_service_pool_works_after_fork(monkeypatch):
+    service = OCRService(workers=2)
+    assert service._pool().submit(lambda: 1).result() == 1
+
+    pid = os.fork()
+    if pid == 0:
+        # المجمّع الموروث يعلق: المهلة تُنهي العملية الابنة بالفشل
+        signal.alarm(5)
+        ok = service._pool().submit(lambda: 2).result() == 2
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    service.close()
+
+    shared = ocr.get_ocr_service()
+    monkeypatch.setattr(ocr, "_SERVICE", shared)
+    monkeypatch.setattr(ocr, "_SERVICE_PID", -1)
+    monkeypatch.setattr(ocr, "DEFAULT_OCR_WORKERS", 1)
+    child_service = ocr.get_ocr_service()
+    assert child_service is not shared and child_service.workers == 1
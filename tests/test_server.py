@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_server.py
+==================
+اختبارات دورة حياة موارد خادم REST API باستخدام `pytest`
+"""
+
+import pytest
+
+server = pytest.importorskip("api.server")
+
+class FakeDatabase:
+    instances = []
+
+    def __init__(self):
+        self.closed = 0
+        FakeDatabase.instances.append(self)
+
+    def close(self):
+        self.closed += 1
+
+class FakeEngine:
+    def __init__(self, database_manager=None):
+        self.database_manager = database_manager
+
+@pytest.fixture
+def fake_resources(monkeypatch):
+    FakeDatabase.instances = []
+    monkeypatch.setattr(server, "DatabaseManager", FakeDatabase)
+    monkeypatch.setattr(server, "AIEngine", FakeEngine)
+    monkeypatch.setattr(server, "_DATABASE", None)
+    monkeypatch.setattr(server, "_ENGINE", None)
+    yield
+    server.close_resources()
+
+def test_requests_share_one_database_closed_on_shutdown(fake_resources):
+    database = server.get_database()
+    assert server.get_database() is database
+    assert server.get_engine() is server.get_engine()
+    assert server.get_engine().database_manager is database
+
+    server.close_resources()
+    server.close_resources()
+    assert database.closed == 1
+    assert server.get_database() is not database
+    assert len(FakeDatabase.instances) == 2
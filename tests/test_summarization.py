@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_summarization.py
+==================
+اختبارات التلخيص الاستخراجي باستخدام `pytest`
+"""
+
+from core.summarization import Summarizer
+
+def test_hierarchical_summary_reports_coverage():
+    sentences = [f"The river city trade number {i} grew." for i in range(30)]
+    sentences[17] = "Cats and dogs play."
+    summarizer = Summarizer(max_sentences=8, neighbours=3)
+
+    result = summarizer.summarize(" ".join(sentences), sentences_count=2)
+    assert result["levels"] == 2
+    assert result["coverage"] == 1.0
+    assert "Cats and dogs play." not in result["sentences"]
+    positions = [sentences.index(s) for s in result["sentences"]]
+    assert positions == sorted(positions)
+
+    partial = summarizer.summarize(" ".join(sentences), sentences_count=2, time_budget=0)
+    assert partial["considered_sentences"] == 8
+    assert partial["coverage"] < 1.0
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_text_processing.py
+==================
+اختبارات معالجة النصوص الموحّدة باستخدام `pytest`
+"""
+
+import numpy as np
+import pytest
+from core.keywords import CorpusStats, KeywordExtractor
+from core.language_detection import LanguageDetector
+from core.lexicon import LexiconMatcher
+from core.summarization import Summarizer
+from core.term_hashing import TermHasher
+from core.text_processing import TextProcessor
+
+@pytest.fixture
+def text_processor():
+    return TextProcessor()
+
+def test_process_text_matches_individual_analyses(text_processor, monkeypatch):
+    # دون fastText: النص المختلط (نحو 75% لاتيني) تحسمه نسبة أنظمة الكتابة
+    monkeypatch.setattr(LanguageDetector, "_predict", lambda self, samples: [None] * len(samples))
+    text = "Good news from Cairo. كتاب جميل وسعيد! The Book of Ali 12/05/2020. Word word WORD."
+    result = text_processor.process_text(text)
+
+    assert result["cleaned_text"] == text_processor.clean_text(text)
+    assert result["entities"] == text_processor.extract_entities(text)
+    assert result["language"] == text_processor.detect_language(text) == "en"
+    assert result["sentiment"] == text_processor.analyze_sentiment(text)
+    assert result["numerical_analysis"] == text_processor.numerical_analysis(text)
+    assert result["summary"] == "Good news from Cairo. كتاب جميل وسعيد!"
+    assert result["keywords"][0] == "word"
+
+def test_process_batch_keeps_order_and_reports_errors(text_processor):
+    texts = ["محمد", None, "أبجد"]
+    results = text_processor.process_batch(texts, workers=2)
+
+    assert [r["error"] is None for r in results] == [True, False, True]
+    assert results[0]["result"]["numerical_analysis"]["arabic_letter_sum"] == 92
+    assert results[2]["result"]["numerical_analysis"]["arabic_letter_sum"] == 10
+
+def test_process_stream_matches_process_text(text_processor):
+    text = "Good news from Cairo. كتاب جميل وسعيد! The Book of Ali 12/05/2020. Word word WORD."
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+
+    expected = text_processor.process_text(text)
+    expected["cleaned_text"] = None
+    assert text_processor.process_stream(chunks) == expected
+
+def test_sentiment_respects_word_boundaries_and_negation(text_processor):
+    result = text_processor.analyze_sentiment("The badge is not bad. Very good!")
+
+    assert result["positive"] == 2
+    assert result["negative"] == 0
+    assert result["overall"] == "positive"
+
+def test_entities_hijri_dates_arabic_digits_and_places(text_processor):
+    text = "وصل إلى القاهرة في 15 رمضان 1445 هـ، وغادر يوم ١٢/٠٥/٢٠٢٠ إلى New York."
+    entities = text_processor.extract_entities(text)
+
+    assert entities["hijri_dates"] == ["15 رمضان 1445 هـ"]
+    assert entities["dates"] == ["١٢/٠٥/٢٠٢٠"]
+    assert entities["places"] == ["القاهرة", "New York"]
+    assert [text[start:end] for kind, start, end in entities["spans"] if kind == "place"] == entities["places"]
+
+    chunks = [text[:24], text[24:]]
+    assert text_processor.process_stream(chunks)["entities"] == entities
+
+def test_analysis_version_tracks_configuration(text_processor):
+    assert text_processor.analysis_version() == TextProcessor().analysis_version()
+    assert TextProcessor(summarizer=Summarizer()).analysis_version() != text_processor.analysis_version()
+    assert (TextProcessor(summarizer=Summarizer(max_sentences=50)).analysis_version()
+            != TextProcessor(summarizer=Summarizer()).analysis_version())
+
+def test_lexicon_stream_matches_phrases_across_chunks():
+    matcher = LexiconMatcher([("new york", "place", 1.0), ("york", "place", 1.0), ("cairo", "place", 1.0)])
+    tokens = "From New York to Cairo".split()
+
+    stream = matcher.stream()
+    matches = stream.feed(tokens[:2]) + stream.feed(tokens[2:])
+    assert matches == matcher.stream().feed(tokens)
+    assert [(start, end) for start, end, _ in matches] == [(1, 2), (4, 4)]
+
+def test_process_batch_uses_processor_configuration(tmp_path):
+    lexicon = tmp_path / "lexicon.tsv"
+    lexicon.write_text("gloomy\tnegative\n", encoding="utf-8")
+    hasher = TermHasher(b"test-secret")
+    common = ["beta", "gamma", "delta"]
+    stats = CorpusStats(hasher, 100, 10000, np.array([hasher.digest(term) for term in common]), np.full(3, 90))
+    processor = TextProcessor(str(lexicon), KeywordExtractor(stats, k=1), Summarizer(max_sentences=4))
+    texts = [
+        "Alpha alpha beta beta gamma delta. Gloomy weather today. Nothing more.",
+        "The alpha report is gloomy. Nothing else happened here.",
+    ]
+
+    results = processor.process_batch(texts, workers=2)
+    assert [r["error"] for r in results] == [None, None]
+    assert [r["result"] for r in results] == [processor.process_text(text) for text in texts]
+    assert results[0]["result"]["keywords"] == ["alpha"]
+    assert results[1]["result"]["sentiment"]["overall"] == "negative"
+
+def test_missing_lexicon_path_is_an_error(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        TextProcessor(str(tmp_path / "missing.tsv"))